@@ -0,0 +1,131 @@
+# benchmarks/bench_compression.py
+"""
+Recall versus memory of the embedding compression settings.
+
+For every truncation dimension (EMBEDDING_DIMENSIONS) it measures recall@k against
+exact search on the full-dimensional vectors for:
+- float32:       exact search on the truncated vectors
+- int8 + rescore, binary + rescore: quantized first pass over k * rescore_factor
+  candidates, then rescoring with the truncated float32 vectors
+  (VECTOR_QUANTIZATION, VECTOR_RESCORE_FACTOR)
+
+`bytes/vector` is the size of what the first pass scans per vector (the float32
+vectors stay in Chroma for rescoring).
+
+By default it runs on synthetic vectors whose variance decays along the dimensions
+(like Matryoshka embeddings). Use `--collection torched-rag` to run on real vectors
+stored in Chroma (queries are held-out stored vectors). Run from the `rag` directory:
+
+    python -m benchmarks.bench_compression --docs 20000 --dims 256 512 1024 3072
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.vector_quantization import first_pass, quantize_binary, quantize_int8
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def truncate(vectors: np.ndarray, dims: int) -> np.ndarray:
+    """What the API returns for `dimensions=dims`: the renormalized prefix."""
+    return normalize(vectors[:, :dims])
+
+
+def synthetic_vectors(n_docs: int, n_queries: int, dims: int, clusters: int, seed: int):
+    rng = np.random.default_rng(seed)
+    spectrum = np.arange(1, dims + 1, dtype=np.float32) ** -0.5
+    centers = rng.standard_normal((clusters, dims)).astype(np.float32) * spectrum
+    docs = centers[rng.integers(clusters, size=n_docs)]
+    docs = docs + 0.6 * rng.standard_normal((n_docs, dims)).astype(np.float32) * spectrum
+    queries = docs[rng.integers(n_docs, size=n_queries)]
+    queries = queries + 0.3 * rng.standard_normal((n_queries, dims)).astype(np.float32) * spectrum
+    return normalize(docs), normalize(queries)
+
+
+def chroma_vectors(collection_name: str, n_queries: int, limit: int):
+    from src.vector_store import _sync_collection
+
+    page = _sync_collection(collection_name).get(limit=limit, include=["embeddings"])
+    vectors = normalize(np.asarray(page["embeddings"], dtype=np.float32))
+    return vectors[:-n_queries], vectors[-n_queries:]
+
+
+def exact_top_k(queries: np.ndarray, docs: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ docs.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def quantized_search(queries: np.ndarray, docs: np.ndarray, mode: str, k: int, rescore_factor: int) -> np.ndarray:
+    if mode == "binary":
+        codes, scales = quantize_binary(docs), None
+    else:
+        codes, scales = quantize_int8(docs)
+    results = []
+    for query in queries:
+        candidates = first_pass(query, codes, scales, mode, k * rescore_factor)
+        exact = docs[candidates] @ query
+        results.append(candidates[np.argsort(-exact)[:k]])
+    return np.array(results)
+
+
+def report(label: str, dims: int, bytes_per_vector: float, found: np.ndarray, truth: np.ndarray,
+           elapsed: float, n_queries: int) -> None:
+    print(
+        f"{label:<16} dims={dims:<5} bytes/vector={bytes_per_vector:8.0f}  "
+        f"recall@{truth.shape[1]}={recall(found, truth):.3f}  ms/query={1000 * elapsed / n_queries:7.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--native-dims", type=int, default=3072)
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 512, 1024, 3072])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--collection", help="Use vectors stored in this Chroma collection instead of synthetic ones")
+    args = parser.parse_args()
+
+    if args.collection:
+        docs, queries = chroma_vectors(args.collection, args.queries, args.docs + args.queries)
+    else:
+        docs, queries = synthetic_vectors(args.docs, args.queries, args.native_dims, args.clusters, args.seed)
+    truth = exact_top_k(queries, docs, args.k)
+    print(f"docs={len(docs)} queries={len(queries)} native_dims={docs.shape[1]} k={args.k}")
+
+    for dims in args.dims:
+        if dims > docs.shape[1]:
+            continue
+        docs_d, queries_d = truncate(docs, dims), truncate(queries, dims)
+
+        start = time.perf_counter()
+        found = exact_top_k(queries_d, docs_d, args.k)
+        report("float32", dims, dims * 4, found, truth, time.perf_counter() - start, len(queries))
+
+        start = time.perf_counter()
+        found = quantized_search(queries_d, docs_d, "int8", args.k, args.rescore_factor)
+        report("int8+rescore", dims, dims + 4, found, truth, time.perf_counter() - start, len(queries))
+
+        start = time.perf_counter()
+        found = quantized_search(queries_d, docs_d, "binary", args.k, args.rescore_factor)
+        report("binary+rescore", dims, dims / 8, found, truth, time.perf_counter() - start, len(queries))
+
+
+if __name__ == "__main__":
+    main()
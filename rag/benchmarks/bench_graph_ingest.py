@@ -0,0 +1,179 @@
+# benchmarks/bench_graph_ingest.py
+"""
+Throughput of graph ingestion: one statement per chunk/entity vs. UNWIND batches.
+
+Builds a synthetic document: every chunk mentions a few entities drawn from a shared
+vocabulary (names/locations/dates/key_terms, like extract_metadata produces), so
+entities repeat across chunks and co-occurrence pairs overlap. Two write patterns are
+timed on the same rows:
+- per-row:  the old create_graph_entries loop - one round trip per chunk, two per
+            entity mention, one per chunk for its co-occurrence pairs
+- batched:  graph_store.create_graph_entries - `UNWIND $rows` statements of
+            --batch-size rows, one managed write transaction per batch
+
+With --uri the writes go to a real Neo4j (use a scratch database, the benchmark user's
+nodes are deleted before each run). Without it an in-process stand-in driver is used that
+only sleeps --rtt-ms per round trip, which isolates the cost of round trips. Run from
+the `rag` directory:
+
+    python -m benchmarks.bench_graph_ingest --chunks 2000 --batch-size 500 --rtt-ms 1
+    python -m benchmarks.bench_graph_ingest --uri bolt://localhost:7687 --password secret
+"""
+
+import argparse
+import random
+import time
+from itertools import combinations
+
+from src import graph_store
+
+USER_ID = "bench-graph-ingest"
+
+_LEGACY_CHUNK = """
+MERGE (c:Chunk {key: $key})
+SET c.user_id = $user_id, c.document_id = $document_id, c.chunk_index = $chunk_index,
+    c.file_name = $file_name, c.text = $text
+"""
+_LEGACY_ENTITY = "MERGE (e:Entity {user_id: $user_id, name: $name}) SET e.type = $type"
+_LEGACY_MENTION = """
+MATCH (c:Chunk {key: $chunk_key}) MATCH (e:Entity {user_id: $user_id, name: $name})
+MERGE (c)-[:CONTAINS_ENTITY]->(e)
+"""
+
+
+class _StandInTransaction:
+    def __init__(self, driver):
+        self._driver = driver
+
+    def run(self, cypher, **params):
+        return self._driver.round_trip(params)
+
+
+class _StandInSession:
+    def __init__(self, driver):
+        self._driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, cypher, **params):
+        return self._driver.round_trip(params)
+
+    def execute_write(self, work, *args):
+        return work(_StandInTransaction(self._driver), *args)
+
+
+class _StandInResult(list):
+    def consume(self):
+        return None
+
+    def single(self):
+        return None
+
+
+class StandInDriver:
+    """Driver look-alike that only pays a simulated network round trip per statement."""
+
+    def __init__(self, rtt_ms: float):
+        self.rtt = rtt_ms / 1000.0
+        self.round_trips = 0
+
+    def session(self, **kwargs):
+        return _StandInSession(self)
+
+    def round_trip(self, params):
+        self.round_trips += 1
+        time.sleep(self.rtt)
+        return _StandInResult()
+
+
+def build_document(chunks: int, entities_per_chunk: int, vocabulary: int, seed: int):
+    rng = random.Random(seed)
+    pool = {kind: [f"{kind}-{i}" for i in range(vocabulary)] for kind in graph_store.ENTITY_TYPES}
+    texts, metadatas = [], []
+    for i in range(chunks):
+        texts.append(f"chunk {i} " + "lorem ipsum " * 40)
+        metadata = {kind: [] for kind in graph_store.ENTITY_TYPES}
+        for _ in range(entities_per_chunk):
+            kind = rng.choice(graph_store.ENTITY_TYPES)
+            metadata[kind].append(rng.choice(pool[kind]))
+        metadatas.append(metadata)
+    return texts, metadatas
+
+
+def ingest_per_row(driver, rows) -> None:
+    mentions_by_chunk = {}
+    for mention in rows["mentions"]:
+        mentions_by_chunk.setdefault(mention["chunk_key"], []).append(mention)
+    with driver.session() as session:
+        for chunk in rows["chunks"]:
+            session.run(_LEGACY_CHUNK, **chunk)
+            names = set()
+            for mention in mentions_by_chunk.get(chunk["key"], []):
+                session.run(_LEGACY_ENTITY, user_id=USER_ID, name=mention["name"], type=mention["type"])
+                session.run(_LEGACY_MENTION, user_id=USER_ID, chunk_key=chunk["key"], name=mention["name"])
+                names.add(mention["name"])
+            pairs = [{"a": a, "b": b} for a, b in combinations(sorted(names), 2)]
+            session.run(graph_store._WRITE_CO_OCCURRENCES, rows=pairs, user_id=USER_ID)
+
+
+def clear(driver) -> None:
+    with driver.session() as session:
+        session.run("MATCH (n {user_id: $user_id}) DETACH DELETE n", user_id=USER_ID)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--entities-per-chunk", type=int, default=6)
+    parser.add_argument("--vocabulary", type=int, default=300, help="Distinct entities per entity type")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--uri", help="Neo4j bolt URI; the stand-in driver is used without it")
+    parser.add_argument("--user", default="neo4j")
+    parser.add_argument("--password", default="neo4j")
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="Simulated round trip of the stand-in driver")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts, metadatas = build_document(args.chunks, args.entities_per_chunk, args.vocabulary, args.seed)
+    rows = graph_store.graph_rows(texts, metadatas, USER_ID, "bench-doc", "bench.pdf")
+    nodes = len(rows["chunks"]) + len({m["name"] for m in rows["mentions"]})
+    relationships = len(rows["mentions"]) + len(rows["co_occurrences"])
+    print(f"{len(rows['chunks'])} chunks, {len(rows['mentions'])} mentions, "
+          f"{len(rows['co_occurrences'])} co-occurrence pairs, batch size={args.batch_size}")
+
+    if args.uri:
+        from neo4j import GraphDatabase
+        driver = GraphDatabase.driver(args.uri, auth=(args.user, args.password))
+    else:
+        driver = StandInDriver(args.rtt_ms)
+        print(f"stand-in driver, simulated round trip {args.rtt_ms} ms")
+    graph_store.driver = driver
+    # Schemat powstaje raz na proces, przed pomiarem - mierzymy same zapisy
+    graph_store.ensure_graph_schema()
+
+    def run(name, ingest):
+        if args.uri:
+            clear(driver)
+        round_trips = getattr(driver, "round_trips", 0)
+        started = time.perf_counter()
+        ingest()
+        elapsed = time.perf_counter() - started
+        trips = f", {driver.round_trips - round_trips} round trips" if not args.uri else ""
+        print(f"{name:9s} {elapsed:8.2f}s  {nodes / elapsed:10.0f} nodes/s  "
+              f"{relationships / elapsed:10.0f} relationships/s{trips}")
+
+    run("per-row", lambda: ingest_per_row(driver, rows))
+    run("batched", lambda: graph_store.create_graph_entries(
+        texts, metadatas, USER_ID, "bench.pdf", document_id="bench-doc", batch_size=args.batch_size))
+
+    if args.uri:
+        clear(driver)
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/bench_ingest.py
+"""
+Offline benchmark of the ingestion embedding stage.
+
+Uses FakeEmbedder (simulated API latency) and an in-memory upsert, so no API key,
+ChromaDB or network is needed. Run from the `rag` directory:
+
+    python -m benchmarks.bench_ingest --chunks 2000 --latency 0.4 --concurrency 1 4 8
+
+With `--model` the chunks are embedded by a real local model instead (still offline,
+see src/embeddings.py), e.g. `--model sentence-transformers/all-MiniLM-L6-v2`.
+"""
+
+import argparse
+import asyncio
+import logging
+
+from benchmarks.fakes import FakeEmbedder
+from src.ingest_pipeline import embed_and_upsert
+
+
+def build_chunks(n: int, chunk_chars: int) -> list:
+    base = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. "
+    return [(f"[{i}] " + base * (chunk_chars // len(base) + 1))[:chunk_chars] for i in range(n)]
+
+
+async def run_once(chunks: list, embedder, concurrency: int, batch_size: int, upsert_latency: float) -> None:
+    stored = {}
+
+    async def upsert(ids, vectors, texts, metadatas):
+        await asyncio.sleep(upsert_latency)
+        stored.update(zip(ids, vectors))
+
+    report = await embed_and_upsert(
+        texts=chunks,
+        metadatas=[{"chunk_index": i} for i in range(len(chunks))],
+        ids=[f"chunk-{i}" for i in range(len(chunks))],
+        embedder=embedder,
+        upsert=upsert,
+        batch_size=batch_size,
+        max_concurrency=concurrency,
+    )
+    embed_times = sorted(b.embed_seconds for b in report.batches)
+    p50 = embed_times[len(embed_times) // 2] if embed_times else 0.0
+    print(
+        f"concurrency={concurrency:<3} batch_size={batch_size:<4} batches={len(report.batches):<4} "
+        f"total={report.elapsed_seconds:6.2f}s  embed p50={p50:.3f}s  "
+        f"chunks/s={report.embedded_chunks / report.elapsed_seconds:8.1f}  stored={len(stored)}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunk-chars", type=int, default=1200)
+    parser.add_argument("--latency", type=float, default=0.4, help="Simulated API round trip per batch (s)")
+    parser.add_argument("--upsert-latency", type=float, default=0.05, help="Simulated Chroma upsert per batch (s)")
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[64])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--model", help="Local embedding model instead of the simulated API")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    chunks = build_chunks(args.chunks, args.chunk_chars)
+    if args.model:
+        from src.embeddings import create_embeddings
+
+        embedder = create_embeddings(args.model)
+        embedder.embed_query("warm-up")  # model loading is not part of the measurement
+    else:
+        embedder = FakeEmbedder(dimensions=256, latency=args.latency, per_text_latency=0.0005)
+    for batch_size in args.batch_size:
+        for concurrency in args.concurrency:
+            asyncio.run(run_once(chunks, embedder, concurrency, batch_size, args.upsert_latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# benchmarks/bench_metadata.py
+"""
+Storage and filtered-query latency of per-chunk vs. normalized document metadata.
+
+Builds two local Chroma collections from the same synthetic corpus:
+- legacy:  every chunk carries file_name, file_description, category, doc_id
+- compact: chunks carry user_id, document_id, chunk_index, page; the document
+           attributes are attached after the query from a registry (a dict here,
+           one batched WorkspaceDocument query in the API - see document_registry.py)
+
+Reports on-disk size of each collection, the size of the metadata alone, and
+p50/p95 latency of user-filtered queries (compact includes hydration). Needs only
+chromadb and numpy - no API key, Postgres or network. Run from the `rag` directory:
+
+    python -m benchmarks.bench_metadata --users 20 --docs-per-user 10 --chunks-per-doc 200
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def build_corpus(users: int, docs_per_user: int, chunks_per_doc: int, description_chars: int, seed: int):
+    rng = np.random.default_rng(seed)
+    words = ["algorytm", "macierz", "wektor", "graf", "funkcja", "całka", "pochodna", "zbiór", "dowód", "lemat"]
+    documents = {}
+    chunks = []
+    for u in range(users):
+        for d in range(docs_per_user):
+            document_id = str(uuid.UUID(int=int(rng.integers(2 ** 62)) << 64 | u << 16 | d))
+            description = " ".join(rng.choice(words, size=description_chars // 8))[:description_chars]
+            documents[document_id] = {
+                "file_name": f"wyklad_{u}_{d}.pdf",
+                "file_description": description,
+                "category": f"Kategoria {d % 5}",
+            }
+            for c in range(chunks_per_doc):
+                chunks.append((str(u), document_id, c, c // 4 + 1))
+    return documents, chunks
+
+
+def legacy_metadata(documents, user_id, document_id, chunk_index, page, vector_id):
+    document = documents[document_id]
+    return {
+        "user_id": user_id,
+        "file_name": document["file_name"],
+        "file_description": document["file_description"],
+        "category": document["category"],
+        "chunk_index": chunk_index,
+        "doc_id": vector_id,
+    }
+
+
+def compact_metadata(documents, user_id, document_id, chunk_index, page, vector_id):
+    return {"user_id": user_id, "document_id": document_id, "chunk_index": chunk_index, "page": page}
+
+
+def fill(collection, documents, chunks, vectors, make_metadata, batch: int = 2000) -> int:
+    metadata_bytes = 0
+    for start in range(0, len(chunks), batch):
+        part = chunks[start:start + batch]
+        ids = [f"{user_id}_{document_id}_{chunk_index}" for user_id, document_id, chunk_index, _ in part]
+        metadatas = [make_metadata(documents, *chunk, vector_id) for chunk, vector_id in zip(part, ids)]
+        metadata_bytes += sum(len(json.dumps(m, ensure_ascii=False).encode('utf-8')) for m in metadatas)
+        collection.add(
+            ids=ids,
+            embeddings=vectors[start:start + batch].tolist(),
+            documents=[f"chunk {i}" for i in range(start, start + len(part))],
+            metadatas=metadatas,
+        )
+    return metadata_bytes
+
+
+def time_queries(collection, queries, users: int, k: int, documents=None):
+    latencies = []
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, where={"user_id": str(i % users)})
+        if documents is not None:
+            # Hydration: one batched lookup for the distinct documents of the page
+            found = {m["document_id"] for m in result["metadatas"][0]}
+            registry = {d: documents[d] for d in found}
+            for metadata in result["metadatas"][0]:
+                metadata.update(registry[metadata["document_id"]])
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--docs-per-user", type=int, default=10)
+    parser.add_argument("--chunks-per-doc", type=int, default=200)
+    parser.add_argument("--description-chars", type=int, default=500)
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import chromadb
+
+    documents, chunks = build_corpus(args.users, args.docs_per_user, args.chunks_per_doc,
+                                     args.description_chars, args.seed)
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.standard_normal((len(chunks), args.dims)).astype(np.float32)
+    queries = rng.standard_normal((args.queries, args.dims)).astype(np.float32)
+    print(f"{len(chunks)} chunks, {len(documents)} documents, {args.users} users, dims={args.dims}")
+
+    for name, make_metadata, registry in (("legacy", legacy_metadata, None),
+                                          ("compact", compact_metadata, documents)):
+        path = tempfile.mkdtemp(prefix=f"bench_metadata_{name}_")
+        try:
+            client = chromadb.PersistentClient(path=path)
+            collection = client.create_collection(name)
+            metadata_bytes = fill(collection, documents, chunks, vectors, make_metadata)
+            p50, p95 = time_queries(collection, queries, args.users, args.k, registry)
+            print(
+                f"{name:<8} on disk={directory_size(path) / 2 ** 20:8.1f} MiB  "
+                f"metadata={metadata_bytes / 2 ** 20:7.1f} MiB  "
+                f"query p50={p50 * 1000:6.2f} ms  p95={p95 * 1000:6.2f} ms"
+            )
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/bench_two_stage.py
+"""
+Latency and recall of flat vs. two-stage (document centroid -> chunks) retrieval.
+
+Builds a synthetic clustered corpus: every document has a random topic direction and
+its chunks are noisy copies of it, which is roughly how chunk embeddings of one file
+behave. Queries are noisy copies of random chunks. Two local Chroma collections are
+used, exactly like in vector_store.py:
+- flat:      one query over all chunks of the user
+- two-stage: query the user's centroids (`document_centroids.py`), then the chunks
+             restricted with `document_id $in [top documents]`
+
+Recall@k is measured against exact brute-force search in numpy. Needs only chromadb
+and numpy. Run from the `rag` directory:
+
+    python -m benchmarks.bench_two_stage --docs 500 --chunks-per-doc 100 --top-documents 10
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from src.document_centroids import CentroidDeltas, apply_delta, centroid_id
+
+
+def build_corpus(docs: int, chunks_per_doc: int, dims: int, noise: float, seed: int):
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((docs, dims)).astype(np.float32)
+    vectors = np.repeat(topics, chunks_per_doc, axis=0)
+    vectors += noise * rng.standard_normal(vectors.shape).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    document_ids = [f"doc-{d}" for d in range(docs) for _ in range(chunks_per_doc)]
+    return vectors, document_ids
+
+
+def fill(collection, vectors: np.ndarray, document_ids, batch: int = 2000) -> None:
+    for start in range(0, len(vectors), batch):
+        part = range(start, min(start + batch, len(vectors)))
+        collection.add(
+            ids=[f"c{i}" for i in part],
+            embeddings=vectors[start:start + len(part)].tolist(),
+            metadatas=[{"user_id": "1", "document_id": document_ids[i], "chunk_index": i} for i in part],
+        )
+
+
+def fill_centroids(collection, vectors: np.ndarray, document_ids) -> None:
+    deltas = CentroidDeltas()
+    deltas.add(vectors, [{"user_id": "1", "document_id": d} for d in document_ids])
+    rows = [(centroid_id(d), *apply_delta(d, None, None, delta)) for d, delta in deltas.documents.items()]
+    for start in range(0, len(rows), 2000):
+        part = rows[start:start + 2000]
+        collection.add(ids=[r[0] for r in part], embeddings=[r[1] for r in part], metadatas=[r[2] for r in part])
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.95)] * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--chunks-per-doc", type=int, default=100)
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--noise", type=float, default=0.8, help="Chunk spread around the document topic")
+    parser.add_argument("--top-documents", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import chromadb
+
+    vectors, document_ids = build_corpus(args.docs, args.chunks_per_doc, args.dims, args.noise, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = vectors[rng.integers(len(vectors), size=args.queries)]
+    queries = queries + 0.5 * args.noise * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = [set(np.argsort(-(vectors @ q))[:args.k]) for q in queries]
+    print(f"{len(vectors)} chunks, {args.docs} documents, dims={args.dims}, k={args.k}, "
+          f"top documents={args.top_documents}")
+
+    path = tempfile.mkdtemp(prefix="bench_two_stage_")
+    try:
+        client = chromadb.PersistentClient(path=path)
+        chunks = client.create_collection("chunks")
+        centroids = client.create_collection("chunks-centroids")
+        fill(chunks, vectors, document_ids)
+        fill_centroids(centroids, vectors, document_ids)
+
+        results = {"flat": ([], []), "two-stage": ([], [])}
+        for query, truth in zip(queries, exact):
+            started = time.perf_counter()
+            found = chunks.query(query_embeddings=[query.tolist()], n_results=args.k, where={"user_id": "1"})
+            results["flat"][0].append(time.perf_counter() - started)
+            results["flat"][1].append(len(truth & {int(i[1:]) for i in found["ids"][0]}) / args.k)
+
+            started = time.perf_counter()
+            top = centroids.query(query_embeddings=[query.tolist()], n_results=args.top_documents,
+                                  where={"user_id": "1"}, include=["metadatas"])
+            documents = [m["document_id"] for m in top["metadatas"][0]]
+            found = chunks.query(
+                query_embeddings=[query.tolist()], n_results=args.k,
+                where={"$and": [{"user_id": {"$eq": "1"}}, {"document_id": {"$in": documents}}]}
+            )
+            results["two-stage"][0].append(time.perf_counter() - started)
+            results["two-stage"][1].append(len(truth & {int(i[1:]) for i in found["ids"][0]}) / args.k)
+
+        for name, (latencies, recalls) in results.items():
+            p50, p95 = percentiles(latencies)
+            print(f"{name:<10} p50={p50:7.2f} ms  p95={p95:7.2f} ms  recall@{args.k}={np.mean(recalls):.3f}")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# benchmarks/eval_retrieval.py
+"""
+Recall@k, MRR and latency of hybrid retrieval settings on a fixed local corpus.
+
+The fixture (benchmarks/fixtures/retrieval_corpus.json) holds a few course documents
+split into chunks and queries with their relevant chunks ("document_id:chunk_index",
+the same key `ranking.result_key` uses). Both queries that need semantics and
+exact-term queries (course codes, formula names) are included.
+
+Retrievers are local stand-ins for the production ones:
+- vector:  exact search in numpy over embeddings from `--model` (a local model by
+           default, see src/embeddings.py), scored with squared L2 like Chroma
+- lexical: idf-weighted term overlap on the same tokens as `lexical_index.query_terms`
+           (Postgres ts_rank_cd is not available offline)
+
+For every over-fetch factor the candidate lists are fused with `ranking.fuse_hybrid`,
+exactly like `search_engine.fuse_results`. Run from the `rag` directory:
+
+    python -m benchmarks.eval_retrieval -k 5 --factors 1 2 4 8 --vector-weights 0.5 0.7 0.9
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+
+from src.embeddings import create_embeddings
+from src.ranking import fuse_hybrid
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "retrieval_corpus.json")
+
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def load_corpus(path: str):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    rows = []
+    for document in data["documents"]:
+        for index, text in enumerate(document["chunks"]):
+            rows.append({
+                "id": f"{document['id']}_{index}",
+                "content": text,
+                "metadata": {"document_id": document["id"], "chunk_index": index, "file_name": document["title"]},
+            })
+    return rows, data["queries"]
+
+
+class LexicalStandIn:
+    """idf-weighted count of query terms present in a chunk (higher is better)."""
+
+    def __init__(self, rows: List[Dict]):
+        self.rows = rows
+        self.terms = [set(_TERM_PATTERN.findall(row["content"].lower())) for row in rows]
+        frequency = Counter(term for terms in self.terms for term in terms)
+        self.idf = {term: math.log(1 + len(rows) / count) for term, count in frequency.items()}
+
+    def search(self, query: str, n_results: int) -> List[Dict]:
+        query_terms = set(_TERM_PATTERN.findall(query.lower()))
+        scored = []
+        for row, terms in zip(self.rows, self.terms):
+            score = sum(self.idf[term] for term in query_terms & terms)
+            if score > 0:
+                scored.append({**row, "score": score})
+        scored.sort(key=lambda r: r["score"], reverse=True)
+        return scored[:n_results]
+
+
+def vector_search(matrix: np.ndarray, rows: List[Dict], query_vector: np.ndarray, n_results: int) -> List[Dict]:
+    distances = np.sum((matrix - query_vector) ** 2, axis=1)
+    top = np.argsort(distances, kind="stable")[:n_results]
+    return [{**rows[i], "score": float(distances[i])} for i in top]
+
+
+def key_of(row: Dict) -> str:
+    return f"{row['metadata']['document_id']}:{row['metadata']['chunk_index']}"
+
+
+def evaluate(ranked: List[List[str]], queries: List[Dict], k: int):
+    recalls, reciprocal_ranks = [], []
+    for keys, query in zip(ranked, queries):
+        relevant = set(query["relevant"])
+        recalls.append(len(relevant & set(keys[:k])) / len(relevant))
+        first = next((i for i, key in enumerate(keys) if key in relevant), None)
+        reciprocal_ranks.append(1.0 / (first + 1) if first is not None else 0.0)
+    return float(np.mean(recalls)), float(np.mean(reciprocal_ranks))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixture", default=FIXTURE)
+    parser.add_argument("--model", default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--vector-weights", type=float, nargs="+", default=[0.5, 0.7, 0.9])
+    args = parser.parse_args()
+
+    rows, queries = load_corpus(args.fixture)
+    embedder = create_embeddings(args.model)
+    matrix = np.asarray(embedder.embed_documents([row["content"] for row in rows]), dtype=np.float32)
+    query_vectors = np.asarray(embedder.embed_documents([q["query"] for q in queries]), dtype=np.float32)
+    lexical = LexicalStandIn(rows)
+    print(f"{len(rows)} chunks, {len(queries)} queries, model={args.model}, k={args.k}")
+
+    settings = [("vector only", "weighted", (1.0, 0.0)), ("lexical only", "weighted", (0.0, 1.0)),
+                ("rrf", "rrf", (1.0, 1.0))]
+    settings += [(f"weighted {w:.2f}/{1 - w:.2f}", "weighted", (w, 1 - w)) for w in args.vector_weights]
+
+    print(f"{'factor':>6}  {'setting':<22} {'recall@k':>8} {'MRR':>6} {'fusion p50':>11} {'p95':>9}")
+    for factor in args.factors:
+        candidates = args.k * factor
+        started = time.perf_counter()
+        retrieved = [
+            (vector_search(matrix, rows, vector, candidates), lexical.search(q["query"], candidates))
+            for vector, q in zip(query_vectors, queries)
+        ]
+        retrieval_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+        for name, fusion, weights in settings:
+            ranked, latencies = [], []
+            for vector_results, lexical_results in retrieved:
+                started = time.perf_counter()
+                fused = fuse_hybrid(vector_results, lexical_results, fusion, weights)
+                latencies.append(time.perf_counter() - started)
+                ranked.append([key_of(entry["row"]) for entry in fused[:args.k]])
+            recall, mrr = evaluate(ranked, queries, args.k)
+            latencies.sort()
+            print(f"{factor:>6}  {name:<22} {recall:8.3f} {mrr:6.3f} "
+                  f"{latencies[len(latencies) // 2] * 1000:8.3f} ms {latencies[int(len(latencies) * 0.95)] * 1000:6.3f} ms")
+        print(f"{'':>6}  (retrieval of {candidates} candidates per list: {retrieval_ms:.2f} ms/query)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import asyncio
 import logging
 import uvicorn
 import redis.asyncio as redis
@@ -15,7 +16,10 @@ from src.routers import (
     study_sessions, user_flashcards, dashboard, memories, subscription, payments, workspace,
     categories, workspaces_management, notion
 )
-from src.config import Config
+from src.config import Config, GRAPH_RETRIEVAL_ENABLED, MEMORY_COMPACTION_INTERVAL, NEO4J_URI
+from src.embedding_cache import get_embedding_cache, get_query_embedding_cache
+from src.graph_store import aclose_drivers, ensure_graph_schema
+from src.memory_compaction import memory_compaction_loop
 
 
 def load_private_keys():
@@ -34,6 +38,7 @@ async def lifespan(app: FastAPI):
     load_private_keys()
 
     # Initialize Redis for caching
+    redis_client = None
     try:
         redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
         redis_client = redis.from_url(redis_url, encoding="utf-8", decode_responses=True)
@@ -50,15 +55,33 @@ async def lifespan(app: FastAPI):
         # Initialize with in-memory cache as fallback
         from fastapi_cache.backends.inmemory import InMemoryBackend
         FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+        redis_client = None
+
+    # Neo4j constraints and indexes - once per process, not on every graph ingest
+    # (only with graph retrieval on, the same switch search_engine uses)
+    if GRAPH_RETRIEVAL_ENABLED and NEO4J_URI:
+        if not await asyncio.to_thread(ensure_graph_schema):
+            logger.warning("Graph schema not ready at startup; graph ingestion will retry it.")
+
+    # Periodic long-term memory compaction (one worker per pass when Redis is available)
+    compaction_task = None
+    if MEMORY_COMPACTION_INTERVAL > 0:
+        compaction_task = asyncio.create_task(memory_compaction_loop(redis_client))
 
     yield
 
     # Shutdown
+    if compaction_task is not None:
+        compaction_task.cancel()
     try:
-        if 'redis_client' in locals():
+        if redis_client is not None:
             await redis_client.close()
     except:
         pass
+    try:
+        await aclose_drivers()
+    except Exception as e:
+        logger.warning(f"Closing Neo4j drivers failed: {e}")
     logger.info("Application shutdown complete.")
 
 
@@ -117,7 +140,13 @@ async def error_handling_middleware(request, call_next):
 # Endpoints
 @app.get("/health")
 async def health_check():
-    return {"status": "OK", "cache": "enabled" if FastAPICache.get_backend() else "disabled"}
+    embedding_cache = get_embedding_cache()
+    return {
+        "status": "OK",
+        "cache": "enabled" if FastAPICache.get_backend() else "disabled",
+        "embedding_cache": embedding_cache.stats() if embedding_cache else "disabled",
+        "query_embedding_cache": get_query_embedding_cache().stats(),
+    }
 
 
 @app.get("/")
@@ -15,7 +15,9 @@ from sqlalchemy.orm import Session
 from .agent_memory import get_conversation_history
 from .utils import set_conversation_title
 from .tools import FlashcardGenerator, RAGTool, ExamGenerator, DirectAnswer
-from ..vector_store import add_user_memory, search_user_memories
+from ..vector_store import aadd_user_memory, asearch_user_memories
+from ..embedding_cache import start_query_embedding_scope
+from ..retrieval_filters import RetrievalFilters
 from ..services.subscription import SubscriptionService
 from ..models import User
 
@@ -68,7 +70,8 @@ class ChatAgent:
 
     def __init__(self, user_id: str, conversation_id: int, openai_api_key: str, tavily_api_key: str, db: Session,
                  workspace_context: Optional[str] = None, workspace_context_source: Optional[str] = None,
-                 workspace_info: Optional[str] = None, **kwargs):
+                 workspace_info: Optional[str] = None, retrieval_filters: Optional[RetrievalFilters] = None,
+                 **kwargs):
         self.user_id = user_id
         self.conversation_id = conversation_id
         self.openai_api_key = openai_api_key
@@ -79,6 +82,8 @@ class ChatAgent:
         self.workspace_context_source = workspace_context_source
         # Workspace info (name, description, document) for LLM awareness
         self.workspace_info = workspace_info
+        # Zakres dokumentów dla RAGTool (np. kategorie workspace), patrz retrieval_filters.py
+        self.retrieval_filters = retrieval_filters
         # Note: gpt-5-nano only supports temperature=1, so we omit the parameter
         self.synthesis_model = ChatOpenAI(
             model_name="gpt-5-nano",
@@ -95,7 +100,8 @@ class ChatAgent:
                 wrapper = TavilySearchAPIWrapper(tavily_api_key=self.tavily_api_key)
                 tool = TavilySearchResults(api_wrapper=wrapper, max_results=3)
             elif tool_name == "RAGTool":
-                tool = RAGTool(user_id=str(self.user_id), api_key=self.openai_api_key)
+                tool = RAGTool(user_id=str(self.user_id), api_key=self.openai_api_key,
+                               filters=self.retrieval_filters)
             elif tool_name == "FlashcardGenerator":
                 tool = FlashcardGenerator(user_id=str(self.user_id), api_key=self.openai_api_key)
             elif tool_name == "ExamGenerator":
@@ -213,6 +219,8 @@ Uwaga: Pracujesz w kontekście specyficznego workspace użytkownika.
 
     async def invoke(self, query: str, selected_tool_names: List[str]):
         logger.info("========== AGENT INVOKE START ==========")
+        # Wspólny cache embeddingów zapytania dla wyszukiwania pamięci i RAG w tej turze
+        start_query_embedding_scope()
 
         # 0. SPRAWDZENIE LIMITÓW SUBSKRYPCJI
         try:
@@ -232,7 +240,7 @@ Uwaga: Pracujesz w kontekście specyficznego workspace użytkownika.
         # 1. PRZYGOTOWANIE I PAMIĘĆ
         yield {"type": "step", "content": "Analizowanie kontekstu i profilu...", "status": "loading"}
 
-        memories = search_user_memories(query=query, user_id=self.user_id, n_results=5)
+        memories = await asearch_user_memories(query=query, user_id=self.user_id, n_results=5)
         memory_context = f"PROFIL UŻYTKOWNIKA:\n{chr(10).join(['- ' + m for m in memories])}" if memories else ""
 
         history_messages = get_conversation_history(self.conversation_id, 8)
@@ -352,7 +360,7 @@ Uwaga: Pracujesz w kontekście specyficznego workspace użytkownika.
             extractor = MemoryExtractor(api_key=self.openai_api_key)
             facts = await extractor.extract_memories(text)
             for fact in facts:
-                add_user_memory(user_id=self.user_id, text=fact, importance=0.8)
+                await aadd_user_memory(user_id=self.user_id, text=fact, importance=0.8)
             if facts: logger.info(f"[MEMORY] Zapisano {len(facts)} nowych faktów.")
         except Exception as e:
             logger.error(f"Memory update failed: {e}")
@@ -9,7 +9,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 
 from ..models import Base, Conversation, Message
-from ..database import DATABASE_URL
+from ..database import DATABASE_URL, add_missing_columns, add_missing_indexes
 
 logger = logging.getLogger(__name__)
 
@@ -17,8 +17,10 @@ logger = logging.getLogger(__name__)
 engine = create_engine(DATABASE_URL)
 SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
 
-# Inicjalizacja tabel (jeśli nie istnieją)
+# Inicjalizacja tabel (jeśli nie istnieją) oraz kolumn i indeksów dodanych do istniejących tabel
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine, Base.metadata)
+add_missing_indexes(engine, Base.metadata)
 
 
 def create_memory(user_id: str, title: Optional[str] = None) -> Type[Conversation] | Conversation:
@@ -1,9 +1,9 @@
+import asyncio
 import json
 import logging
 import os
 import re
 import uuid
-import asyncio
 from typing import List, Tuple, Any, Dict, Optional
 
 import redis.asyncio as redis
@@ -18,7 +18,10 @@ from langchain_core.messages import SystemMessage, HumanMessage
 # Zakładamy strukturę projektu, w której modele i search_engine są w katalogu nadrzędnym
 from ..models import Exam, ExamQuestion, ExamAnswer, Deck, Flashcard
 from ..database import SessionLocal
-from ..search_engine import search_and_rerank
+from ..config import QUERY_FANOUT_MODE
+from ..query_fanout import afanout_search, aplan_subqueries
+from ..retrieval_cache import corpus_version, retrieval_cache_key
+from ..retrieval_filters import RetrievalFilters
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -261,10 +264,12 @@ class RAGTool(BaseTool):
     description: str = "Retrieves factual information from the user's uploaded documents."
     user_id: str = Field(..., description="User ID")
     api_key: str = Field(..., description="API key")
+    filters: Optional[RetrievalFilters] = Field(None, description="Scope of searched documents")
     _model: Any = PrivateAttr()
 
-    def __init__(self, user_id: str, api_key: str, model_name: str = "gpt-5-nano"):
-        super().__init__(user_id=user_id, api_key=api_key)
+    def __init__(self, user_id: str, api_key: str, model_name: str = "gpt-5-nano",
+                 filters: Optional[RetrievalFilters] = None):
+        super().__init__(user_id=user_id, api_key=api_key, filters=filters)
         self.user_id = user_id
         # Note: gpt-5-nano only supports temperature=1, so we omit the parameter
         self._model = ChatOpenAI(model_name=model_name, openai_api_key=api_key)
@@ -272,11 +277,18 @@ class RAGTool(BaseTool):
     async def _run(self, query: str) -> str:
         try:
             redis_client = await init_redis()
-            cache_key = f"rag:{self.user_id}:{hash(query)}"
-            if cached_result := await redis_client.get(cache_key):
+            # Odpowiedź zależy od dokumentów użytkownika - klucz zawiera wersję korpusu
+            version = await asyncio.to_thread(corpus_version, self.user_id)
+            cache_key = None
+            if version:
+                cache_key = "rag:" + retrieval_cache_key(self.user_id, query, version,
+                                                         filters=self.filters, fanout=QUERY_FANOUT_MODE)
+            if cache_key and (cached_result := await redis_client.get(cache_key)):
                 return cached_result.decode()
 
-            results = await asyncio.to_thread(search_and_rerank, query, user_id=self.user_id, n_results=5)
+            # Pytania wieloczęściowe ("porównaj X i Y") - osobne wyszukiwanie dla każdego aspektu
+            subqueries = await aplan_subqueries(query, self._model)
+            results = await afanout_search(subqueries, user_id=self.user_id, n_results=5, filters=self.filters)
             passages = [r.get('content', '') for r in results if r.get('content')]
 
             if not passages:
@@ -290,7 +302,8 @@ class RAGTool(BaseTool):
                 [SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)])
             result = response.content.strip()
 
-            await redis_client.setex(cache_key, 3600, result)
+            if cache_key:
+                await redis_client.setex(cache_key, 3600, result)
             return result
         except Exception as e:
             logger.error(f"RAG Error: {e}")
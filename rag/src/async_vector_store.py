@@ -0,0 +1,208 @@
+# async_vector_store.py
+"""
+Native asyncio access to ChromaDB collections.
+
+Remote mode uses `chromadb.AsyncHttpClient` (one pooled HTTP client per worker).
+Local mode wraps the synchronous `PersistentClient` and runs every call on a
+bounded thread pool, so no Chroma call ever blocks the event loop.
+
+Every call has a timeout, so one slow Chroma request fails fast instead of
+stalling all other requests handled by the worker.
+
+The lock, the async HTTP client and the collection handles are bound to an event loop,
+so `AsyncVectorStore` keeps them per running loop. CLIs that call `asyncio.run` more
+than once (reindex, backfills, the sync `create_vector_store`) get fresh ones each time.
+"""
+
+import asyncio
+import functools
+import logging
+import weakref
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import chromadb
+from chromadb.config import Settings
+
+from .config import CHROMA_CALL_TIMEOUT, CHROMA_HTTP_MAX_CONNECTIONS, CHROMA_LOCAL_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCollection(ABC):
+    """Asynchronous subset of the Chroma collection API used by the application."""
+
+    def __init__(self, name: str, timeout: float):
+        self.name = name
+        self.timeout = timeout
+
+    @abstractmethod
+    async def _call(self, method: str, **kwargs) -> Any:
+        """Runs the collection method `method` with `kwargs` (with the timeout)."""
+
+    async def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+                  metadatas: List[Dict[str, Any]]) -> None:
+        await self._call("add", ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    async def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+                     metadatas: List[Dict[str, Any]]) -> None:
+        await self._call("upsert", ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    async def update(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        await self._call("update", ids=ids, metadatas=metadatas)
+
+    async def query(self, query_embeddings: List[List[float]], n_results: int,
+                    where: Optional[Dict[str, Any]] = None,
+                    include: Optional[List[str]] = None) -> Dict[str, Any]:
+        return await self._call(
+            "query",
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=include or ["documents", "metadatas", "distances"]
+        )
+
+    async def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+                  limit: Optional[int] = None, offset: Optional[int] = None,
+                  include: Optional[List[str]] = None) -> Dict[str, Any]:
+        return await self._call(
+            "get",
+            ids=ids,
+            where=where,
+            limit=limit,
+            offset=offset,
+            include=include if include is not None else ["documents", "metadatas"]
+        )
+
+    async def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        await self._call("delete", ids=ids, where=where)
+
+
+class RemoteAsyncCollection(AsyncCollection):
+    """Collection backed by `chromadb.AsyncHttpClient`."""
+
+    def __init__(self, collection, timeout: float):
+        super().__init__(collection.name, timeout)
+        self._collection = collection
+
+    async def _call(self, method: str, **kwargs) -> Any:
+        return await asyncio.wait_for(getattr(self._collection, method)(**kwargs), timeout=self.timeout)
+
+
+class ThreadedAsyncCollection(AsyncCollection):
+    """Collection backed by a synchronous client, executed on a dedicated thread pool."""
+
+    def __init__(self, collection, executor: ThreadPoolExecutor, timeout: float):
+        super().__init__(collection.name, timeout)
+        self._collection = collection
+        self._executor = executor
+
+    async def _call(self, method: str, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        call = functools.partial(getattr(self._collection, method), **kwargs)
+        return await asyncio.wait_for(loop.run_in_executor(self._executor, call), timeout=self.timeout)
+
+
+def is_missing_collection(error: Exception) -> bool:
+    """Whether `error` means "no such collection" (ValueError before chromadb 0.6, then dedicated errors)."""
+    return isinstance(error, ValueError) or type(error).__name__ in ("NotFoundError", "InvalidCollectionException")
+
+
+class _LoopState:
+    """Objects of `AsyncVectorStore` bound to one event loop."""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.remote_client = None
+        self.collections: Dict[str, AsyncCollection] = {}
+
+
+class AsyncVectorStore:
+    """
+    Factory of `AsyncCollection` objects for the configured Chroma deployment.
+
+    Args:
+        client_settings: Result of `config.get_chroma_client_settings()`.
+        sync_client: Synchronous client used in local mode (shared with the sync code paths).
+    """
+
+    def __init__(self, client_settings: Dict[str, Any], sync_client=None,
+                 timeout: float = CHROMA_CALL_TIMEOUT, pool_size: int = CHROMA_LOCAL_POOL_SIZE):
+        self.client_settings = client_settings
+        self.sync_client = sync_client
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Pętla zdarzeń -> jej klient/uchwyty; wpis znika razem z zamkniętą pętlą
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
+    @property
+    def is_remote(self) -> bool:
+        return self.client_settings['mode'] == 'remote'
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = self._loops[loop] = _LoopState()
+        return state
+
+    async def _get_remote_client(self, state: _LoopState):
+        if state.remote_client is None:
+            logger.info(
+                f"Connecting async ChromaDB client to {self.client_settings['host']}:{self.client_settings['port']}"
+            )
+            state.remote_client = await chromadb.AsyncHttpClient(
+                host=self.client_settings['host'],
+                port=self.client_settings['port'],
+                ssl=self.client_settings['ssl'],
+                settings=Settings(
+                    anonymized_telemetry=False,
+                    allow_reset=False,
+                    chroma_http_max_connections=CHROMA_HTTP_MAX_CONNECTIONS,
+                    chroma_http_max_keepalive_connections=CHROMA_HTTP_MAX_CONNECTIONS,
+                )
+            )
+        return state.remote_client
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="chroma")
+        return self._executor
+
+    async def collection(self, name: str, create: bool = True) -> Optional[AsyncCollection]:
+        """
+        Returns (and caches per event loop) the async collection `name`, creating it if needed.
+        With `create=False` a missing collection is None, so read paths never create empty collections.
+        """
+        state = self._state()
+        if name in state.collections:
+            return state.collections[name]
+
+        async with state.lock:
+            if name not in state.collections:
+                try:
+                    state.collections[name] = await self._open(state, name, create)
+                except Exception as e:
+                    if create or not is_missing_collection(e):
+                        raise
+                    return None
+        return state.collections[name]
+
+    async def _open(self, state: _LoopState, name: str, create: bool) -> AsyncCollection:
+        if self.is_remote:
+            remote_client = await self._get_remote_client(state)
+            opener = remote_client.get_or_create_collection if create else remote_client.get_collection
+            raw = await asyncio.wait_for(opener(name=name, embedding_function=None), timeout=self.timeout)
+            return RemoteAsyncCollection(raw, self.timeout)
+        opener = self.sync_client.get_or_create_collection if create else self.sync_client.get_collection
+        raw = await asyncio.get_running_loop().run_in_executor(
+            self._get_executor(), functools.partial(opener, name=name, embedding_function=None)
+        )
+        return ThreadedAsyncCollection(raw, self._get_executor(), self.timeout)
+
+    def forget(self, name: str) -> None:
+        """Drops a cached collection handle (e.g. after the collection was deleted or swapped)."""
+        for state in list(self._loops.values()):
+            state.collections.pop(name, None)
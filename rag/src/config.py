@@ -20,14 +20,163 @@ USE_REMOTE_CHROMA = bool(CHROMA_HOST or CHROMA_PRIVATE_URL or CHROMA_PUBLIC_URL)
 # Local persist directory (only used when not using remote ChromaDB)
 PERSIST_DIRECTORY = os.getenv('PERSIST_DIRECTORY', "/app/vector_store_data")
 
+# Async ChromaDB access: per-call timeout (seconds), HTTP pool size (remote)
+# and thread pool size for the local PersistentClient
+CHROMA_CALL_TIMEOUT = float(os.getenv('CHROMA_CALL_TIMEOUT', "10"))
+CHROMA_HTTP_MAX_CONNECTIONS = int(os.getenv('CHROMA_HTTP_MAX_CONNECTIONS', "32"))
+CHROMA_LOCAL_POOL_SIZE = int(os.getenv('CHROMA_LOCAL_POOL_SIZE', "8"))
+
+# Vector collection partitioning: "single" (shared collection), "user" (one per user)
+# or "bucket" (users hashed into VECTOR_PARTITION_BUCKETS collections).
+# Keep VECTOR_PARTITION_DUAL_READ=true until `python -m src.vector_partitioning migrate` has run.
+VECTOR_PARTITION_MODE = os.getenv('VECTOR_PARTITION_MODE', "single").lower()
+VECTOR_PARTITION_BUCKETS = int(os.getenv('VECTOR_PARTITION_BUCKETS', "64"))
+VECTOR_PARTITION_DUAL_READ = os.getenv('VECTOR_PARTITION_DUAL_READ', "true").lower() == "true"
+
+# Vector index generations (src/reindex.py): how often workers re-read which generation is active
+VECTOR_GENERATION_CACHE_TTL = float(os.getenv('VECTOR_GENERATION_CACHE_TTL', "30"))
+# Reindex job throttling
+REINDEX_BATCH_DOCUMENTS = int(os.getenv('REINDEX_BATCH_DOCUMENTS', "20"))
+REINDEX_MAX_CHUNKS_PER_SECOND = float(os.getenv('REINDEX_MAX_CHUNKS_PER_SECOND', "50"))
+REINDEX_MAX_CONCURRENCY = int(os.getenv('REINDEX_MAX_CONCURRENCY', "2"))
+
 # Neo4j settings
 NEO4J_URI = os.getenv('NEO4J_URI', "bolt://localhost:7687")
 NEO4J_USERNAME = os.getenv('NEO4J_USERNAME', "neo4j")
 NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD', "password")
+# Connection pool of the Neo4j drivers (sync for ingestion, async for search). A request that
+# cannot get a connection within the acquisition timeout fails instead of queueing behind others.
+NEO4J_MAX_POOL_SIZE = int(os.getenv('NEO4J_MAX_POOL_SIZE', "50"))
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = float(os.getenv('NEO4J_CONNECTION_ACQUISITION_TIMEOUT', "2"))
+NEO4J_CONNECTION_TIMEOUT = float(os.getenv('NEO4J_CONNECTION_TIMEOUT', "5"))
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.getenv('NEO4J_MAX_CONNECTION_LIFETIME', "3600"))
+# Per-lookup timeout of search_graph_store (entity, relation and chunk indexes run concurrently)
+GRAPH_SEARCH_QUERY_TIMEOUT_MS = float(os.getenv('GRAPH_SEARCH_QUERY_TIMEOUT_MS', "1000"))
+# Rows per UNWIND batch (one managed write transaction each) in graph ingestion
+GRAPH_INGEST_BATCH_SIZE = int(os.getenv('GRAPH_INGEST_BATCH_SIZE', "500"))
+# After a failed graph schema bootstrap, ingestion retries the DDL at most once per this many seconds
+GRAPH_SCHEMA_RETRY_INTERVAL = float(os.getenv('GRAPH_SCHEMA_RETRY_INTERVAL', "300"))
 
 # LLM model
 LLM_MODEL_NAME = os.getenv('LLM_MODEL_NAME', "claude-3-haiku-20240307")
 
+# Redis (shared cache between workers)
+REDIS_URL = os.getenv('REDIS_URL', "redis://localhost:6379")
+
+# Embedding model used for documents and memories
+EMBEDDING_MODEL_NAME = os.getenv('RAG_EMBEDDING_MODEL', "text-embedding-3-large")
+# Matryoshka truncation via the API `dimensions` parameter (e.g. 256/512/1024; 0 = native 3072).
+# Changing it requires re-embedding existing collections (Chroma rejects mixed dimensions).
+EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', "0")) or None
+
+# The provider follows the model name (src/embeddings.py): "text-embedding-*" uses the OpenAI API,
+# any other name (Hugging Face id, local path or "local:<name>") runs on CPU with sentence-transformers.
+# `user-memories` may use its own model; empty = same model as documents. It applies to the legacy
+# collections and is recorded on a generation at `reindex start` - an existing generation keeps its
+# model, so switching requires a reindex (src/reindex.py), and MEMORY_DEDUP_MIN_SIMILARITY /
+# MEMORY_MERGE_MIN_SIMILARITY may need retuning, since cosine scales differ between models.
+MEMORY_EMBEDDING_MODEL = os.getenv('MEMORY_EMBEDDING_MODEL', "")
+MEMORY_EMBEDDING_DIMENSIONS = int(os.getenv('MEMORY_EMBEDDING_DIMENSIONS', "0")) or None
+LOCAL_EMBEDDING_BACKEND = os.getenv('LOCAL_EMBEDDING_BACKEND', "torch").lower()  # "torch" or "onnx"
+LOCAL_EMBEDDING_DEVICE = os.getenv('LOCAL_EMBEDDING_DEVICE', "cpu")
+# Dynamic batching of concurrent requests to a local model
+LOCAL_EMBEDDING_MAX_BATCH_SIZE = int(os.getenv('LOCAL_EMBEDDING_MAX_BATCH_SIZE', "64"))
+LOCAL_EMBEDDING_MAX_WAIT_MS = float(os.getenv('LOCAL_EMBEDDING_MAX_WAIT_MS', "5"))
+
+# Quantized first-pass search over document vectors: "none", "int8" or "binary".
+# The top n_results * VECTOR_RESCORE_FACTOR candidates are rescored with full-precision vectors.
+VECTOR_QUANTIZATION = os.getenv('VECTOR_QUANTIZATION', "none").lower()
+VECTOR_QUANTIZATION_PATH = os.getenv('VECTOR_QUANTIZATION_PATH', "/app/vector_store_data/quantized_codes.sqlite3")
+VECTOR_RESCORE_FACTOR = int(os.getenv('VECTOR_RESCORE_FACTOR', "4"))
+# Codes are a local per-host SQLite file - not shareable between replicas. The first pass is used
+# only while the codes cover all of the user's vectors in Chroma; the check is cached this long.
+VECTOR_QUANTIZATION_COVERAGE_TTL = float(os.getenv('VECTOR_QUANTIZATION_COVERAGE_TTL', "60"))
+
+# Two-stage retrieval: nearest document centroids first, then chunks of those documents only
+# (src/document_centroids.py). Users with fewer documents than the minimum keep the flat search.
+VECTOR_TWO_STAGE_ENABLED = os.getenv('VECTOR_TWO_STAGE_ENABLED', "false").lower() == "true"
+VECTOR_TWO_STAGE_TOP_DOCUMENTS = int(os.getenv('VECTOR_TWO_STAGE_TOP_DOCUMENTS', "10"))
+VECTOR_TWO_STAGE_MIN_DOCUMENTS = int(os.getenv('VECTOR_TWO_STAGE_MIN_DOCUMENTS', "50"))
+
+# Hybrid search: Postgres full-text index over document sections (src/lexical_index.py),
+# queried next to vector search and merged with reciprocal rank fusion (src/ranking.py)
+LEXICAL_SEARCH_ENABLED = os.getenv('LEXICAL_SEARCH_ENABLED', "true").lower() == "true"
+# Each retriever returns n_results * SEARCH_OVERFETCH_FACTOR candidates for fusion/reranking.
+SEARCH_OVERFETCH_FACTOR = int(os.getenv('SEARCH_OVERFETCH_FACTOR', "4"))
+# Fusion: "weighted" (normalized scores, weights below) or "rrf" (ranks only)
+HYBRID_FUSION = os.getenv('HYBRID_FUSION', "weighted").lower()
+HYBRID_VECTOR_WEIGHT = float(os.getenv('HYBRID_VECTOR_WEIGHT', "0.7"))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv('HYBRID_LEXICAL_WEIGHT', "0.3"))
+# Neo4j entity graph as a third retriever (src/graph_store.py): entities matching the query
+# expand to the chunks that mention them. Results later than the timeout are left out.
+GRAPH_RETRIEVAL_ENABLED = os.getenv('GRAPH_RETRIEVAL_ENABLED', "false").lower() == "true"
+GRAPH_RETRIEVAL_WEIGHT = float(os.getenv('GRAPH_RETRIEVAL_WEIGHT', "0.2"))
+GRAPH_RETRIEVAL_TIMEOUT_MS = float(os.getenv('GRAPH_RETRIEVAL_TIMEOUT_MS', "250"))
+
+# Optional cross-encoder reranking of the fused candidates (src/reranker.py).
+# The best RERANKER_CANDIDATES are rescored within RERANKER_TIME_BUDGET_MS, otherwise fused order is kept.
+RERANKER_ENABLED = os.getenv('RERANKER_ENABLED', "false").lower() == "true"
+RERANKER_MODEL = os.getenv('RERANKER_MODEL', "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANKER_BACKEND = os.getenv('RERANKER_BACKEND', "onnx").lower()  # "torch" or "onnx"
+RERANKER_CANDIDATES = int(os.getenv('RERANKER_CANDIDATES', "20"))
+RERANKER_BATCH_SIZE = int(os.getenv('RERANKER_BATCH_SIZE', "16"))
+RERANKER_MAX_LENGTH = int(os.getenv('RERANKER_MAX_LENGTH', "256"))  # tokens per (query, chunk) pair
+RERANKER_TIME_BUDGET_MS = float(os.getenv('RERANKER_TIME_BUDGET_MS', "200"))
+# Assumed cost of one pair until the first batch has been timed (kept on the slow side)
+RERANKER_COLD_MS_PER_PAIR = float(os.getenv('RERANKER_COLD_MS_PER_PAIR', "5"))
+
+# Maximal marginal relevance: final results are picked from n_results * MMR_POOL_FACTOR fused
+# candidates using the stored chunk vectors. MMR_LAMBDA = 1 keeps pure relevance order.
+MMR_ENABLED = os.getenv('MMR_ENABLED', "true").lower() == "true"
+MMR_LAMBDA = float(os.getenv('MMR_LAMBDA', "0.7"))
+MMR_POOL_FACTOR = int(os.getenv('MMR_POOL_FACTOR', "3"))
+
+# Cache of final retrieval results, invalidated by a per-user corpus version (src/retrieval_cache.py)
+# Backends: "redis" (falls back to in-process when unreachable), "memory" (in-process), "none"
+RETRIEVAL_CACHE_BACKEND = os.getenv('RETRIEVAL_CACHE_BACKEND', "redis").lower()
+RETRIEVAL_CACHE_TTL = float(os.getenv('RETRIEVAL_CACHE_TTL', "3600"))
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv('RETRIEVAL_CACHE_MAX_ENTRIES', "2048"))
+
+# Multi-query fan-out of RAG questions (src/query_fanout.py)
+# Modes: "heuristic" (split on comparisons/enumerations), "llm" (one cheap LLM call), "off"
+QUERY_FANOUT_MODE = os.getenv('QUERY_FANOUT_MODE', "heuristic").lower()
+QUERY_FANOUT_MAX_SUBQUERIES = int(os.getenv('QUERY_FANOUT_MAX_SUBQUERIES', "3"))
+QUERY_FANOUT_DEADLINE_MS = float(os.getenv('QUERY_FANOUT_DEADLINE_MS', "2500"))  # sub-queries slower than this are dropped
+QUERY_FANOUT_LLM_TIMEOUT_MS = float(os.getenv('QUERY_FANOUT_LLM_TIMEOUT_MS', "1500"))
+
+# Content-addressed embedding cache (sits in front of the embedding API)
+# Backends: "sqlite" (local file), "redis" (shared between workers), "none" (disabled)
+EMBEDDING_CACHE_BACKEND = os.getenv('EMBEDDING_CACHE_BACKEND', "sqlite").lower()
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', "/app/embedding_cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', "50000"))
+
+# Query embedding memoization (bounded TTL cache shared across requests)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', "2048"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv('QUERY_EMBEDDING_CACHE_TTL', "3600"))
+
+# Ingestion embedding pipeline (batches are embedded concurrently and upserted as they complete)
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', "64"))
+INGEST_MAX_BATCH_TOKENS = int(os.getenv('INGEST_MAX_BATCH_TOKENS', "60000"))
+INGEST_MAX_CONCURRENCY = int(os.getenv('INGEST_MAX_CONCURRENCY', "4"))
+INGEST_MAX_TOKENS_IN_FLIGHT = int(os.getenv('INGEST_MAX_TOKENS_IN_FLIGHT', "200000"))
+INGEST_MAX_RETRIES = int(os.getenv('INGEST_MAX_RETRIES', "3"))
+
+# Near-duplicate chunk filter (SimHash) applied before embedding.
+# Scope "document" compares chunks of one upload; "user" also skips chunks the user already has
+# stored (note: deleting the file that holds the kept copy removes it for both files).
+CHUNK_DEDUP_ENABLED = os.getenv('CHUNK_DEDUP_ENABLED', "true").lower() == "true"
+CHUNK_DEDUP_SCOPE = os.getenv('CHUNK_DEDUP_SCOPE', "document").lower()
+CHUNK_DEDUP_MAX_DISTANCE = int(os.getenv('CHUNK_DEDUP_MAX_DISTANCE', "3"))  # bits out of 64
+
+# Long-term memory: similarity upsert on write and periodic compaction
+MEMORY_DEDUP_MIN_SIMILARITY = float(os.getenv('MEMORY_DEDUP_MIN_SIMILARITY', "0.92"))  # cosine
+MEMORY_IMPORTANCE_BUMP = float(os.getenv('MEMORY_IMPORTANCE_BUMP', "0.05"))
+MEMORY_MERGE_MIN_SIMILARITY = float(os.getenv('MEMORY_MERGE_MIN_SIMILARITY', "0.88"))  # cosine, compaction
+MEMORY_MAX_PER_USER = int(os.getenv('MEMORY_MAX_PER_USER', "200"))
+MEMORY_STALE_DAYS = int(os.getenv('MEMORY_STALE_DAYS', "90"))
+MEMORY_STALE_MAX_IMPORTANCE = float(os.getenv('MEMORY_STALE_MAX_IMPORTANCE', "0.3"))
+MEMORY_COMPACTION_INTERVAL = float(os.getenv('MEMORY_COMPACTION_INTERVAL', "21600"))  # seconds, 0 = disabled
+
 
 def get_chroma_client_settings():
     """
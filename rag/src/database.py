@@ -1,7 +1,9 @@
 # src/database.py
 
 import os
-from sqlalchemy import create_engine
+import logging
+
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
@@ -28,3 +30,48 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Utwórz bazę deklaratywną
 Base = declarative_base()
+
+
+logger = logging.getLogger(__name__)
+
+
+def add_missing_columns(bind, metadata) -> None:
+    """
+    Dodaje do istniejących tabel kolumny dopisane później do modeli.
+    `create_all` tworzy tylko brakujące tabele, a projekt nie używa migracji.
+    Obsługuje wyłącznie zmiany addytywne: kolumny nullable (bez wartości domyślnej po stronie bazy).
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN IF NOT EXISTS "{column.name}" {column_type}'))
+                logger.info(f"Added column {table.name}.{column.name} ({column_type})")
+                if column.index:
+                    conn.execute(text(
+                        f'CREATE INDEX IF NOT EXISTS "ix_{table.name}_{column.name}" ON "{table.name}" ("{column.name}")'
+                    ))
+
+
+def add_missing_indexes(bind, metadata) -> None:
+    """
+    Tworzy indeksy dopisane później do modeli w już istniejących tabelach
+    (np. indeks pełnotekstowy sekcji). Budowa indeksu na dużej tabeli blokuje na ten czas zapisy.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in present:
+                index.create(bind=bind)
+                logger.info(f"Created index {index.name} on {table.name}")
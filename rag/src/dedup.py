@@ -0,0 +1,131 @@
+# dedup.py
+"""
+Near-duplicate chunk detection with SimHash.
+
+Slide decks and scanned notes produce chunks that differ only in page numbers,
+whitespace or the overlap with their neighbour. Each chunk gets a 64-bit SimHash of
+its normalized word shingles. Two chunks are near-duplicates when their hashes differ
+in at most CHUNK_DEDUP_MAX_DISTANCE bits.
+
+Page markers ("Strona 12", "- 4 -", "3/20") are dropped before hashing, other numbers
+are not: the SimHash is XOR-ed with a fingerprint of the chunk's numbers, so chunks
+that differ only in figures (tables, price lists, exercises) stay about 32 bits apart,
+while chunks with the same numbers keep their exact distance.
+
+Candidates are found with LSH banding. The hash is split into max_distance + 1 bands,
+and two hashes within the distance must agree on at least one band (pigeonhole), so
+only chunks sharing a band are compared.
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .config import CHUNK_DEDUP_MAX_DISTANCE
+
+_HASH_BITS = 64
+_SHINGLE_WORDS = 3
+
+
+# "Strona 12", "str. 3", "Page 4 of 20", "Slajd 7/30" anywhere, and lines holding only "12", "- 4 -" or "3/20"
+_PAGE_MARKER = re.compile(
+    r'\b(?:strona|str\.|page|p\.|slajd|slide)\s*\d+(?:\s*(?:/|z|of)\s*\d+)?\b'
+    r'|^[\s\-–—]*\d+(?:\s*/\s*\d+)?[\s\-–—]*$',
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def normalize_for_dedup(text: str) -> str:
+    """Lowercases and drops page markers/punctuation, so pagination and formatting do not matter."""
+    text = _PAGE_MARKER.sub(' ', text).lower()
+    return re.sub(r'[\W_]+', ' ', text).strip()
+
+
+def _numbers_fingerprint(normalized: str) -> int:
+    numbers = re.findall(r'\d+', normalized)
+    if not numbers:
+        return 0
+    return int.from_bytes(hashlib.blake2b(" ".join(numbers).encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(text: str, shingle_words: int = _SHINGLE_WORDS) -> int:
+    """64-bit SimHash of the word shingles of `text`, XOR-ed with the fingerprint of its numbers."""
+    normalized = normalize_for_dedup(text)
+    words = normalized.split()
+    if not words:
+        return 0
+    shingles = [" ".join(words[i:i + shingle_words]) for i in range(max(1, len(words) - shingle_words + 1))]
+
+    weights = [0] * _HASH_BITS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(_HASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0) ^ _numbers_fingerprint(normalized)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex:
+    """LSH index answering "is there a stored hash within `max_distance` bits?"."""
+
+    def __init__(self, max_distance: int = CHUNK_DEDUP_MAX_DISTANCE):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width = _HASH_BITS // bands
+        self._bands: List[Tuple[int, int]] = [
+            (i * width, width if i < bands - 1 else _HASH_BITS - i * width) for i in range(bands)
+        ]
+        self._buckets: List[Dict[int, List[Tuple[int, int]]]] = [{} for _ in self._bands]
+
+    def _keys(self, value: int) -> List[int]:
+        return [(value >> shift) & ((1 << width) - 1) for shift, width in self._bands]
+
+    def add(self, value: int, key: int) -> None:
+        for band, band_key in enumerate(self._keys(value)):
+            self._buckets[band].setdefault(band_key, []).append((value, key))
+
+    def find(self, value: int) -> Optional[int]:
+        """Key of a stored near-duplicate of `value`, or None."""
+        for band, band_key in enumerate(self._keys(value)):
+            for stored, key in self._buckets[band].get(band_key, ()):
+                if hamming_distance(value, stored) <= self.max_distance:
+                    return key
+        return None
+
+
+@dataclass
+class DedupResult:
+    """Which chunks to embed; `duplicate_of` maps skipped chunk index -> kept index (-1: stored earlier)."""
+    hashes: List[int]
+    kept: List[int] = field(default_factory=list)
+    duplicate_of: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def collapsed(self) -> int:
+        return len(self.duplicate_of)
+
+
+def find_near_duplicates(chunks: List[str], max_distance: int = CHUNK_DEDUP_MAX_DISTANCE,
+                         known_hashes: Iterable[int] = ()) -> DedupResult:
+    """
+    Keeps the first chunk of every group of near-duplicates.
+    `known_hashes` (e.g. the user's already stored chunks) mark chunks as duplicates too.
+    """
+    index = SimHashIndex(max_distance)
+    for value in known_hashes:
+        index.add(value, -1)
+
+    result = DedupResult(hashes=[simhash(chunk) for chunk in chunks])
+    for i, value in enumerate(result.hashes):
+        match = index.find(value) if value else None
+        if match is not None:
+            result.duplicate_of[i] = match
+            continue
+        index.add(value, i)
+        result.kept.append(i)
+    return result
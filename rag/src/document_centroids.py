@@ -0,0 +1,162 @@
+# document_centroids.py
+"""
+Per-document centroid vectors for two-stage (coarse-to-fine) retrieval.
+
+Every chunk collection "<base>..." has a companion "<base>-centroids..." collection
+(same generation and partition suffix) holding one vector per document: the
+normalized mean of its chunk vectors. Metadata keeps `chunk_count` and the mean's
+`norm`, so the exact mean can be restored and updated incrementally:
+
+    mean' = (mean * n + sum(added) - sum(removed)) / (n + added - removed)
+
+With VECTOR_TWO_STAGE_ENABLED, a search first picks the VECTOR_TWO_STAGE_TOP_DOCUMENTS
+nearest centroids and then searches chunks of those documents only. Users with fewer
+than VECTOR_TWO_STAGE_MIN_DOCUMENTS documents keep the flat search.
+
+Only vectors with `document_id` metadata take part (written since the document
+registry, or by a reindex). Centroids for already stored vectors are built with,
+from the `rag` directory:
+
+    python -m src.document_centroids backfill
+"""
+
+import argparse
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CENTROID_SUFFIX = "-centroids"
+
+
+def centroid_collection(chunk_collection: str, base_name: str) -> str:
+    """"torched-rag-g3-u-5" -> "torched-rag-centroids-g3-u-5" (generation and partition are kept)."""
+    return f"{base_name}{CENTROID_SUFFIX}{chunk_collection[len(base_name):]}"
+
+
+def centroid_id(document_id: str) -> str:
+    return f"doc_{document_id}"
+
+
+@dataclass
+class CentroidDelta:
+    """Sums of chunk vectors added to / removed from one document."""
+    user_id: str
+    added: Optional[np.ndarray] = None
+    removed: Optional[np.ndarray] = None
+    added_count: int = 0
+    removed_count: int = 0
+
+
+@dataclass
+class CentroidDeltas:
+    """Collects per-document deltas from batches of (vector, metadata) pairs."""
+    documents: Dict[str, CentroidDelta] = field(default_factory=dict)
+
+    def _delta(self, metadata: Dict[str, Any]) -> Optional[CentroidDelta]:
+        document_id = metadata.get("document_id")
+        if not document_id:
+            return None
+        if document_id not in self.documents:
+            self.documents[document_id] = CentroidDelta(user_id=str(metadata.get("user_id", "")))
+        return self.documents[document_id]
+
+    def add(self, vectors: Sequence[Sequence[float]], metadatas: List[Dict[str, Any]], sign: int = 1) -> None:
+        for vector, metadata in zip(vectors, metadatas):
+            delta = self._delta(metadata or {})
+            if delta is None:
+                continue
+            vector = np.asarray(vector, dtype=np.float64)
+            if sign > 0:
+                delta.added = vector if delta.added is None else delta.added + vector
+                delta.added_count += 1
+            else:
+                delta.removed = vector if delta.removed is None else delta.removed + vector
+                delta.removed_count += 1
+
+    def remove(self, vectors: Sequence[Sequence[float]], metadatas: List[Dict[str, Any]]) -> None:
+        self.add(vectors, metadatas, sign=-1)
+
+
+def apply_delta(document_id: str, stored_vector: Optional[Sequence[float]], stored_meta: Optional[Dict[str, Any]],
+                delta: CentroidDelta) -> Optional[Tuple[List[float], Dict[str, Any]]]:
+    """
+    New (normalized vector, metadata) of a centroid after `delta`, or None when the
+    document has no chunks left.
+    """
+    count = int((stored_meta or {}).get("chunk_count", 0)) if stored_vector is not None else 0
+    total = np.zeros(0)
+    if count:
+        total = np.asarray(stored_vector, dtype=np.float64) * float(stored_meta.get("norm", 1.0)) * count
+    for part in (delta.added, -delta.removed if delta.removed is not None else None):
+        if part is not None:
+            total = part if total.size == 0 else total + part
+    count += delta.added_count - delta.removed_count
+    if count <= 0 or total.size == 0:
+        return None
+
+    mean = total / count
+    norm = float(np.linalg.norm(mean))
+    vector = (mean / norm if norm > 0 else mean).astype(np.float32).tolist()
+    return vector, {"user_id": delta.user_id, "document_id": document_id, "chunk_count": count, "norm": norm}
+
+
+def backfill(chroma_client, chunk_collections: List[str], base_name: str, page_size: int = 500) -> int:
+    """Rebuilds the centroids of all documents stored in `chunk_collections`."""
+    written = 0
+    for name in chunk_collections:
+        collection = chroma_client.get_or_create_collection(name=name, embedding_function=None)
+        deltas = CentroidDeltas()
+        offset = 0
+        without_document = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["embeddings", "metadatas"])
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            metadatas = [m or {} for m in page["metadatas"]]
+            without_document += sum(1 for m in metadatas if not m.get("document_id"))
+            deltas.add(page["embeddings"], metadatas)
+            offset += len(ids)
+
+        target = chroma_client.get_or_create_collection(name=centroid_collection(name, base_name),
+                                                        embedding_function=None)
+        rows = []
+        for document_id, delta in deltas.documents.items():
+            updated = apply_delta(document_id, None, None, delta)
+            if updated is not None:
+                rows.append((centroid_id(document_id), *updated))
+        for start in range(0, len(rows), page_size):
+            part = rows[start:start + page_size]
+            target.upsert(
+                ids=[row[0] for row in part],
+                embeddings=[row[1] for row in part],
+                metadatas=[row[2] for row in part],
+            )
+        written += len(rows)
+        logger.info(f"[{name}] {len(deltas.documents)} centroids written"
+                    + (f", {without_document} chunks without document_id skipped (reindex to include them)"
+                       if without_document else ""))
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain per-document centroid vectors.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from .vector_store import _chroma_client, _list_partitions, collection_name, generations
+
+    active, _ = generations.current()
+    total = backfill(_chroma_client, _list_partitions(active.collection(collection_name)), collection_name,
+                     page_size=args.page_size)
+    logger.info(f"Backfill finished: {total} document centroids.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# document_registry.py
+"""
+Document-level attributes of vector search results.
+
+Vectors carry only compact keys (user_id, document_id, chunk_index, page). The file
+name, description and category live once per document in WorkspaceDocument and are
+attached to search results here, with one batched query per search.
+
+Vectors written before the registry still carry `file_name`/`file_description`/`category`
+themselves; they are left as they are.
+"""
+
+import asyncio
+import logging
+import uuid
+from typing import Any, Dict, Iterable, List
+
+from .database import SessionLocal
+from .models import FileCategory, WorkspaceDocument
+
+logger = logging.getLogger(__name__)
+
+
+def load_documents(document_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """document_id -> {file_name, title, file_description, category} in one query."""
+    keys = set()
+    for document_id in document_ids:
+        try:
+            keys.add(uuid.UUID(str(document_id)))
+        except ValueError:
+            continue
+    if not keys:
+        return {}
+
+    with SessionLocal() as db:
+        rows = db.query(
+            WorkspaceDocument.id,
+            WorkspaceDocument.title,
+            WorkspaceDocument.original_filename,
+            WorkspaceDocument.description,
+            FileCategory.name,
+        ).outerjoin(
+            FileCategory, FileCategory.id == WorkspaceDocument.category_id
+        ).filter(WorkspaceDocument.id.in_(keys)).all()
+
+    return {
+        str(document_id): {
+            "file_name": original_filename or title,
+            "title": title,
+            "file_description": description or "",
+            "category": category or "General",
+        }
+        for document_id, title, original_filename, description, category in rows
+    }
+
+
+def hydrate_metadatas(metadatas: List[Dict[str, Any]]) -> None:
+    """Adds document attributes to result metadatas (in place). Errors only leave them compact."""
+    missing = {m["document_id"] for m in metadatas if m.get("document_id") and "file_name" not in m}
+    if not missing:
+        return
+    try:
+        documents = load_documents(missing)
+    except Exception as e:
+        logger.warning(f"Could not hydrate search results from the document registry: {e}")
+        return
+    for metadata in metadatas:
+        document = documents.get(metadata.get("document_id"))
+        if document and "file_name" not in metadata:
+            metadata.update(document)
+
+
+async def ahydrate_metadatas(metadatas: List[Dict[str, Any]]) -> None:
+    """Asynchroniczna wersja `hydrate_metadatas`."""
+    if any(m.get("document_id") and "file_name" not in m for m in metadatas):
+        await asyncio.to_thread(hydrate_metadatas, metadatas)
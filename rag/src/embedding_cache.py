@@ -0,0 +1,413 @@
+# embedding_cache.py
+"""
+Content-addressed cache for text embeddings.
+
+Vectors are keyed by a hash of (model name, normalized text), so the same chunk
+is embedded only once no matter how many times it is uploaded - re-uploads after
+an orphan cleanup, Notion re-imports and boilerplate repeated across files all
+hit the cache instead of the embedding API.
+
+Backends:
+- SQLiteEmbeddingBackend: local file, works without any extra service
+- RedisEmbeddingBackend: shared between workers/instances
+
+Both backends are size-bounded and evict the least recently used entries.
+
+Query embeddings are memoized separately: per request (so the memory search and
+the RAG search of one chat turn share a single embedding call) and in a bounded
+in-process TTL cache (so repeated follow-up questions are not re-embedded).
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .config import (
+    REDIS_URL,
+    EMBEDDING_CACHE_BACKEND,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace so that formatting-only differences share a cache entry."""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def embedding_cache_key(model_name: str, text: str) -> str:
+    """Stable cache key for a (model, text) pair."""
+    payload = f"{model_name}\x00{normalize_text(text)}".encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _encode_vector(vector: Sequence[float]) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def _decode_vector(blob: bytes) -> List[float]:
+    return np.frombuffer(blob, dtype=np.float32).tolist()
+
+
+class SQLiteEmbeddingBackend:
+    """On-disk embedding cache with LRU eviction."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_lru ON embeddings (last_access)")
+        self._conn.commit()
+        logger.info(f"Embedding cache initialized with SQLite backend at {path} (max_entries={max_entries})")
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters, so look up in slices
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = _decode_vector(blob)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def set_many(self, items: List[Tuple[str, Sequence[float]]]) -> None:
+        if not items:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, _encode_vector(vector), now) for key, vector in items]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            logger.debug(f"Evicted {overflow} entries from embedding cache")
+
+
+class RedisEmbeddingBackend:
+    """
+    Redis embedding cache shared between workers.
+    A sorted set tracks last access time so the least recently used vectors can be evicted.
+    """
+
+    def __init__(self, url: str, max_entries: int, prefix: str = "emb"):
+        import redis  # sync client; the cache is used from worker threads as well
+
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self._lru_key = f"{prefix}:lru"
+        self._redis = redis.Redis.from_url(url)
+        self._redis.ping()
+        logger.info(f"Embedding cache initialized with Redis backend (max_entries={max_entries})")
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+
+        blobs = self._redis.mget([self._key(k) for k in keys])
+        found = {key: _decode_vector(blob) for key, blob in zip(keys, blobs) if blob is not None}
+        if found:
+            now = time.time()
+            self._redis.zadd(self._lru_key, {key: now for key in found})
+        return found
+
+    def set_many(self, items: List[Tuple[str, Sequence[float]]]) -> None:
+        if not items:
+            return
+
+        now = time.time()
+        pipe = self._redis.pipeline()
+        pipe.mset({self._key(key): _encode_vector(vector) for key, vector in items})
+        pipe.zadd(self._lru_key, {key: now for key, _ in items})
+        pipe.zcard(self._lru_key)
+        count = pipe.execute()[-1]
+
+        overflow = count - self.max_entries
+        if overflow > 0:
+            evicted = self._redis.zpopmin(self._lru_key, overflow)
+            if evicted:
+                self._redis.delete(*[self._key(member.decode()) for member, _ in evicted])
+                logger.debug(f"Evicted {len(evicted)} entries from embedding cache")
+
+
+class EmbeddingCache:
+    """Backend-agnostic cache front with hit/miss counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        try:
+            found = self.backend.get_many(keys)
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed, treating as miss: {e}")
+            found = {}
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: List[Tuple[str, Sequence[float]]]) -> None:
+        try:
+            self.backend.set_many(items)
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "backend": type(self.backend).__name__,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class QueryEmbeddingCache:
+    """Bounded in-process TTL cache for query embeddings."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, vector: List[float]) -> None:
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# Request-scoped query embeddings: key -> vector. Copied into tasks and `asyncio.to_thread`
+# calls spawned by the request, so every retriever of one chat turn sees the same dict.
+_request_query_embeddings: contextvars.ContextVar[Optional[Dict[str, List[float]]]] = contextvars.ContextVar(
+    "request_query_embeddings", default=None
+)
+
+
+def start_query_embedding_scope() -> None:
+    """
+    Starts a fresh request scope for query embeddings in the current context.
+    Call once at the beginning of a request (each request runs in its own task/context).
+    """
+    _request_query_embeddings.set({})
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain `Embeddings` wrapper that serves document embeddings from `EmbeddingCache`
+    and only sends cache misses (deduplicated) to the wrapped model.
+    Query embeddings are memoized per request and in `QueryEmbeddingCache`.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: Optional[EmbeddingCache],
+                 query_cache: Optional[QueryEmbeddingCache] = None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+        self.query_cache = query_cache
+
+    def _missing(self, texts: List[str], keys: List[str], found: Dict[str, List[float]]) -> Tuple[List[str], List[str]]:
+        missing_keys: List[str] = []
+        missing_texts: List[str] = []
+        seen = set(found)
+        for key, text in zip(keys, texts):
+            if key not in seen:
+                seen.add(key)
+                missing_keys.append(key)
+                missing_texts.append(text)
+        return missing_keys, missing_texts
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.cache is None or not texts:
+            return self.embeddings.embed_documents(texts)
+
+        keys = [embedding_cache_key(self.model_name, t) for t in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+        missing_keys, missing_texts = self._missing(texts, keys, found)
+
+        if missing_texts:
+            vectors = self.embeddings.embed_documents(missing_texts)
+            new_items = list(zip(missing_keys, vectors))
+            self.cache.set_many(new_items)
+            found.update(new_items)
+
+        return [found[key] for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.cache is None or not texts:
+            return await self.embeddings.aembed_documents(texts)
+
+        keys = [embedding_cache_key(self.model_name, t) for t in texts]
+        found = await asyncio.to_thread(self.cache.get_many, list(dict.fromkeys(keys)))
+        missing_keys, missing_texts = self._missing(texts, keys, found)
+
+        if missing_texts:
+            vectors = await self.embeddings.aembed_documents(missing_texts)
+            new_items = list(zip(missing_keys, vectors))
+            await asyncio.to_thread(self.cache.set_many, new_items)
+            found.update(new_items)
+
+        return [found[key] for key in keys]
+
+    def _lookup_query(self, key: str) -> Optional[List[float]]:
+        scope = _request_query_embeddings.get()
+        if scope is not None and key in scope:
+            return scope[key]
+        vector = self.query_cache.get(key) if self.query_cache else None
+        if vector is not None and scope is not None:
+            scope[key] = vector
+        return vector
+
+    def _remember_query(self, key: str, vector: List[float]) -> None:
+        scope = _request_query_embeddings.get()
+        if scope is not None:
+            scope[key] = vector
+        if self.query_cache:
+            self.query_cache.set(key, vector)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = embedding_cache_key(self.model_name, text)
+        vector = self._lookup_query(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._remember_query(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = embedding_cache_key(self.model_name, text)
+        vector = self._lookup_query(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self._remember_query(key, vector)
+        return vector
+
+
+# Global instances (singleton pattern)
+_query_embedding_cache: Optional[QueryEmbeddingCache] = None
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_initialized = False
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Get the global embedding cache configured via EMBEDDING_CACHE_BACKEND.
+    Returns None when caching is disabled or the backend is unavailable.
+    """
+    global _embedding_cache, _embedding_cache_initialized
+    if _embedding_cache_initialized:
+        return _embedding_cache
+
+    _embedding_cache_initialized = True
+    try:
+        if EMBEDDING_CACHE_BACKEND == "redis":
+            _embedding_cache = EmbeddingCache(RedisEmbeddingBackend(REDIS_URL, EMBEDDING_CACHE_MAX_ENTRIES))
+        elif EMBEDDING_CACHE_BACKEND == "sqlite":
+            _embedding_cache = EmbeddingCache(SQLiteEmbeddingBackend(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES))
+        else:
+            logger.info("Embedding cache disabled.")
+    except Exception as e:
+        logger.warning(f"Embedding cache backend '{EMBEDDING_CACHE_BACKEND}' unavailable: {e}. Running without cache.")
+        _embedding_cache = None
+
+    return _embedding_cache
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """Get the global query embedding cache."""
+    global _query_embedding_cache
+    if _query_embedding_cache is None:
+        _query_embedding_cache = QueryEmbeddingCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL)
+    return _query_embedding_cache
@@ -0,0 +1,181 @@
+# embeddings.py
+"""
+Embedding providers.
+
+The provider is derived from the model name, so index generations (which store only
+a model name) pick the right backend:
+- "text-embedding-*"      -> OpenAI API (OpenAIEmbeddings)
+- anything else           -> local CPU model via sentence-transformers, e.g.
+                             "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+                             a local path, or an explicit "local:<name or path>"
+
+A local model is loaded once per process. Concurrent callers (request handlers, ingest
+batches, agent tools) are merged by `DynamicBatcher` into one `encode` call: the first
+request waits at most LOCAL_EMBEDDING_MAX_WAIT_MS for others, up to
+LOCAL_EMBEDDING_MAX_BATCH_SIZE texts.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from .config import (
+    LOCAL_EMBEDDING_BACKEND,
+    LOCAL_EMBEDDING_DEVICE,
+    LOCAL_EMBEDDING_MAX_BATCH_SIZE,
+    LOCAL_EMBEDDING_MAX_WAIT_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+    logger.warning("sentence-transformers not installed. Local embedding models are unavailable.")
+
+_LOCAL_PREFIX = "local:"
+
+
+def is_local_model(model_name: str) -> bool:
+    return model_name.startswith(_LOCAL_PREFIX) or not model_name.startswith("text-embedding-")
+
+
+class DynamicBatcher:
+    """
+    Merges texts submitted concurrently from many threads/tasks into batches for `encode`.
+    `submit` returns a Future with the vectors of the submitted texts, in order.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], List[List[float]]],
+                 max_batch_size: int = LOCAL_EMBEDDING_MAX_BATCH_SIZE,
+                 max_wait_ms: float = LOCAL_EMBEDDING_MAX_WAIT_MS):
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future: Future = Future()
+        if not texts:
+            future.set_result([])
+            return future
+        self._ensure_worker()
+        self._queue.put((list(texts), future))
+        return future
+
+    def _collect(self) -> List[Tuple[List[str], Future]]:
+        pending = [self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self) -> None:
+        while True:
+            pending = self._collect()
+            try:
+                vectors = self._encode([text for texts, _ in pending for text in texts])
+            except Exception as e:
+                logger.error(f"Local embedding batch of {len(pending)} requests failed: {e}")
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for texts, future in pending:
+                future.set_result(vectors[offset:offset + len(texts)])
+                offset += len(texts)
+
+
+_batchers: Dict[Tuple[str, Optional[int]], DynamicBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def _load_model(model_name: str, dimensions: Optional[int]):
+    if not SENTENCE_TRANSFORMERS_AVAILABLE:
+        raise RuntimeError(f"Embedding model '{model_name}' needs sentence-transformers, which is not installed")
+    kwargs = {"device": LOCAL_EMBEDDING_DEVICE}
+    if LOCAL_EMBEDDING_BACKEND == "onnx":
+        kwargs["backend"] = "onnx"
+    if dimensions:
+        kwargs["truncate_dim"] = dimensions
+    started = time.perf_counter()
+    model = SentenceTransformer(model_name, **kwargs)
+    logger.info(f"Local embedding model '{model_name}' ({LOCAL_EMBEDDING_BACKEND}, "
+                f"{LOCAL_EMBEDDING_DEVICE}) loaded in {time.perf_counter() - started:.1f}s")
+    return model
+
+
+def _get_batcher(model_name: str, dimensions: Optional[int]) -> DynamicBatcher:
+    key = (model_name, dimensions)
+    with _batchers_lock:
+        if key not in _batchers:
+            model = _load_model(model_name, dimensions)
+
+            def encode(texts: List[str]) -> List[List[float]]:
+                # Znormalizowane wektory - progi L2/cosinus w vector_store zakładają długość 1
+                return model.encode(
+                    texts, batch_size=LOCAL_EMBEDDING_MAX_BATCH_SIZE, normalize_embeddings=True,
+                    convert_to_numpy=True, show_progress_bar=False
+                ).tolist()
+
+            _batchers[key] = DynamicBatcher(encode)
+        return _batchers[key]
+
+
+class LocalEmbeddings(Embeddings):
+    """LangChain `Embeddings` backed by an in-process sentence-transformers model."""
+
+    def __init__(self, model_name: str, dimensions: Optional[int] = None):
+        self.model_name = model_name[len(_LOCAL_PREFIX):] if model_name.startswith(_LOCAL_PREFIX) else model_name
+        self.dimensions = dimensions
+
+    def _batcher(self) -> DynamicBatcher:
+        return _get_batcher(self.model_name, self.dimensions)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._batcher().submit(texts).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Pierwsze wywołanie ładuje model - poza pętlą zdarzeń
+        batcher = await asyncio.to_thread(self._batcher)
+        return await asyncio.wrap_future(batcher.submit(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def create_embeddings(model_name: str, dimensions: Optional[int] = None) -> Embeddings:
+    """Embedding backend for `model_name` (see module docstring)."""
+    if is_local_model(model_name):
+        return LocalEmbeddings(model_name, dimensions)
+    return OpenAIEmbeddings(model=model_name, dimensions=dimensions)
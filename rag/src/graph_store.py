@@ -1,160 +1,332 @@
 # graph_knowledge.py
 
+import asyncio
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from itertools import combinations
-from typing import List, Dict, Any
-from neo4j import GraphDatabase
-from .config import NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD
+from typing import List, Dict, Any, Iterable, Optional, Sequence
+from neo4j import AsyncGraphDatabase, GraphDatabase, Query
+from .config import (
+    GRAPH_INGEST_BATCH_SIZE,
+    GRAPH_RETRIEVAL_TIMEOUT_MS,
+    GRAPH_SCHEMA_RETRY_INTERVAL,
+    GRAPH_SEARCH_QUERY_TIMEOUT_MS,
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+    NEO4J_CONNECTION_TIMEOUT,
+    NEO4J_MAX_CONNECTION_LIFETIME,
+    NEO4J_MAX_POOL_SIZE,
+    NEO4J_PASSWORD,
+    NEO4J_URI,
+    NEO4J_USERNAME,
+)
+from .document_registry import ahydrate_metadatas, hydrate_metadatas
+from .lexical_index import query_terms
+from .retrieval_cache import bump_corpus_version
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-# Initialize the Neo4j driver
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+_DRIVER_SETTINGS = {
+    "auth": (NEO4J_USERNAME, NEO4J_PASSWORD),
+    "max_connection_pool_size": NEO4J_MAX_POOL_SIZE,
+    "connection_acquisition_timeout": NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+    "connection_timeout": NEO4J_CONNECTION_TIMEOUT,
+    "max_connection_lifetime": NEO4J_MAX_CONNECTION_LIFETIME,
+}
 
+# Initialize the Neo4j driver (ingestion, schema and the sync search paths)
+driver = GraphDatabase.driver(NEO4J_URI, **_DRIVER_SETTINGS)
 
-def ensure_fulltext_indexes():
-    """
-    Ensures that the required full-text indexes exist in the database.
-    If they do not exist, they are created.
-    """
-    with driver.session() as session:
-        existing_indexes = session.run("SHOW INDEXES YIELD name RETURN name")
-        index_names = [record["name"] for record in existing_indexes]
+# Sterownik asynchroniczny (ścieżki wyszukiwania w pętli zdarzeń) powstaje leniwie
+_async_driver = None
+
+
+def get_async_driver():
+    """Get the global `neo4j.AsyncGraphDatabase` driver (same pool settings as `driver`)."""
+    global _async_driver
+    if _async_driver is None:
+        _async_driver = AsyncGraphDatabase.driver(NEO4J_URI, **_DRIVER_SETTINGS)
+    return _async_driver
+
+
+async def aclose_drivers() -> None:
+    """Closes both Neo4j drivers (API shutdown)."""
+    global _async_driver
+    if _async_driver is not None:
+        await _async_driver.close()
+        _async_driver = None
+    await asyncio.to_thread(driver.close)
+
+
+# Wersja schematu grafu (ograniczenia + indeksy); podbić po zmianie _SCHEMA_STATEMENTS
+GRAPH_SCHEMA_VERSION = 1
+
+_SCHEMA_STATEMENTS = (
+    # Ograniczenia unikalności tworzą indeksy, na których opierają się MERGE przy ingestii
+    "CREATE CONSTRAINT chunk_key IF NOT EXISTS FOR (c:Chunk) REQUIRE c.key IS UNIQUE",
+    "CREATE CONSTRAINT entity_user_name IF NOT EXISTS FOR (e:Entity) REQUIRE (e.user_id, e.name) IS UNIQUE",
+    "CREATE CONSTRAINT graph_schema_name IF NOT EXISTS FOR (s:GraphSchema) REQUIRE s.name IS UNIQUE",
+    "CREATE INDEX chunk_user_document IF NOT EXISTS FOR (c:Chunk) ON (c.user_id, c.document_id)",
+    "CREATE FULLTEXT INDEX entityFullTextIndex IF NOT EXISTS FOR (n:Entity) ON EACH [n.name, n.type]",
+    "CREATE FULLTEXT INDEX chunkTextIndex IF NOT EXISTS FOR (n:Chunk) ON EACH [n.text]",
+)
 
-        if 'entityFullTextIndex' not in index_names:
-            session.run("""
-                CREATE FULLTEXT INDEX entityFullTextIndex FOR (n:Entity) ON EACH [n.name, n.type];
-            """)
-            logger.info("Created 'entityFullTextIndex' full-text index.")
+_graph_schema_ready = False
+_graph_schema_failed_at: Optional[float] = None  # time.monotonic() ostatniej nieudanej próby
+_graph_schema_lock = threading.Lock()
 
-        if 'chunkTextIndex' not in index_names:
-            session.run("""
-                CREATE FULLTEXT INDEX chunkTextIndex FOR (n:Chunk) ON EACH [n.text];
-            """)
-            logger.info("Created 'chunkTextIndex' full-text index.")
 
+def _schema_version(session) -> int:
+    record = session.run("MATCH (s:GraphSchema {name: 'rag'}) RETURN s.version AS version").single()
+    return record["version"] if record and record["version"] is not None else 0
 
-def create_graph_entries(chunks: List[str], extracted_metadatas: List[Dict], user_id: str, file_name: str):
+
+def ensure_graph_schema(force: bool = False) -> bool:
+    """
+    Creates the graph constraints and indexes once per process (and once per schema version
+    in the database).
+
+    The version is kept in a (:GraphSchema {name: 'rag'}) marker node: when it is already
+    at GRAPH_SCHEMA_VERSION nothing is executed; otherwise the DDL runs, the indexes are
+    awaited and the marker is updated. Called at API startup and lazily by the ingestion,
+    after the first success it is a flag check. After a failure the lazy calls return False
+    without touching Neo4j for GRAPH_SCHEMA_RETRY_INTERVAL seconds (`force` retries at once).
+
+    Returns:
+        bool: True if the schema is in place.
+    """
+    global _graph_schema_ready, _graph_schema_failed_at
+    if _graph_schema_ready and not force:
+        return True
+
+    with _graph_schema_lock:
+        if _graph_schema_ready and not force:
+            return True
+        if (not force and _graph_schema_failed_at is not None
+                and time.monotonic() - _graph_schema_failed_at < GRAPH_SCHEMA_RETRY_INTERVAL):
+            return False
+        try:
+            with driver.session() as session:
+                version = _schema_version(session)
+                if version < GRAPH_SCHEMA_VERSION or force:
+                    for statement in _SCHEMA_STATEMENTS:
+                        session.run(statement).consume()
+                    session.run("CALL db.awaitIndexes()").consume()
+                    session.run(
+                        "MERGE (s:GraphSchema {name: 'rag'}) SET s.version = $version, s.updated_at = datetime()",
+                        version=GRAPH_SCHEMA_VERSION,
+                    ).consume()
+                    logger.info(f"Graph schema migrated from version {version} to {GRAPH_SCHEMA_VERSION}.")
+        except Exception as e:
+            _graph_schema_failed_at = time.monotonic()
+            logger.error(f"Graph schema bootstrap failed: {e}. Next attempt in {GRAPH_SCHEMA_RETRY_INTERVAL:.0f}s.")
+            return False
+        _graph_schema_ready = True
+        _graph_schema_failed_at = None
+    return True
+
+
+ENTITY_TYPES = ('names', 'locations', 'dates', 'key_terms')
+
+_WRITE_CHUNKS = """
+UNWIND $rows AS row
+MERGE (c:Chunk {key: row.key})
+SET c.user_id = row.user_id, c.document_id = row.document_id, c.chunk_index = row.chunk_index,
+    c.file_name = row.file_name, c.text = row.text
+"""
+
+_WRITE_MENTIONS = """
+UNWIND $rows AS row
+MERGE (e:Entity {user_id: $user_id, name: row.name})
+SET e.type = row.type
+WITH e, row
+MATCH (c:Chunk {key: row.chunk_key})
+MERGE (c)-[:CONTAINS_ENTITY]->(e)
+"""
+
+_WRITE_CO_OCCURRENCES = """
+UNWIND $rows AS row
+MATCH (a:Entity {user_id: $user_id, name: row.a})
+MATCH (b:Entity {user_id: $user_id, name: row.b})
+MERGE (a)-[:CO_OCCURS_WITH]->(b)
+"""
+
+
+def chunk_key(user_id: str, document_id: str, chunk_index: int) -> str:
+    """Globally unique key of a Chunk node: (user, document, chunk index)."""
+    return f"{user_id}:{document_id}:{chunk_index}"
+
+
+def _entities(metadata: Dict) -> List[tuple]:
+    """(name, type) pairs of one chunk's extracted metadata; comma-separated strings are split."""
+    entities = []
+    for entity_type in ENTITY_TYPES:
+        values = metadata.get(entity_type, [])
+        if isinstance(values, str):
+            values = values.split(',')
+        entities.extend((value.strip(), entity_type) for value in values if value and value.strip())
+    return entities
+
+
+def co_occurrence_rows(extracted_metadatas: Iterable[Dict]) -> List[Dict[str, str]]:
+    """Pairs of entities extracted from the same chunk, each pair once, in a stable order."""
+    pairs = set()
+    for metadata in extracted_metadatas:
+        pairs.update(combinations(sorted({name for name, _ in _entities(metadata or {})}), 2))
+    return [{"a": a, "b": b} for a, b in sorted(pairs)]
+
+
+def graph_rows(chunks: List[str], extracted_metadatas: List[Dict], user_id: str,
+               document_id: Optional[str], file_name: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Parameter rows for the UNWIND writes: chunks, chunk-entity mentions and co-occurring
+    entity pairs. Without `document_id` the chunk keys use `file_name` and the chunks get
+    no document_id (they are found by file name, like nodes from before the registry).
+    """
+    rows: Dict[str, List[Dict[str, Any]]] = {"chunks": [], "mentions": [], "co_occurrences": []}
+    written = []
+    for i, (chunk, metadata) in enumerate(zip(chunks, extracted_metadatas)):
+        if not chunk:
+            continue
+        key = chunk_key(user_id, document_id or file_name, i)
+        rows["chunks"].append({
+            "key": key, "user_id": user_id, "document_id": document_id,
+            "chunk_index": i, "file_name": file_name, "text": chunk,
+        })
+        rows["mentions"].extend(
+            {"chunk_key": key, "name": name, "type": entity_type} for name, entity_type in _entities(metadata or {})
+        )
+        written.append(metadata)
+    rows["co_occurrences"] = co_occurrence_rows(written)
+    return rows
+
+
+def _run_write(tx, cypher: str, rows: List[Dict[str, Any]], user_id: str) -> None:
+    tx.run(cypher, rows=rows, user_id=user_id).consume()
+
+
+def _write_batches(session, cypher: str, rows: List[Dict[str, Any]], user_id: str, batch_size: int) -> None:
+    # Każda partia to jedna zarządzana transakcja - sterownik ponawia ją przy błędach przejściowych
+    for start in range(0, len(rows), batch_size):
+        session.execute_write(_run_write, cypher, rows[start:start + batch_size], user_id)
+
+
+def create_graph_entries(chunks: List[str], extracted_metadatas: List[Dict], user_id: str, file_name: str,
+                         document_id: Optional[str] = None,
+                         batch_size: int = GRAPH_INGEST_BATCH_SIZE) -> Dict[str, Any]:
     """
     Creates nodes and relationships in the graph database based on text chunks and extracted metadata.
 
+    Writes go as parameterized `UNWIND $rows` batches of `batch_size` rows (chunks first,
+    then entities with their mentions, then co-occurrences), so a document costs a few
+    round trips instead of several per entity.
+
     Args:
         chunks (List[str]): List of text chunks.
         extracted_metadatas (List[dict]): List of dictionaries with extracted metadata for each chunk.
         user_id (str): User identifier to which the data belongs.
         file_name (str): Name of the file associated with the chunks.
+        document_id (str, optional): WorkspaceDocument id; chunk keys are (user, document, index).
+            Without it the file name takes its place in the key and the chunks have no document_id.
+
+    Returns:
+        Dict[str, Any]: Rows written per kind and the time it took.
     """
-    # Ensure indexes before creating nodes
-    ensure_fulltext_indexes()
-    with driver.session() as session:
-        session.run("CALL db.awaitIndexes()")
+    # Schemat (ograniczenia, indeksy) powstaje raz na proces - tu zwykle już tylko sprawdzenie flagi.
+    # Bez schematu zapis i tak działa (MERGE bez indeksów jest tylko wolniejszy)
+    if not ensure_graph_schema():
+        logger.warning("Graph schema is not in place; writing graph entries without constraints.")
 
     # Validate inputs
     if not chunks:
         logger.warning("No chunks provided to create_graph_entries.")
-        return
+        return {}
 
     if len(chunks) != len(extracted_metadatas):
         logger.warning("Number of chunks does not match number of metadata entries.")
-        return
+        return {}
 
+    started = time.perf_counter()
+    rows = graph_rows(chunks, extracted_metadatas, user_id, document_id, file_name)
     with driver.session() as session:
-        for i, (chunk, metadata) in enumerate(zip(chunks, extracted_metadatas)):
-            if not chunk:
-                logger.debug(f"Skipping empty chunk at index {i}.")
-                continue
-
-            # Create or merge the Chunk node
-            session.run(
-                """
-                MERGE (c:Chunk {id: $chunk_id, user_id: $user_id, file_name: $file_name})
-                SET c.text = $text
-                """,
-                chunk_id=str(i),
-                text=chunk,
-                user_id=user_id,
-                file_name=file_name
-            )
-
-            # Handle different entity types
-            for entity_type in ['names', 'locations', 'dates', 'key_terms']:
-                entities = metadata.get(entity_type, [])
-                # Ensure entities is a list
-                if isinstance(entities, str):
-                    entities = [e.strip() for e in entities.split(',') if e.strip()]
-
-                for entity in entities:
-                    if not entity:
-                        continue
-                    # Create or merge the Entity node
-                    session.run(
-                        """
-                        MERGE (e:Entity {name: $entity, user_id: $user_id})
-                        SET e.type = $type
-                        """,
-                        entity=entity.strip(),
-                        type=entity_type,
-                        user_id=user_id
-                    )
-
-                    # Create relationship between Chunk and Entity
-                    session.run(
-                        """
-                        MATCH (c:Chunk {id: $chunk_id, user_id: $user_id, file_name: $file_name})
-                        MATCH (e:Entity {name: $entity, user_id: $user_id})
-                        MERGE (c)-[:CONTAINS_ENTITY]->(e)
-                        """,
-                        chunk_id=str(i),
-                        entity=entity.strip(),
-                        user_id=user_id,
-                        file_name=file_name
-                    )
+        _write_batches(session, _WRITE_CHUNKS, rows["chunks"], user_id, batch_size)
+        _write_batches(session, _WRITE_MENTIONS, rows["mentions"], user_id, batch_size)
+        _write_batches(session, _WRITE_CO_OCCURRENCES, rows["co_occurrences"], user_id, batch_size)
 
-    logger.info(f"Graph entries created for user_id: {user_id}, file_name: {file_name}")
+    report = {kind: len(kind_rows) for kind, kind_rows in rows.items()}
+    report["seconds"] = time.perf_counter() - started
+    bump_corpus_version(user_id)
+    logger.info(f"Graph entries created for user_id: {user_id}, file_name: {file_name} "
+                f"({report['chunks']} chunks, {report['mentions']} mentions, "
+                f"{report['co_occurrences']} co-occurrences in {report['seconds']:.2f}s)")
+    return report
 
 
-def create_entity_relationships(extracted_metadatas: List[Dict], user_id: str):
+def create_entity_relationships(extracted_metadatas: List[Dict], user_id: str,
+                                batch_size: int = GRAPH_INGEST_BATCH_SIZE):
     """
     Creates relationships between entities based on their co-occurrence in chunks.
+    (`create_graph_entries` already does this for the chunks it writes.)
 
     Args:
         extracted_metadatas (List[dict]): List of dictionaries with extracted metadata for each chunk.
         user_id (str): User identifier to which the data belongs.
     """
+    rows = co_occurrence_rows(extracted_metadatas)
     with driver.session() as session:
-        for metadata in extracted_metadatas:
-            entities = []
-            for entity_type in ['names', 'locations', 'dates', 'key_terms']:
-                entity_list = metadata.get(entity_type, [])
-                if isinstance(entity_list, str):
-                    entity_list = [e.strip() for e in entity_list.split(',') if e.strip()]
-                entities.extend(entity_list)
-
-            # Avoid creating relationships if there's less than 2 entities
-            if len(entities) < 2:
-                continue
-
-            entity_pairs = [list(pair) for pair in combinations(set(entities), 2)]
-            if entity_pairs:
-                session.run(
-                    """
-                    UNWIND $entity_pairs AS pair
-                    MATCH (a:Entity {name: pair[0], user_id: $user_id})
-                    MATCH (b:Entity {name: pair[1], user_id: $user_id})
-                    MERGE (a)-[:CO_OCCURS_WITH]->(b)
-                    """,
-                    entity_pairs=entity_pairs,
-                    user_id=user_id
-                )
-
-
-def search_graph_store(query: str, user_id: str = None) -> List[Dict[str, Any]]:
+        _write_batches(session, _WRITE_CO_OCCURRENCES, rows, user_id, batch_size)
+
+
+def _graph_lookups(params: Dict[str, Any]):
+    """(name, cypher, record processor) of the three index lookups of `search_graph_store`."""
+    return (
+        ("entity", _build_entity_query(params), _process_entity_result),
+        ("relation", _build_relation_query(params), _process_relation_result),
+        ("chunk", _build_chunk_query(params), _process_chunk_result),
+    )
+
+
+def _graph_search_params(query: str, user_id: Optional[str]) -> Dict[str, Any]:
+    params = {'query': query}
+    if user_id:
+        params['user_id'] = user_id
+    return params
+
+
+def _merge_graph_results(lookups: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    graph_results = [result for results in lookups for result in results]
+    if not graph_results:
+        logger.info("No graph results found for the given query.")
+    else:
+        logger.info(f"Found {len(graph_results)} results in the graph store.")
+    return sorted(graph_results, key=lambda x: x['similarity_score'], reverse=True)
+
+
+# Każde wyszukiwanie w grafie to trzy równoległe zapytania, każde we własnej sesji
+_lookup_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="graph-lookup")
+
+
+def _run_lookup(name: str, cypher: str, process, params: Dict[str, Any], timeout_ms: float) -> List[Dict[str, Any]]:
+    try:
+        with driver.session() as session:
+            return [process(record) for record in session.run(Query(cypher, timeout=timeout_ms / 1000.0), params)]
+    except Exception as e:
+        logger.warning(f"Graph {name} lookup failed: {e}")
+        return []
+
+
+def search_graph_store(query: str, user_id: str = None,
+                       timeout_ms: float = GRAPH_SEARCH_QUERY_TIMEOUT_MS) -> List[Dict[str, Any]]:
     """
     Searches the Neo4j graph database for entities, relations, and chunks matching the query,
     aggregates them, and calculates relevance scores.
 
+    The three index lookups run concurrently, each with its own `timeout_ms`; a lookup that
+    fails or times out contributes no results.
+
     Args:
         query (str): The user's query.
         user_id (str, optional): User ID for filtering results.
@@ -166,35 +338,136 @@ def search_graph_store(query: str, user_id: str = None) -> List[Dict[str, Any]]:
         logger.warning("Empty query provided to search_graph_store.")
         return []
 
-    try:
-        with driver.session() as session:
-            params = {'query': query}
-            if user_id:
-                params['user_id'] = user_id
+    params = _graph_search_params(query, user_id)
+    futures = [_lookup_executor.submit(_run_lookup, name, cypher, process, params, timeout_ms)
+               for name, cypher, process in _graph_lookups(params)]
+    return _merge_graph_results([future.result() for future in futures])
 
-            entity_results = _execute_entity_query(session, params)
-            relation_results = _execute_relation_query(session, params)
-            chunk_results = _execute_chunk_query(session, params)
 
-            graph_results = entity_results + relation_results + chunk_results
-            if not graph_results:
-                logger.info("No graph results found for the given query.")
-            else:
-                logger.info(f"Found {len(graph_results)} results in the graph store.")
+async def _arun_lookup(name: str, cypher: str, process, params: Dict[str, Any],
+                       timeout_ms: float) -> List[Dict[str, Any]]:
+    async def run() -> List[Dict[str, Any]]:
+        async with get_async_driver().session() as session:
+            result = await session.run(Query(cypher, timeout=timeout_ms / 1000.0), params)
+            return [process(record) async for record in result]
 
-            return sorted(graph_results, key=lambda x: x['similarity_score'], reverse=True)
+    # Limit po stronie serwera (Query.timeout) i klienta - wolne połączenie też nie blokuje odpowiedzi
+    try:
+        return await asyncio.wait_for(run(), timeout_ms / 1000.0)
+    except asyncio.TimeoutError:
+        logger.warning(f"Graph {name} lookup timed out after {timeout_ms:.0f} ms.")
     except Exception as e:
-        logger.error(f"An error occurred while searching the graph store: {e}", exc_info=True)
+        logger.warning(f"Graph {name} lookup failed: {e}")
+    return []
+
+
+async def asearch_graph_store(query: str, user_id: str = None,
+                              timeout_ms: float = GRAPH_SEARCH_QUERY_TIMEOUT_MS) -> List[Dict[str, Any]]:
+    """Asynchroniczna wersja `search_graph_store` (sterownik asynchroniczny, zapytania równolegle)."""
+    if not query.strip():
+        logger.warning("Empty query provided to search_graph_store.")
+        return []
+
+    params = _graph_search_params(query, user_id)
+    lookups = await asyncio.gather(*(_arun_lookup(name, cypher, process, params, timeout_ms)
+                                     for name, cypher, process in _graph_lookups(params)))
+    return _merge_graph_results(list(lookups))
+
+
+# Encja trafiona bezpośrednio liczy się w pełni, jej sąsiad (CO_OCCURS_WITH) z połową wyniku
+_GRAPH_CHUNKS_QUERY = """
+CALL db.index.fulltext.queryNodes('entityFullTextIndex', $query) YIELD node AS e0, score
+WHERE e0.user_id = $user_id
+WITH e0, score ORDER BY score DESC LIMIT $entity_limit
+MATCH path = (e0)-[:CO_OCCURS_WITH*0..1]-(e:Entity)<-[:CONTAINS_ENTITY]-(c:Chunk)
+WHERE e.user_id = $user_id AND c.user_id = $user_id
+  AND ($document_ids IS NULL OR c.document_id IN $document_ids)
+WITH c, max(score / length(path)) AS score, collect(DISTINCT e.name)[..10] AS entities
+RETURN c.document_id AS document_id, c.chunk_index AS chunk_index, c.file_name AS file_name,
+       c.text AS text, elementId(c) AS node_id, entities, score
+ORDER BY score DESC
+LIMIT $n_results
+"""
+
+
+def _graph_chunks_params(query: str, user_id: str, n_results: int,
+                         document_ids: Optional[Sequence[str]]) -> Optional[Dict[str, Any]]:
+    terms = query_terms(query)
+    if not terms or (document_ids is not None and not document_ids):
+        return None
+    return {
+        # Termy to same znaki \w - bez składni Lucene, która mogłaby zepsuć zapytanie
+        'query': " OR ".join(terms),
+        'user_id': user_id,
+        'entity_limit': n_results,
+        'n_results': n_results,
+        'document_ids': list(document_ids) if document_ids is not None else None,
+    }
+
+
+def _graph_chunk_rows(records, user_id: str) -> List[Dict[str, Any]]:
+    results = []
+    for record in records:
+        metadata: Dict[str, Any] = {"user_id": user_id, "graph_entities": record["entities"]}
+        if record["document_id"]:
+            metadata.update(document_id=record["document_id"], chunk_index=record["chunk_index"])
+        elif record["file_name"]:
+            metadata["file_name"] = record["file_name"]  # węzły sprzed kluczy (dokument, chunk)
+        results.append({
+            "id": f"graph_{record['node_id']}",
+            "content": record["text"],
+            "metadata": metadata,
+            "score": float(record["score"]),
+        })
+    return results
+
+
+def search_graph_chunks(query: str, user_id: str, n_results: int = 20,
+                        document_ids: Optional[Sequence[str]] = None,
+                        timeout_ms: float = GRAPH_RETRIEVAL_TIMEOUT_MS) -> List[Dict[str, Any]]:
+    """
+    Graph retriever for hybrid search: entities matching the query terms (full-text index)
+    and their co-occurring neighbours expand to the chunks that mention them.
+
+    Rows have the vector search shape (`id`, `content`, `metadata`, `score` - higher is
+    better), keyed by document_id/chunk_index so they fuse with the other retrievers.
+    The transaction is cancelled by Neo4j after `timeout_ms`.
+    """
+    params = _graph_chunks_params(query, user_id, n_results, document_ids)
+    if params is None:
+        return []
+    with driver.session() as session:
+        records = list(session.run(Query(_GRAPH_CHUNKS_QUERY, timeout=timeout_ms / 1000.0), params))
+
+    results = _graph_chunk_rows(records, user_id)
+    hydrate_metadatas([row["metadata"] for row in results])
+    return results
+
+
+async def asearch_graph_chunks(query: str, user_id: str, n_results: int = 20,
+                               document_ids: Optional[Sequence[str]] = None,
+                               timeout_ms: float = GRAPH_RETRIEVAL_TIMEOUT_MS) -> List[Dict[str, Any]]:
+    """Asynchroniczna wersja `search_graph_chunks` (sterownik asynchroniczny)."""
+    params = _graph_chunks_params(query, user_id, n_results, document_ids)
+    if params is None:
         return []
+    async with get_async_driver().session() as session:
+        result = await session.run(Query(_GRAPH_CHUNKS_QUERY, timeout=timeout_ms / 1000.0), params)
+        records = [record async for record in result]
 
+    results = _graph_chunk_rows(records, user_id)
+    await ahydrate_metadatas([row["metadata"] for row in results])
+    return results
 
-def delete_knowledge_from_graph(user_id: str, file_name: str) -> bool:
+
+def delete_knowledge_from_graph(user_id: str, file_name: str, document_id: Optional[str] = None) -> bool:
     """
     Deletes all Chunk nodes and their relationships associated with a given user_id and file_name.
 
     Args:
         user_id (str): The user's unique identifier.
         file_name (str): The name of the file whose knowledge is to be deleted.
+        document_id (str, optional): When given, the document's chunks are matched by id instead.
 
     Returns:
         bool: True if deletion was successful, False otherwise.
@@ -203,15 +476,19 @@ def delete_knowledge_from_graph(user_id: str, file_name: str) -> bool:
         with driver.session() as session:
             result = session.run(
                 """
-                MATCH (c:Chunk {user_id: $user_id, file_name: $file_name})
+                MATCH (c:Chunk {user_id: $user_id})
+                WHERE CASE WHEN $document_id IS NULL THEN c.file_name = $file_name
+                           ELSE c.document_id = $document_id END
                 DETACH DELETE c
                 RETURN COUNT(c) AS deleted_count
                 """,
                 user_id=user_id,
-                file_name=file_name
+                file_name=file_name,
+                document_id=document_id
             )
             record = result.single()
             deleted_count = record["deleted_count"] if record else 0
+            bump_corpus_version(user_id)
             if deleted_count > 0:
                 logger.info(f"Deleted {deleted_count} Chunk nodes from Neo4j for user_id: {user_id}, file_name: {file_name}")
                 return True
@@ -223,24 +500,6 @@ def delete_knowledge_from_graph(user_id: str, file_name: str) -> bool:
         return False
 
 
-def _execute_entity_query(session, params: Dict[str, Any]) -> List[Dict[str, Any]]:
-    query = _build_entity_query(params)
-    results = session.run(query, params)
-    return [_process_entity_result(record) for record in results]
-
-
-def _execute_relation_query(session, params: Dict[str, Any]) -> List[Dict[str, Any]]:
-    query = _build_relation_query(params)
-    results = session.run(query, params)
-    return [_process_relation_result(record) for record in results]
-
-
-def _execute_chunk_query(session, params: Dict[str, Any]) -> List[Dict[str, Any]]:
-    query = _build_chunk_query(params)
-    results = session.run(query, params)
-    return [_process_chunk_result(record) for record in results]
-
-
 def _build_entity_query(params: Dict[str, Any]) -> str:
     # Query searching for entities and associated chunks
     query = """
@@ -325,3 +584,12 @@ def _process_chunk_result(record) -> Dict[str, Any]:
         'similarity_score': record['score'],
         'source': 'chunk_text'
     }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create the Neo4j constraints and indexes (graph schema).")
+    parser.add_argument("--force", action="store_true", help="Re-run the DDL even if the schema marker is current")
+    args = parser.parse_args()
+    ensure_graph_schema(force=args.force)
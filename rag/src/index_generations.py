@@ -0,0 +1,148 @@
+# index_generations.py
+"""
+Which vector index generation serves reads, and which one is being built.
+
+A generation is a set of Chroma collections ("torched-rag-g3", "user-memories-g3",
+plus their partitions) built with one embedding model/dimension. While a generation
+is 'building', every write is also applied to it (dual-write) and the reindex job
+(src/reindex.py) fills it from Postgres. Swapping is a single transaction that flips
+the 'active' row, so all workers switch over within VECTOR_GENERATION_CACHE_TTL.
+
+Without an active generation the legacy collections and config.py settings are used.
+A generation records its memory embedding model at `reindex start`, so changing
+MEMORY_EMBEDDING_MODEL later does not change how its `user-memories` are embedded.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Optional, Tuple
+
+from .config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_DIMENSIONS,
+    MEMORY_EMBEDDING_MODEL,
+    MEMORY_EMBEDDING_DIMENSIONS,
+    VECTOR_GENERATION_CACHE_TTL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexSettings:
+    """Physical collections and embedding settings of one generation."""
+    generation_id: Optional[int]
+    embedding_model: str
+    embedding_dimensions: Optional[int]
+    memory_embedding_model: Optional[str] = None  # None = same as documents
+    memory_embedding_dimensions: Optional[int] = None
+
+    def collection(self, base_name: str) -> str:
+        """Physical name of the logical collection `base_name` in this generation."""
+        if self.generation_id is None:
+            return base_name
+        return f"{base_name}-g{self.generation_id}"
+
+    def for_memories(self) -> "IndexSettings":
+        """Settings of the memory collections (the generation's memory model, if it has its own)."""
+        if not self.memory_embedding_model:
+            return self
+        return replace(self, embedding_model=self.memory_embedding_model,
+                       embedding_dimensions=self.memory_embedding_dimensions)
+
+
+# The legacy collections have no row to record their memory model in - config.py is the only source
+LEGACY_SETTINGS = IndexSettings(None, EMBEDDING_MODEL_NAME, EMBEDDING_DIMENSIONS,
+                                MEMORY_EMBEDDING_MODEL or None, MEMORY_EMBEDDING_DIMENSIONS)
+
+
+def settings_from_row(row) -> IndexSettings:
+    if row.memory_embedding_model is None:
+        # Generation started before the memory model was recorded: it was built with config.py's
+        return IndexSettings(row.id, row.embedding_model, row.embedding_dimensions,
+                             MEMORY_EMBEDDING_MODEL or None, MEMORY_EMBEDDING_DIMENSIONS)
+    return IndexSettings(row.id, row.embedding_model, row.embedding_dimensions,
+                         row.memory_embedding_model, row.memory_embedding_dimensions)
+
+
+def _warn_on_memory_model_change(settings: IndexSettings) -> None:
+    if MEMORY_EMBEDDING_MODEL:
+        configured = (MEMORY_EMBEDDING_MODEL, MEMORY_EMBEDDING_DIMENSIONS)
+    else:
+        configured = (settings.embedding_model, settings.embedding_dimensions)
+    memories = settings.for_memories()
+    if configured != (memories.embedding_model, memories.embedding_dimensions):
+        logger.warning(
+            f"MEMORY_EMBEDDING_MODEL ({configured[0]}@{configured[1] or 'native'}) differs from the memory model "
+            f"of generation {settings.generation_id} ({memories.embedding_model}@"
+            f"{memories.embedding_dimensions or 'native'}); keeping the generation's model until a reindex."
+        )
+
+
+class GenerationResolver:
+    """
+    Cached lookup of (active, building) generations. The database is queried at most
+    once per `ttl` seconds; when it is unavailable the last known state is kept.
+    """
+
+    def __init__(self, ttl: float = VECTOR_GENERATION_CACHE_TTL):
+        self.ttl = ttl
+        self._state: Tuple[IndexSettings, Optional[IndexSettings]] = (LEGACY_SETTINGS, None)
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_stale(self) -> bool:
+        return time.monotonic() - self._loaded_at > self.ttl
+
+    def refresh(self) -> Tuple[IndexSettings, Optional[IndexSettings]]:
+        from .database import SessionLocal
+        from .models import VectorIndexGeneration
+
+        with self._lock:
+            try:
+                with SessionLocal() as db:
+                    rows = db.query(VectorIndexGeneration).filter(
+                        VectorIndexGeneration.status.in_(["active", "building"])
+                    ).all()
+                active = next((r for r in rows if r.status == "active"), None)
+                building = next((r for r in rows if r.status == "building"), None)
+                state = (
+                    settings_from_row(active) if active else LEGACY_SETTINGS,
+                    settings_from_row(building) if building else None,
+                )
+                if state[0] != self._state[0] and state[0].generation_id is not None:
+                    _warn_on_memory_model_change(state[0])
+                self._state = state
+            except Exception as e:
+                logger.warning(f"Could not load vector index generations: {e}. Using {self._state[0]}.")
+            self._loaded_at = time.monotonic()
+            return self._state
+
+    def current(self) -> Tuple[IndexSettings, Optional[IndexSettings]]:
+        """(active, building) - building is None when no reindex is running."""
+        if self._is_stale():
+            return self.refresh()
+        return self._state
+
+    async def acurrent(self) -> Tuple[IndexSettings, Optional[IndexSettings]]:
+        if self._is_stale():
+            return await asyncio.to_thread(self.refresh)
+        return self._state
+
+    def invalidate(self) -> None:
+        self._loaded_at = 0.0
+
+
+# Global instance (singleton pattern)
+_resolver: Optional[GenerationResolver] = None
+
+
+def get_generation_resolver() -> GenerationResolver:
+    """Get the global generation resolver."""
+    global _resolver
+    if _resolver is None:
+        _resolver = GenerationResolver()
+    return _resolver
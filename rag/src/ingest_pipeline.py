@@ -0,0 +1,215 @@
+# ingest_pipeline.py
+"""
+Batched, concurrency-limited embedding stage for document ingestion.
+
+Chunks are split into batches (bounded by count and by an estimated token size),
+embedded concurrently under a semaphore and a global tokens-in-flight budget,
+retried per batch, and upserted into the vector store as soon as each batch is ready.
+Every batch reports its own timings, so slow uploads can be diagnosed.
+
+The embedder is any LangChain `Embeddings` (benchmarks/fakes.py has an offline one).
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from .config import (
+    INGEST_BATCH_SIZE,
+    INGEST_MAX_BATCH_TOKENS,
+    INGEST_MAX_CONCURRENCY,
+    INGEST_MAX_TOKENS_IN_FLIGHT,
+    INGEST_MAX_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+# Signature: upsert(ids, embeddings, texts, metadatas)
+UpsertFn = Callable[[List[str], List[List[float]], List[str], List[Dict[str, Any]]], Awaitable[None]]
+
+
+@dataclass
+class BatchTiming:
+    """Timings of a single embedding batch."""
+    index: int
+    size: int
+    tokens: int
+    embed_seconds: float = 0.0
+    upsert_seconds: float = 0.0
+    attempts: int = 0
+    success: bool = False
+    error: Optional[str] = None
+
+
+@dataclass
+class IngestReport:
+    """Summary of one ingestion run."""
+    total_chunks: int
+    batches: List[BatchTiming] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+    # Near-duplicates skipped before embedding: chunk index -> kept chunk index (-1: stored earlier)
+    duplicate_of: Dict[int, int] = field(default_factory=dict)
+    # Ids written by successful batches (failed batches leave theirs out)
+    stored_ids: List[str] = field(default_factory=list)
+    # Chunk index -> vector id (set by vector_store only for chunks whose vector is stored:
+    # unchanged since the previous upload or upserted by a successful batch)
+    chunk_ids: Dict[int, str] = field(default_factory=dict)
+
+    @property
+    def duplicate_chunks(self) -> int:
+        return len(self.duplicate_of)
+
+    @property
+    def embedded_chunks(self) -> int:
+        return sum(b.size for b in self.batches if b.success)
+
+    @property
+    def failed_batches(self) -> List[int]:
+        return [b.index for b in self.batches if not b.success]
+
+    def summary(self) -> str:
+        embed_times = [b.embed_seconds for b in self.batches if b.success]
+        slowest = max(embed_times) if embed_times else 0.0
+        return (
+            f"{self.embedded_chunks}/{self.total_chunks} chunks in {len(self.batches)} batches, "
+            f"{self.elapsed_seconds:.2f}s total, slowest batch embed {slowest:.2f}s, "
+            f"failed batches: {self.failed_batches or 'none'}, "
+            f"near-duplicates skipped: {self.duplicate_chunks}"
+        )
+
+
+class TokenBudget:
+    """Limits the number of (estimated) tokens that are being embedded at the same time."""
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, tokens: int) -> None:
+        # A single batch larger than the budget is still allowed to run alone
+        tokens = min(tokens, self.max_tokens)
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight + tokens <= self.max_tokens)
+            self._in_flight += tokens
+
+    async def release(self, tokens: int) -> None:
+        tokens = min(tokens, self.max_tokens)
+        async with self._condition:
+            self._in_flight -= tokens
+            self._condition.notify_all()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) - good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def make_batches(texts: List[str], batch_size: int, max_batch_tokens: int) -> List[List[int]]:
+    """Splits texts into batches of indices, bounded by count and estimated tokens."""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= batch_size or current_tokens + tokens > max_batch_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def embed_and_upsert(
+    texts: List[str],
+    metadatas: List[Dict[str, Any]],
+    ids: List[str],
+    embedder: Embeddings,
+    upsert: UpsertFn,
+    batch_size: int = INGEST_BATCH_SIZE,
+    max_batch_tokens: int = INGEST_MAX_BATCH_TOKENS,
+    max_concurrency: int = INGEST_MAX_CONCURRENCY,
+    max_tokens_in_flight: int = INGEST_MAX_TOKENS_IN_FLIGHT,
+    max_retries: int = INGEST_MAX_RETRIES,
+    retry_backoff: float = 1.0,
+) -> IngestReport:
+    """
+    Embeds `texts` in concurrent batches and upserts every batch as soon as it is embedded.
+
+    A failing batch is retried with exponential backoff without affecting other batches.
+    Batches that still fail are reported in `IngestReport.failed_batches`.
+    """
+    report = IngestReport(total_chunks=len(texts))
+    if not texts:
+        return report
+
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    budget = TokenBudget(max_tokens_in_flight)
+
+    async def run_batch(batch_index: int, indices: List[int]) -> BatchTiming:
+        batch_texts = [texts[i] for i in indices]
+        timing = BatchTiming(
+            index=batch_index,
+            size=len(indices),
+            tokens=sum(estimate_tokens(t) for t in batch_texts)
+        )
+
+        async with semaphore:
+            for attempt in range(1, max_retries + 1):
+                timing.attempts = attempt
+                try:
+                    await budget.acquire(timing.tokens)
+                    try:
+                        t0 = time.perf_counter()
+                        vectors = await embedder.aembed_documents(batch_texts)
+                        timing.embed_seconds = time.perf_counter() - t0
+                    finally:
+                        await budget.release(timing.tokens)
+
+                    t0 = time.perf_counter()
+                    await upsert(
+                        [ids[i] for i in indices],
+                        vectors,
+                        batch_texts,
+                        [metadatas[i] for i in indices]
+                    )
+                    timing.upsert_seconds = time.perf_counter() - t0
+                    timing.success = True
+                    report.stored_ids.extend(ids[i] for i in indices)
+                    timing.error = None
+                    break
+                except Exception as e:
+                    timing.error = str(e)
+                    logger.warning(f"Batch {batch_index} failed (attempt {attempt}/{max_retries}): {e}")
+
+                if attempt < max_retries:
+                    await asyncio.sleep(retry_backoff * 2 ** (attempt - 1))
+
+        logger.debug(
+            f"Batch {batch_index}: {timing.size} chunks, ~{timing.tokens} tokens, "
+            f"embed {timing.embed_seconds:.2f}s, upsert {timing.upsert_seconds:.2f}s, attempts {timing.attempts}"
+        )
+        return timing
+
+    async def run_batch_safely(batch_index: int, indices: List[int]) -> BatchTiming:
+        try:
+            return await run_batch(batch_index, indices)
+        except Exception as e:
+            logger.error(f"Batch {batch_index} failed permanently: {e}", exc_info=True)
+            return BatchTiming(index=batch_index, size=len(indices), tokens=0, error=str(e))
+
+    batches = make_batches(texts, batch_size, max_batch_tokens)
+    report.batches = list(await asyncio.gather(
+        *(run_batch_safely(i, indices) for i, indices in enumerate(batches))
+    ))
+    report.elapsed_seconds = time.perf_counter() - started
+    return report
@@ -0,0 +1,122 @@
+# lexical_index.py
+"""
+Persistent lexical (full-text) search over document sections.
+
+Every chunk stored in the vector store is also a `DocumentSection` row, so the lexical
+index lives in Postgres: a GIN expression index on `to_tsvector('simple', content_text)`
+(see `DocumentSection.__table_args__`). Postgres maintains it on every insert/delete of
+a section, so there is nothing to rebuild per query or per upload.
+
+The 'simple' configuration lowercases tokens without stemming. Stock Postgres has no
+Polish stemmer, and exact terms (formula names, course codes like "MAT-101") are what
+this index is for. The query expression must stay identical to the index expression,
+otherwise Postgres falls back to a sequential scan.
+
+Results use the same row shape as vector search (`id`, `content`, `metadata`, `score`)
+with the document attributes already attached, so both lists can be fused directly
+(see `ranking.reciprocal_rank_fusion`). A `document_ids` scope (retrieval_filters.py)
+is applied in the same query.
+"""
+
+import asyncio
+import logging
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import func, literal_column
+
+from .database import SessionLocal
+from .models import DocumentSection, FileCategory, WorkspaceDocument
+from .retrieval_filters import document_uuids
+
+logger = logging.getLogger(__name__)
+
+# Musi być zgodne z wyrażeniem indeksu `idx_sections_content_tsv` w models.py
+TS_CONFIG = literal_column("'simple'::regconfig")
+
+MAX_QUERY_TERMS = 32
+
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def section_tsvector():
+    return func.to_tsvector(TS_CONFIG, DocumentSection.content_text)
+
+
+def query_terms(query: str) -> List[str]:
+    """Distinct lowercase terms of the query (at most MAX_QUERY_TERMS)."""
+    terms: List[str] = []
+    for term in _TERM_PATTERN.findall(query.lower()):
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def search_sections(query: str, user_id: str, n_results: int = 5,
+                    document_ids: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Sections of the user's documents matching any query term, best `ts_rank_cd` first.
+    A section matching more (and closer) terms ranks higher. `document_ids` restricts
+    the search to these documents.
+    """
+    terms = query_terms(query)
+    if not terms or (document_ids is not None and not document_ids):
+        return []
+    try:
+        owner_id = int(user_id)
+    except (TypeError, ValueError):
+        return []
+
+    # websearch_to_tsquery nie zgłasza błędów składni; "or" łączy termy alternatywą
+    ts_query = func.websearch_to_tsquery(TS_CONFIG, " or ".join(terms))
+    rank = func.ts_rank_cd(section_tsvector(), ts_query).label("rank")
+
+    filters = [WorkspaceDocument.user_id == owner_id, section_tsvector().op("@@")(ts_query)]
+    if document_ids is not None:
+        filters.append(WorkspaceDocument.id.in_(document_uuids(document_ids)))
+
+    with SessionLocal() as db:
+        rows = db.query(
+            DocumentSection.document_id,
+            DocumentSection.section_index,
+            DocumentSection.content_text,
+            DocumentSection.vector_id,
+            DocumentSection.section_metadata["page_number"].astext,
+            WorkspaceDocument.title,
+            WorkspaceDocument.original_filename,
+            WorkspaceDocument.description,
+            FileCategory.name,
+            rank,
+        ).join(
+            WorkspaceDocument, WorkspaceDocument.id == DocumentSection.document_id
+        ).outerjoin(
+            FileCategory, FileCategory.id == WorkspaceDocument.category_id
+        ).filter(*filters).order_by(rank.desc()).limit(n_results).all()
+
+    results = []
+    for (document_id, section_index, content, vector_id, page, title, original_filename,
+         description, category, score) in rows:
+        metadata: Dict[str, Any] = {
+            "user_id": str(user_id),
+            "document_id": str(document_id),
+            "chunk_index": section_index,
+            "file_name": original_filename or title,
+            "title": title,
+            "file_description": description or "",
+            "category": category or "General",
+        }
+        if page and page.isdigit():
+            metadata["page"] = int(page)
+        results.append({
+            "id": vector_id or f"section_{document_id}_{section_index}",
+            "content": content,
+            "metadata": metadata,
+            "score": float(score),
+        })
+    return results
+
+
+async def asearch_sections(query: str, user_id: str, n_results: int = 5,
+                           document_ids: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """Asynchroniczna wersja `search_sections` (zapytanie w wątku, sesje są synchroniczne)."""
+    return await asyncio.to_thread(search_sections, query, user_id, n_results, document_ids)
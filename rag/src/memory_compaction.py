@@ -0,0 +1,215 @@
+# memory_compaction.py
+"""
+Periodic compaction of the long-term memories in `user-memories`.
+
+For each user:
+1. Cluster memories whose embeddings are at least MEMORY_MERGE_MIN_SIMILARITY (cosine)
+   similar. Every cluster collapses into its most important member, which inherits
+   the highest importance (plus a small bump per merged duplicate), the latest
+   `last_accessed`, the earliest `created_at` and the summed `mentions`.
+2. Evict stale entries: not accessed for MEMORY_STALE_DAYS and importance at most
+   MEMORY_STALE_MAX_IMPORTANCE.
+3. Enforce MEMORY_MAX_PER_USER: keep the memories with the best importance, decayed by
+   time since last access.
+
+Runs inside the API (see `memory_compaction_loop`, guarded by a Redis lock so only one
+worker compacts at a time) or manually, from the `rag` directory:
+
+    python -m src.memory_compaction [--user-id 42]
+"""
+
+import argparse
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .config import (
+    MEMORY_MERGE_MIN_SIMILARITY,
+    MEMORY_IMPORTANCE_BUMP,
+    MEMORY_MAX_PER_USER,
+    MEMORY_STALE_DAYS,
+    MEMORY_STALE_MAX_IMPORTANCE,
+    MEMORY_COMPACTION_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+_LOCK_KEY = "memory-compaction-lock"
+
+
+@dataclass
+class CompactionPlan:
+    """Changes to apply to one user's memories."""
+    updates: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    delete_ids: List[str] = field(default_factory=list)
+    merged: int = 0
+    evicted: int = 0
+
+
+def _timestamp(metadata: Dict[str, Any], key: str) -> datetime:
+    try:
+        return datetime.fromisoformat(metadata.get(key) or "")
+    except (TypeError, ValueError):
+        return datetime.min
+
+
+def _retention_score(metadata: Dict[str, Any], now: datetime, half_life_days: float) -> float:
+    age_days = max(0.0, (now - _timestamp(metadata, "last_accessed")).total_seconds() / 86400)
+    return metadata.get("importance", 0.0) * 0.5 ** (age_days / max(half_life_days, 1.0))
+
+
+def plan_compaction(ids: List[str],
+                    vectors: Sequence[Sequence[float]],
+                    metadatas: List[Dict[str, Any]],
+                    now: Optional[datetime] = None,
+                    merge_similarity: float = MEMORY_MERGE_MIN_SIMILARITY,
+                    max_per_user: int = MEMORY_MAX_PER_USER,
+                    stale_days: int = MEMORY_STALE_DAYS,
+                    stale_max_importance: float = MEMORY_STALE_MAX_IMPORTANCE) -> CompactionPlan:
+    """Computes merges and evictions for one user's memories (pure function, no I/O)."""
+    plan = CompactionPlan()
+    if not ids:
+        return plan
+    now = now or datetime.now()
+    metadatas = [dict(m or {}) for m in metadatas]
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = matrix / norms
+
+    # Greedy clustering: the most important (then most recent) memory represents its cluster
+    order = sorted(
+        range(len(ids)),
+        key=lambda i: (metadatas[i].get("importance", 0.0), _timestamp(metadatas[i], "last_accessed")),
+        reverse=True
+    )
+    representatives: List[int] = []
+    members: Dict[int, List[int]] = {}
+    for i in order:
+        if representatives:
+            similarities = matrix[representatives] @ matrix[i]
+            best = int(np.argmax(similarities))
+            if similarities[best] >= merge_similarity:
+                members[representatives[best]].append(i)
+                continue
+        representatives.append(i)
+        members[i] = [i]
+
+    survivors = []
+    for rep in representatives:
+        group = members[rep]
+        metadata = metadatas[rep]
+        if len(group) > 1:
+            group_meta = [metadatas[i] for i in group]
+            metadata["importance"] = min(
+                1.0, max(m.get("importance", 0.0) for m in group_meta) + MEMORY_IMPORTANCE_BUMP * (len(group) - 1)
+            )
+            metadata["last_accessed"] = max(_timestamp(m, "last_accessed") for m in group_meta).isoformat()
+            created = min(_timestamp(m, "created_at") for m in group_meta)
+            if created != datetime.min:
+                metadata["created_at"] = created.isoformat()
+            metadata["mentions"] = sum(m.get("mentions", 1) for m in group_meta)
+            plan.updates[ids[rep]] = metadata
+            plan.delete_ids.extend(ids[i] for i in group[1:])
+            plan.merged += len(group) - 1
+        survivors.append(rep)
+
+    stale_before = now - timedelta(days=stale_days)
+    kept = []
+    for rep in survivors:
+        metadata = metadatas[rep]
+        if (_timestamp(metadata, "last_accessed") < stale_before
+                and metadata.get("importance", 0.0) <= stale_max_importance):
+            plan.delete_ids.append(ids[rep])
+            plan.updates.pop(ids[rep], None)
+            plan.evicted += 1
+        else:
+            kept.append(rep)
+
+    if len(kept) > max_per_user:
+        kept.sort(key=lambda i: _retention_score(metadatas[i], now, stale_days), reverse=True)
+        for rep in kept[max_per_user:]:
+            plan.delete_ids.append(ids[rep])
+            plan.updates.pop(ids[rep], None)
+            plan.evicted += 1
+
+    return plan
+
+
+async def acompact_user_memories(user_id: str) -> CompactionPlan:
+    """Compacts the memories of one user."""
+    from . import vector_store
+
+    got = await vector_store.aget_user_memories(user_id, include=["embeddings", "metadatas"])
+    if len(got["ids"]) < 2:
+        return CompactionPlan()
+
+    plan = plan_compaction(got["ids"], got["embeddings"], got["metadatas"])
+    if plan.updates:
+        await vector_store.aupdate_memories(user_id, list(plan.updates), list(plan.updates.values()))
+    if plan.delete_ids:
+        await vector_store.adelete_memories(user_id, plan.delete_ids)
+    if plan.merged or plan.evicted:
+        logger.info(f"[MEMORY] Compacted user {user_id}: {plan.merged} merged, {plan.evicted} evicted")
+    return plan
+
+
+def _all_user_ids() -> List[str]:
+    from .database import SessionLocal
+    from .models import User
+
+    with SessionLocal() as db:
+        return [str(user_id) for (user_id,) in db.query(User.id_).all()]
+
+
+async def acompact_all_users() -> None:
+    user_ids = await asyncio.to_thread(_all_user_ids)
+    merged = evicted = 0
+    for user_id in user_ids:
+        try:
+            plan = await acompact_user_memories(user_id)
+            merged += plan.merged
+            evicted += plan.evicted
+        except Exception as e:
+            logger.error(f"[MEMORY] Compaction failed for user {user_id}: {e}")
+    logger.info(f"[MEMORY] Compaction pass over {len(user_ids)} users: {merged} merged, {evicted} evicted")
+
+
+async def memory_compaction_loop(redis_client=None, interval: float = MEMORY_COMPACTION_INTERVAL) -> None:
+    """
+    Background task started in the API lifespan. With Redis, a lock that expires after
+    one interval makes sure only one worker runs each pass.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if redis_client is not None:
+                acquired = await redis_client.set(_LOCK_KEY, "1", nx=True, ex=max(1, int(interval * 0.9)))
+                if not acquired:
+                    continue
+            await acompact_all_users()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[MEMORY] Compaction pass failed: {e}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Merge duplicate and evict stale long-term memories.")
+    parser.add_argument("--user-id", help="Compact only this user")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.user_id:
+        asyncio.run(acompact_user_memories(args.user_id))
+    else:
+        asyncio.run(acompact_all_users())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+# memory_index.py
+"""
+Postgres index and counters for user memories.
+
+Chroma holds the text and vectors of memories. It has no ordering and no aggregates,
+so listing "newest first" and computing stats used to scan the whole collection.
+Two side tables fix that:
+- UserMemoryEntry: (user_id, created_at, memory_id) for cursor pagination
+- UserMemoryStats: count, importance sum/buckets and newest timestamps per user
+
+Both are maintained by the memory write paths in vector_store. A user whose stats row
+does not exist yet is not indexed. Writes for that user are ignored, and the first
+list/stats request backfills the index once from Chroma (`backfill`), then reads Chroma
+again to apply the writes that raced with it (`reconcile_backfill`).
+
+All functions are synchronous (SQLAlchemy sessions); async callers use asyncio.to_thread.
+Failures are logged, never raised - the index must not break memory writes.
+"""
+
+import base64
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+
+from .database import SessionLocal
+from .models import UserMemoryEntry, UserMemoryStats
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _bucket(importance: float) -> str:
+    if importance >= 0.7:
+        return "high_count"
+    if importance >= 0.3:
+        return "medium_count"
+    return "low_count"
+
+
+def _apply(stats: UserMemoryStats, importance: float, sign: int) -> None:
+    stats.total_count = max(0, (stats.total_count or 0) + sign)
+    stats.importance_sum = (stats.importance_sum or 0.0) + sign * importance
+    bucket = _bucket(importance)
+    setattr(stats, bucket, max(0, (getattr(stats, bucket) or 0) + sign))
+
+
+def _recompute_newest(db, stats: UserMemoryStats) -> None:
+    newest = db.query(UserMemoryEntry.created_at).filter(
+        UserMemoryEntry.user_id == stats.user_id
+    ).order_by(UserMemoryEntry.created_at.desc()).first()
+    stats.newest_created_at = newest[0] if newest else None
+
+
+def encode_cursor(created_at: datetime, memory_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{memory_id}".encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Raises ValueError for malformed cursors."""
+    created_at, memory_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split("|", 1)
+    return datetime.fromisoformat(created_at), memory_id
+
+
+def record_added(user_id: str, memory_id: str, metadata: Dict[str, Any]) -> None:
+    try:
+        with SessionLocal() as db:
+            stats = db.get(UserMemoryStats, int(user_id), with_for_update=True)
+            if stats is None:
+                return
+            created_at = _parse_time(metadata.get("created_at")) or datetime.now()
+            importance = metadata.get("importance", 0.5)
+            db.add(UserMemoryEntry(
+                memory_id=memory_id,
+                user_id=int(user_id),
+                importance=importance,
+                created_at=created_at,
+                last_accessed=_parse_time(metadata.get("last_accessed")),
+            ))
+            _apply(stats, importance, +1)
+            if stats.newest_created_at is None or created_at > stats.newest_created_at:
+                stats.newest_created_at = created_at
+            stats.last_accessed_at = datetime.now()
+            db.commit()
+    except IntegrityError:
+        logger.debug(f"Memory {memory_id} already indexed")
+    except Exception as e:
+        logger.warning(f"Memory index update (add) failed for user {user_id}: {e}")
+
+
+def record_updated(user_id: str, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+    try:
+        with SessionLocal() as db:
+            stats = db.get(UserMemoryStats, int(user_id), with_for_update=True)
+            if stats is None:
+                return
+            entries = {
+                e.memory_id: e for e in db.query(UserMemoryEntry).filter(UserMemoryEntry.memory_id.in_(ids)).all()
+            }
+            for memory_id, metadata in zip(ids, metadatas):
+                entry = entries.get(memory_id)
+                if entry is None:
+                    continue
+                _apply(stats, entry.importance, -1)
+                entry.importance = metadata.get("importance", entry.importance)
+                _apply(stats, entry.importance, +1)
+                entry.last_accessed = _parse_time(metadata.get("last_accessed")) or entry.last_accessed
+                created_at = _parse_time(metadata.get("created_at"))
+                if created_at is not None:
+                    entry.created_at = created_at
+            stats.last_accessed_at = datetime.now()
+            db.commit()
+    except Exception as e:
+        logger.warning(f"Memory index update (update) failed for user {user_id}: {e}")
+
+
+def record_deleted(user_id: str, ids: List[str]) -> None:
+    try:
+        with SessionLocal() as db:
+            stats = db.get(UserMemoryStats, int(user_id), with_for_update=True)
+            if stats is None:
+                return
+            entries = db.query(UserMemoryEntry).filter(
+                UserMemoryEntry.user_id == int(user_id), UserMemoryEntry.memory_id.in_(ids)
+            ).all()
+            for entry in entries:
+                _apply(stats, entry.importance, -1)
+                db.delete(entry)
+            db.flush()
+            _recompute_newest(db, stats)
+            db.commit()
+    except Exception as e:
+        logger.warning(f"Memory index update (delete) failed for user {user_id}: {e}")
+
+
+def record_cleared(user_id: str) -> None:
+    try:
+        with SessionLocal() as db:
+            db.query(UserMemoryEntry).filter(UserMemoryEntry.user_id == int(user_id)).delete()
+            stats = db.get(UserMemoryStats, int(user_id))
+            if stats is not None:
+                stats.total_count = stats.high_count = stats.medium_count = stats.low_count = 0
+                stats.importance_sum = 0.0
+                stats.newest_created_at = None
+            db.commit()
+    except Exception as e:
+        logger.warning(f"Memory index update (clear) failed for user {user_id}: {e}")
+
+
+def is_indexed(user_id: str) -> bool:
+    with SessionLocal() as db:
+        return db.get(UserMemoryStats, int(user_id)) is not None
+
+
+def _add_entry(db, stats: UserMemoryStats, user_id: str, memory_id: str, metadata: Dict[str, Any]) -> None:
+    importance = metadata.get("importance", 0.5)
+    created_at = _parse_time(metadata.get("created_at")) or datetime.min
+    db.add(UserMemoryEntry(
+        memory_id=memory_id,
+        user_id=int(user_id),
+        importance=importance,
+        created_at=created_at,
+        last_accessed=_parse_time(metadata.get("last_accessed")),
+    ))
+    _apply(stats, importance, +1)
+    if stats.newest_created_at is None or created_at > stats.newest_created_at:
+        stats.newest_created_at = created_at
+
+
+def backfill(user_id: str, got: Dict[str, Any]) -> bool:
+    """
+    Builds the index of a user from a Chroma `get` result (ids + metadatas) holding every
+    memory of that user. Runs once per user; a concurrent backfill by another worker wins.
+    Returns True when this call built the index (the caller then runs `reconcile_backfill`).
+    """
+    with SessionLocal() as db:
+        if db.get(UserMemoryStats, int(user_id)) is not None:
+            return False
+
+        stats = UserMemoryStats(user_id=int(user_id), total_count=0, importance_sum=0.0,
+                                high_count=0, medium_count=0, low_count=0)
+        for memory_id, metadata in zip(got.get("ids") or [], got.get("metadatas") or []):
+            _add_entry(db, stats, user_id, memory_id, metadata or {})
+        db.add(stats)
+        try:
+            db.commit()
+            logger.info(f"Memory index backfilled for user {user_id}: {stats.total_count} memories")
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+
+
+def reconcile_backfill(user_id: str, before: Dict[str, Any], after: Dict[str, Any]) -> None:
+    """
+    Applies the writes that `backfill` missed. Until its stats row was committed, record_*
+    ignored the user, so memories added between the Chroma read (`before`) and the commit
+    are not indexed, and memories deleted in that window are still indexed. `after` is a
+    Chroma read made after the commit; later writes are recorded by record_* as usual.
+    """
+    try:
+        with SessionLocal() as db:
+            stats = db.get(UserMemoryStats, int(user_id), with_for_update=True)
+            if stats is None:
+                return
+            after_ids = after.get("ids") or []
+            indexed = {
+                row[0] for row in db.query(UserMemoryEntry.memory_id).filter(
+                    UserMemoryEntry.user_id == int(user_id),
+                    UserMemoryEntry.memory_id.in_(set(after_ids) | set(before.get("ids") or [])),
+                ).all()
+            }
+            added = 0
+            for memory_id, metadata in zip(after_ids, after.get("metadatas") or []):
+                if memory_id not in indexed:
+                    _add_entry(db, stats, user_id, memory_id, metadata or {})
+                    added += 1
+
+            deleted = (set(before.get("ids") or []) - set(after_ids)) & indexed
+            for entry in db.query(UserMemoryEntry).filter(UserMemoryEntry.memory_id.in_(deleted)).all():
+                _apply(stats, entry.importance, -1)
+                db.delete(entry)
+            db.flush()
+            _recompute_newest(db, stats)
+            db.commit()
+            if added or deleted:
+                logger.info(f"Memory index of user {user_id} caught up: +{added} / -{len(deleted)} memories")
+    except Exception as e:
+        logger.warning(f"Memory index reconcile failed for user {user_id}: {e}")
+
+
+def list_page(user_id: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+    """Memory ids of one page (newest first) and the cursor of the next page (None at the end)."""
+    with SessionLocal() as db:
+        query = db.query(UserMemoryEntry.memory_id, UserMemoryEntry.created_at).filter(
+            UserMemoryEntry.user_id == int(user_id)
+        )
+        if cursor:
+            created_at, memory_id = decode_cursor(cursor)
+            query = query.filter(or_(
+                UserMemoryEntry.created_at < created_at,
+                and_(UserMemoryEntry.created_at == created_at, UserMemoryEntry.memory_id < memory_id)
+            ))
+        rows = query.order_by(
+            UserMemoryEntry.created_at.desc(), UserMemoryEntry.memory_id.desc()
+        ).limit(limit + 1).all()
+
+    next_cursor = encode_cursor(rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+    return [row[0] for row in rows[:limit]], next_cursor
+
+
+def get_stats(user_id: str) -> Dict[str, Any]:
+    with SessionLocal() as db:
+        stats = db.get(UserMemoryStats, int(user_id))
+        total = stats.total_count if stats else 0
+        return {
+            "total_memories": total,
+            "average_importance": round(stats.importance_sum / total, 2) if total else 0.0,
+            "importance_distribution": {
+                "high": stats.high_count if stats else 0,
+                "medium": stats.medium_count if stats else 0,
+                "low": stats.low_count if stats else 0,
+            },
+            "newest_memory_at": stats.newest_created_at.isoformat() if stats and stats.newest_created_at else None,
+            "last_activity_at": stats.last_accessed_at.isoformat() if stats and stats.last_accessed_at else None,
+        }
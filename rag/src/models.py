@@ -15,6 +15,7 @@ from sqlalchemy import (
     Text,
     Index,
 )
+from sqlalchemy import text as sql_text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 import uuid
 from sqlalchemy.orm import (
@@ -520,6 +521,7 @@ class WorkspaceDocument(Base):
     )
     title = Column(Text, nullable=False)
     original_filename = Column(String(512), nullable=True)
+    description = Column(Text, nullable=True)  # Opis pliku (dołączany do wyników wyszukiwania wektorowego)
     file_type = Column(String(50), nullable=True)  # 'pdf', 'txt', 'docx', etc.
     total_length = Column(Integer, default=0)  # Total character count
     total_sections = Column(Integer, default=0)  # Number of sections
@@ -582,6 +584,10 @@ class DocumentSection(Base):
     char_start = Column(Integer, default=0)  # Pozycja startowa w całym dokumencie
     char_end = Column(Integer, default=0)  # Pozycja końcowa w całym dokumencie
 
+    # ID wektora chunku w ChromaDB (vector_store.chunk_vector_id); NULL dla prawie-duplikatów
+    # i sekcji zaindeksowanych przed wprowadzeniem deterministycznych ID
+    vector_id = Column(String(128), nullable=True, index=True)
+
     # Relationships
     document = relationship("WorkspaceDocument", back_populates="sections")
     highlights = relationship(
@@ -591,8 +597,14 @@ class DocumentSection(Base):
     )
 
     # Indeks do szybkiego pobierania kolejnych partii przy scrollowaniu
+    # + indeks pełnotekstowy (GIN) dla wyszukiwania leksykalnego (lexical_index.py)
     __table_args__ = (
         Index('idx_sections_order', 'document_id', 'section_index'),
+        Index(
+            'idx_sections_content_tsv',
+            sql_text("to_tsvector('simple'::regconfig, content_text)"),
+            postgresql_using='gin',
+        ),
     )
 
     model_config = ConfigDict(from_attributes=True)
@@ -693,3 +705,71 @@ class UserHighlight(Base):
 
     model_config = ConfigDict(from_attributes=True)
 
+
+
+class VectorIndexGeneration(Base):
+    """
+    Generacja indeksu wektorowego (kolekcje Chroma "<baza>-g<id>") wraz z ustawieniami embeddingów.
+    Brak aktywnej generacji oznacza kolekcje bazowe i ustawienia z config.py.
+    Wiersz 'building' jest jednocześnie checkpointem zadania reindeksacji (src/reindex.py).
+    """
+    __tablename__ = "vector_index_generations"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    status = Column(String(20), nullable=False, default="building", index=True)  # building/active/retired/cancelled/dropped
+    embedding_model = Column(String(128), nullable=False)
+    embedding_dimensions = Column(Integer, nullable=True)
+    # Model wspomnień zapisany przy starcie generacji (NULL = generacja sprzed tej kolumny, model z config.py)
+    memory_embedding_model = Column(String(128), nullable=True)
+    memory_embedding_dimensions = Column(Integer, nullable=True)
+    chunk_size = Column(Integer, nullable=True)  # None = sekcje DocumentSection 1:1
+    chunk_overlap = Column(Integer, nullable=True)
+
+    # Checkpoint (dokumenty po id rosnąco, potem wspomnienia kolekcja po kolekcji)
+    last_document_id = Column(UUID(as_uuid=True), nullable=True)
+    documents_done = Column(Integer, default=0)
+    chunks_done = Column(Integer, default=0)
+    documents_finished = Column(Boolean, default=False)
+    memory_collection = Column(String(128), nullable=True)
+    memory_last_id = Column(String(256), nullable=True)  # id wspomnienia (migawka id posortowana rosnąco)
+    memories_done = Column(Integer, default=0)
+    memories_finished = Column(Boolean, default=False)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    activated_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class UserMemoryEntry(Base):
+    """
+    Indeks wspomnień użytkownika (treść i wektory są w Chroma).
+    Pozwala stronicować listę po dacie utworzenia bez skanowania kolekcji.
+    """
+    __tablename__ = "user_memory_entries"
+
+    memory_id = Column(String(128), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id_", ondelete="CASCADE"), nullable=False)
+    importance = Column(Float, nullable=False, default=0.5)
+    created_at = Column(DateTime, nullable=False)
+    last_accessed = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Stronicowanie kursorem: (created_at, memory_id) malejąco w obrębie użytkownika
+        Index('idx_user_memory_entries_page', 'user_id', 'created_at', 'memory_id'),
+    )
+
+
+class UserMemoryStats(Base):
+    """Liczniki wspomnień użytkownika aktualizowane przy dodawaniu/usuwaniu (O(1) statystyki)."""
+    __tablename__ = "user_memory_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id_", ondelete="CASCADE"), primary_key=True)
+    total_count = Column(Integer, nullable=False, default=0)
+    importance_sum = Column(Float, nullable=False, default=0.0)
+    high_count = Column(Integer, nullable=False, default=0)  # importance >= 0.7
+    medium_count = Column(Integer, nullable=False, default=0)  # 0.3 - 0.7
+    low_count = Column(Integer, nullable=False, default=0)  # < 0.3
+    newest_created_at = Column(DateTime, nullable=True)
+    last_accessed_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
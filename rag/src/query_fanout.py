@@ -0,0 +1,148 @@
+# query_fanout.py
+"""
+Multi-query retrieval for questions with several facets.
+
+A question like "porównaj całkę Riemanna i Lebesgue'a" has one embedding that sits
+between both topics, so a single search tends to return context for one facet only.
+The question is decomposed into sub-queries (the original query first):
+
+- heuristic: separate questions ("?", ";", new lines), comparisons
+  ("porównaj/compare/różnica między X i Y", "X vs Y") - no extra latency
+- llm: one call of a small chat model, with a timeout; falls back to the heuristic
+
+All sub-queries are searched concurrently (each one is a full `asearch_and_rerank`,
+i.e. vector and full-text search in parallel, with its own retrieval cache entry) and
+their rankings are fused with RRF, deduplicated per chunk (`ranking.result_key`).
+Sub-queries still running after QUERY_FANOUT_DEADLINE_MS are cancelled and dropped;
+only the original query is always waited for.
+"""
+
+import asyncio
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from .config import (
+    QUERY_FANOUT_DEADLINE_MS,
+    QUERY_FANOUT_LLM_TIMEOUT_MS,
+    QUERY_FANOUT_MAX_SUBQUERIES,
+    QUERY_FANOUT_MODE,
+)
+from .lexical_index import query_terms
+from .ranking import reciprocal_rank_fusion, result_key
+from .retrieval_filters import RetrievalFilters
+
+logger = logging.getLogger(__name__)
+
+_QUESTION_SPLIT = re.compile(r"[?;\n]+")
+_COMPARISON = re.compile(
+    r"^(?:porównaj|porównanie|compare|comparison of|różnic[aey]\s+(?:między|pomiędzy)|differences?\s+between)\s+"
+    r"(?P<first>.+?)\s+(?:i|oraz|a|and|z|with|vs\.?|versus)\s+(?P<second>.+)$",
+    re.IGNORECASE,
+)
+_VERSUS = re.compile(r"\s+(?:vs\.?|versus|kontra)\s+", re.IGNORECASE)
+
+_LLM_PROMPT = (
+    "Split the user's question into at most {n} short, self-contained search queries, one per "
+    "distinct topic the answer needs. Keep the question's language. If it is about a single "
+    "topic, return just that one query. Reply ONLY with a JSON list of strings."
+)
+
+
+def _facets(part: str) -> List[str]:
+    match = _COMPARISON.match(part)
+    if match:
+        return [match.group("first"), match.group("second")]
+    return _VERSUS.split(part)
+
+
+def _unique_subqueries(query: str, candidates: List[str], max_subqueries: int) -> List[str]:
+    subqueries = [query]
+    seen = {query.lower()}
+    for candidate in candidates:
+        candidate = candidate.strip(" .,:!?\"'")
+        if not query_terms(candidate) or candidate.lower() in seen:
+            continue
+        seen.add(candidate.lower())
+        subqueries.append(candidate)
+    return subqueries[:max(1, max_subqueries)]
+
+
+def decompose_query(query: str, max_subqueries: int = QUERY_FANOUT_MAX_SUBQUERIES) -> List[str]:
+    """Heuristic decomposition: the query itself, then its facets (at most `max_subqueries` in total)."""
+    query = " ".join(query.split())
+    facets = [facet for part in _QUESTION_SPLIT.split(query) if part.strip() for facet in _facets(part.strip())]
+    if len(facets) <= 1:
+        return [query]
+    return _unique_subqueries(query, facets, max_subqueries)
+
+
+async def adecompose_query_llm(query: str, model: Any, max_subqueries: int = QUERY_FANOUT_MAX_SUBQUERIES,
+                               timeout_ms: float = QUERY_FANOUT_LLM_TIMEOUT_MS) -> List[str]:
+    """Decomposition with one LLM call; the heuristic is used on timeout or an unusable reply."""
+    messages = [SystemMessage(content=_LLM_PROMPT.format(n=max_subqueries)), HumanMessage(content=query)]
+    try:
+        response = await asyncio.wait_for(model.ainvoke(messages), timeout_ms / 1000.0)
+        candidates = json.loads(response.content.strip().strip("`").removeprefix("json"))
+        if not isinstance(candidates, list) or not all(isinstance(c, str) for c in candidates):
+            raise ValueError(f"expected a JSON list of strings, got: {response.content[:200]}")
+    except Exception as e:
+        logger.warning(f"LLM query decomposition failed ({type(e).__name__}: {e}), using the heuristic.")
+        return decompose_query(query, max_subqueries)
+    return _unique_subqueries(" ".join(query.split()), candidates, max_subqueries)
+
+
+async def aplan_subqueries(query: str, model: Any = None, mode: str = QUERY_FANOUT_MODE) -> List[str]:
+    """Sub-queries for `query` according to QUERY_FANOUT_MODE ("llm" needs `model`)."""
+    if mode == "off":
+        return [query]
+    if mode == "llm" and model is not None:
+        return await adecompose_query_llm(query, model)
+    return decompose_query(query)
+
+
+def _chunk_key(row: Dict[str, Any]) -> str:
+    # Wyniki search_and_rerank trzymają id wektora pod kluczem "_id"
+    return result_key({"id": row.get("_id"), "metadata": row.get("metadata")})
+
+
+def fuse_subquery_results(rankings: List[List[Dict[str, Any]]], n_results: int) -> List[Dict[str, Any]]:
+    """RRF over the rankings of the sub-queries; each chunk appears once, with `fanout_score`."""
+    fused = reciprocal_rank_fusion(rankings, key=_chunk_key)
+    return [{**entry["row"], "fanout_score": entry["score"]} for entry in fused[:n_results]]
+
+
+async def afanout_search(subqueries: List[str],
+                         user_id: str,
+                         n_results: int = 5,
+                         filters: Optional[RetrievalFilters] = None,
+                         deadline_ms: float = QUERY_FANOUT_DEADLINE_MS) -> List[Dict[str, Any]]:
+    """
+    Searches all `subqueries` concurrently and fuses their results. `subqueries[0]` (the
+    original query) is always awaited; the others are dropped when not done by the deadline.
+    """
+    from .search_engine import asearch_and_rerank
+
+    if len(subqueries) == 1:
+        return await asearch_and_rerank(subqueries[0], user_id=user_id, n_results=n_results, filters=filters)
+
+    tasks = [asyncio.create_task(asearch_and_rerank(q, user_id=user_id, n_results=n_results, filters=filters))
+             for q in subqueries]
+    await asyncio.wait(tasks, timeout=deadline_ms / 1000.0)
+    if not tasks[0].done():
+        await asyncio.wait([tasks[0]])
+
+    rankings = []
+    for subquery, task in zip(subqueries, tasks):
+        if not task.done():
+            task.cancel()
+            logger.info(f"Sub-query '{subquery}' dropped after the {deadline_ms:.0f} ms deadline.")
+        elif task.exception() is not None:
+            logger.warning(f"Sub-query '{subquery}' failed: {task.exception()}")
+        else:
+            rankings.append(task.result())
+    logger.info(f"Fan-out retrieval: {len(rankings)}/{len(subqueries)} sub-queries used for '{subqueries[0]}'")
+    return fuse_subquery_results(rankings, n_results)
@@ -0,0 +1,172 @@
+# ranking.py
+"""
+Merging ranked result lists from different retrievers.
+
+Vector distances and full-text ranks live on unrelated scales. Two fusions are offered:
+
+- weighted: scores are first mapped to [0, 1] (distances -> cosine similarity, then
+  min-max per list), and combined as  sum of weight * normalized score  (0 when a
+  retriever did not return the chunk). Computed on numpy arrays over the union.
+- rrf: reciprocal rank fusion (Cormack et al., 2009), ranks only,
+
+      score(d) = sum over lists of  weight / (k + rank(d))
+
+  with 1-based ranks. k = 60 is the value from the paper.
+
+Both return entries {"row", "score", "ranks"} best first, so callers can switch freely.
+
+`maximal_marginal_relevance` then picks the final results from the fused pool, trading
+relevance for novelty so overlapping chunks of one passage do not fill the context.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+RRF_K = 60
+
+
+def result_key(row: Dict[str, Any]) -> str:
+    """
+    Identity of a chunk across retrievers: (document_id, chunk_index) when known,
+    otherwise the vector id (vectors written before the document registry).
+    """
+    metadata = row.get("metadata") or {}
+    if metadata.get("document_id") and metadata.get("chunk_index") is not None:
+        return f"{metadata['document_id']}:{metadata['chunk_index']}"
+    return str(row.get("id"))
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Dict[str, Any]]],
+                           k: int = RRF_K,
+                           weights: Optional[Sequence[float]] = None,
+                           key: Callable[[Dict[str, Any]], str] = result_key) -> List[Dict[str, Any]]:
+    """
+    Fuses ranked lists (best first). Returns one entry per distinct chunk, best first:
+    {"row": first row seen for the chunk, "score": fused score, "ranks": [rank or None per list]}.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[str, Dict[str, Any]] = {}
+    for list_index, (ranking, weight) in enumerate(zip(rankings, weights)):
+        for rank, row in enumerate(ranking, start=1):
+            entry = fused.setdefault(key(row), {"row": row, "score": 0.0, "ranks": [None] * len(rankings)})
+            if entry["ranks"][list_index] is not None:
+                continue
+            entry["ranks"][list_index] = rank
+            entry["score"] += weight / (k + rank)
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
+
+
+def distances_to_similarities(distances: Sequence[float]) -> np.ndarray:
+    """
+    Squared L2 distances (Chroma's default space) of unit-norm vectors to cosine
+    similarity: ||a - b||^2 = 2 - 2 cos(a, b). Both embedding backends normalize.
+    """
+    return 1.0 - np.asarray(distances, dtype=np.float64) / 2.0
+
+
+def min_max(scores: Sequence[float]) -> np.ndarray:
+    """Scales scores to [0, 1] within one list; a list of equal scores maps to 1."""
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.size == 0:
+        return scores
+    low, high = scores.min(), scores.max()
+    if high - low <= 1e-12:
+        return np.ones_like(scores)
+    return (scores - low) / (high - low)
+
+
+def weighted_fusion(rankings: Sequence[Sequence[Dict[str, Any]]],
+                    normalized_scores: Sequence[Sequence[float]],
+                    weights: Sequence[float],
+                    key: Callable[[Dict[str, Any]], str] = result_key) -> List[Dict[str, Any]]:
+    """
+    Fuses ranked lists by a weighted sum of their normalized scores (higher is better).
+    `normalized_scores[i][j]` belongs to `rankings[i][j]`.
+    """
+    positions: Dict[str, int] = {}
+    rows: List[Dict[str, Any]] = []
+    ranks: List[List[Optional[int]]] = []
+    columns = []
+    for list_index, ranking in enumerate(rankings):
+        column = np.empty(len(ranking), dtype=np.int64)
+        for rank, row in enumerate(ranking, start=1):
+            chunk_key = key(row)
+            if chunk_key not in positions:
+                positions[chunk_key] = len(rows)
+                rows.append(row)
+                ranks.append([None] * len(rankings))
+            column[rank - 1] = positions[chunk_key]
+            if ranks[positions[chunk_key]][list_index] is None:
+                ranks[positions[chunk_key]][list_index] = rank
+        columns.append(column)
+
+    # Macierz (listy x chunki); duplikaty w jednej liście zachowują najlepszy wynik
+    matrix = np.zeros((len(rankings), len(rows)))
+    for list_index, (column, scores) in enumerate(zip(columns, normalized_scores)):
+        if len(column):
+            np.maximum.at(matrix[list_index], column, np.asarray(scores, dtype=np.float64))
+    fused = np.asarray(weights, dtype=np.float64) @ matrix if rows else np.zeros(0)
+
+    order = np.argsort(-fused, kind="stable")
+    return [{"row": rows[i], "score": float(fused[i]), "ranks": ranks[i]} for i in order]
+
+
+def fuse_hybrid(vector_results: Sequence[Dict[str, Any]],
+                lexical_results: Sequence[Dict[str, Any]],
+                fusion: str = "weighted",
+                weights: Sequence[float] = (0.7, 0.3),
+                graph_results: Optional[Sequence[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Fuses vector hits (`score` = Chroma distance) with full-text hits (`score` = rank,
+    higher is better) using `fusion` ("weighted" or "rrf"). With `graph_results`
+    (`score` higher is better) it is a third list and `weights` has three entries.
+    """
+    rankings = [vector_results, lexical_results]
+    if graph_results is not None:
+        rankings.append(graph_results)
+    if fusion == "rrf":
+        return reciprocal_rank_fusion(rankings, weights=weights)
+    normalized = [min_max(distances_to_similarities([row["score"] for row in vector_results]))]
+    normalized += [min_max([row["score"] for row in ranking]) for ranking in rankings[1:]]
+    return weighted_fusion(rankings, normalized, weights)
+
+
+def maximal_marginal_relevance(relevance: Sequence[float],
+                               embeddings: Sequence[Optional[Sequence[float]]],
+                               k: int,
+                               lambda_mult: float = 0.7) -> List[int]:
+    """
+    Greedy MMR (Carbonell & Goldstein, 1998): repeatedly picks
+
+        argmax  lambda * relevance(i) - (1 - lambda) * max over picked j of cos(i, j)
+
+    `relevance` should be in [0, 1]. lambda = 1 keeps the relevance order, lower values
+    favour diversity. Candidates without an embedding (found by full-text search only)
+    count as dissimilar to everything. Returns indices in pick order.
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    dims = next((len(e) for e in embeddings if e is not None), 0)
+    matrix = np.zeros((n, dims))
+    for i, embedding in enumerate(embeddings):
+        if embedding is not None:
+            matrix[i] = embedding
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+    similarity = matrix @ matrix.T
+
+    relevance = np.asarray(relevance, dtype=np.float64)
+    max_similarity = np.full(n, 0.0)
+    available = np.ones(n, dtype=bool)
+    picked: List[int] = []
+    for _ in range(k):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[best])
+    return picked
@@ -0,0 +1,413 @@
+# reindex.py
+"""
+Resumable re-embedding of the vector store into a new index generation.
+
+The job rebuilds document vectors from the authoritative `DocumentSection.content_text`
+rows in Postgres, and copies user memories (whose only copy is the text stored in
+Chroma) by re-embedding that text. Everything goes into the collections of a new
+'building' generation ("torched-rag-g<id>", "user-memories-g<id>"). The live
+generation keeps serving reads the whole time. See index_generations.py.
+
+- Checkpoint: the generation row stores the last finished document id and the memory
+  cursor, so after a crash `resume` continues where it stopped.
+- Dual-write: while a generation is building, uploads, deletions and new memories are
+  applied to it too, so nothing written during the rebuild is lost.
+- Throttling: chunks per second and embedding concurrency are capped, so the job does
+  not starve the API rate limit used by live traffic.
+- Swap: one transaction marks the new generation 'active' (and the old one 'retired').
+  Workers pick it up within VECTOR_GENERATION_CACHE_TTL. Retired collections are kept
+  until `cleanup`.
+
+Run from the `rag` directory:
+
+    python -m src.reindex start --model text-embedding-3-large --dimensions 1024
+    python -m src.reindex resume
+    python -m src.reindex status | swap | cancel | cleanup [--legacy]
+"""
+
+import argparse
+import asyncio
+import datetime
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import selectinload
+
+from .chunking import create_chunks
+from .config import (
+    MEMORY_EMBEDDING_MODEL,
+    MEMORY_EMBEDDING_DIMENSIONS,
+    VECTOR_GENERATION_CACHE_TTL,
+    REINDEX_BATCH_DOCUMENTS,
+    REINDEX_MAX_CHUNKS_PER_SECOND,
+    REINDEX_MAX_CONCURRENCY,
+)
+from .database import SessionLocal
+from .index_generations import LEGACY_SETTINGS, IndexSettings, get_generation_resolver, settings_from_row
+from .models import VectorIndexGeneration, WorkspaceDocument
+from .vector_partitioning import collection_for_user
+from . import vector_store
+
+logger = logging.getLogger(__name__)
+
+
+class Throttle:
+    """Keeps the average throughput at or below `rate` items per second."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._started = time.monotonic()
+        self._count = 0
+
+    async def wait(self, items: int) -> None:
+        if self.rate <= 0:
+            return
+        self._count += items
+        ahead = self._count / self.rate - (time.monotonic() - self._started)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+
+
+def vector_file_name(document: WorkspaceDocument) -> str:
+    """`file_name` under which vectors written before the document registry were stored."""
+    if document.is_notion_document and document.notion_page_id:
+        return f"notion_{document.notion_page_id}"
+    return document.original_filename or document.title
+
+
+def _building_generation(db) -> Optional[VectorIndexGeneration]:
+    return db.query(VectorIndexGeneration).filter(VectorIndexGeneration.status == "building").first()
+
+
+def _active_settings(db) -> IndexSettings:
+    active = db.query(VectorIndexGeneration).filter(VectorIndexGeneration.status == "active").first()
+    return settings_from_row(active) if active else LEGACY_SETTINGS
+
+
+def start_generation(model: str, dimensions: Optional[int], chunk_size: Optional[int] = None,
+                     chunk_overlap: Optional[int] = None, memory_model: Optional[str] = None,
+                     memory_dimensions: Optional[int] = None) -> int:
+    """
+    Creates a new 'building' generation. Only one generation can be building at a time.
+    The memory model (default: the document model) is stored on the row and used for the
+    generation's whole life, whatever MEMORY_EMBEDDING_MODEL says later.
+    """
+    if not memory_model:
+        memory_model, memory_dimensions = model, dimensions
+    with SessionLocal() as db:
+        existing = _building_generation(db)
+        if existing is not None:
+            raise ValueError(f"Generation {existing.id} is already building - resume or cancel it first.")
+        generation = VectorIndexGeneration(
+            status="building",
+            embedding_model=model,
+            embedding_dimensions=dimensions,
+            memory_embedding_model=memory_model,
+            memory_embedding_dimensions=memory_dimensions,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+        )
+        db.add(generation)
+        db.commit()
+        logger.info(f"Started vector index generation {generation.id} ({model}, dimensions={dimensions}; "
+                    f"memories: {memory_model}, dimensions={memory_dimensions})")
+        return generation.id
+
+
+def _load_document_batch(generation_id: int, batch_documents: int) -> List[Dict[str, Any]]:
+    with SessionLocal() as db:
+        generation = db.get(VectorIndexGeneration, generation_id)
+        if generation is None or generation.status != "building":
+            raise RuntimeError(f"Generation {generation_id} is not building anymore.")
+
+        query = db.query(WorkspaceDocument).options(
+            selectinload(WorkspaceDocument.sections),
+        ).order_by(WorkspaceDocument.id)
+        if generation.last_document_id is not None:
+            query = query.filter(WorkspaceDocument.id > generation.last_document_id)
+
+        return [
+            {
+                "id": document.id,
+                "user_id": str(document.user_id),
+                "file_name": vector_file_name(document),
+                "sections": [section.content_text for section in document.sections if section.content_text],
+                "pages": [
+                    (section.section_metadata or {}).get("page_number")
+                    for section in document.sections if section.content_text
+                ],
+            }
+            for document in query.limit(batch_documents).all()
+        ]
+
+
+def _checkpoint(generation_id: int, **changes) -> None:
+    with SessionLocal() as db:
+        generation = db.get(VectorIndexGeneration, generation_id)
+        for key, value in changes.items():
+            if key.endswith("_done"):
+                value = (getattr(generation, key) or 0) + value
+            setattr(generation, key, value)
+        db.commit()
+
+
+async def _reindex_documents(generation: VectorIndexGeneration, target: IndexSettings, throttle: Throttle,
+                             batch_documents: int, max_concurrency: int) -> None:
+    embedder = vector_store.embeddings_for(target)
+    while True:
+        documents = await asyncio.to_thread(_load_document_batch, generation.id, batch_documents)
+        if not documents:
+            break
+
+        for document in documents:
+            if generation.chunk_size:
+                chunks = await asyncio.to_thread(
+                    create_chunks, "\n\n".join(document["sections"]),
+                    chunk_size=generation.chunk_size, overlap=generation.chunk_overlap or 0
+                )
+                pages = None
+            else:
+                chunks = document["sections"]
+                pages = document["pages"]
+
+            shadow = vector_store.rag_collection_for(document["user_id"], target)
+            # Idempotent per document: a crash or an earlier dual-write may have left vectors behind
+            await vector_store.adelete_file_from_collection(
+                shadow, document["user_id"], document["file_name"], str(document["id"])
+            )
+            if chunks:
+                # Same near-duplicate filter as uploads (document scope - the shadow is still filling up)
+                dedup = await vector_store.adedupe_chunks(chunks, document["user_id"])
+                ids, metadatas = vector_store._chunk_metadatas(
+                    chunks, document["user_id"], str(document["id"]), pages, dedup
+                )
+                texts = [chunks[i] for i in dedup.kept] if dedup is not None else chunks
+                report = await vector_store.aupsert_chunks(
+                    shadow, embedder, texts, ids, metadatas, max_concurrency=max_concurrency
+                )
+                if report.failed_batches:
+                    raise RuntimeError(f"Document {document['id']}: batches {report.failed_batches} failed")
+
+            await asyncio.to_thread(
+                _checkpoint, generation.id,
+                last_document_id=document["id"], documents_done=1, chunks_done=len(chunks)
+            )
+            await throttle.wait(len(chunks))
+
+        logger.info(f"[generation {generation.id}] documents up to {documents[-1]['id']} re-indexed")
+
+    await asyncio.to_thread(_checkpoint, generation.id, documents_finished=True)
+
+
+async def _reindex_memories(generation: VectorIndexGeneration, source: IndexSettings, target: IndexSettings,
+                            throttle: Throttle, page_size: int) -> None:
+    embedder = vector_store.embeddings_for(target.for_memories())
+    sources = sorted(vector_store._list_partitions(source.collection(vector_store.memory_collection_name)))
+
+    for name in sources:
+        if generation.memory_collection and name < generation.memory_collection:
+            continue
+        collection = await vector_store.async_store.collection(name, create=False)
+        if collection is None:
+            continue
+
+        # Page over a snapshot of the ids: deletions (e.g. compaction) would shift offset pages,
+        # and memories added after the snapshot reach the new generation through dual-write
+        snapshot = await collection.get(include=[])
+        ids = sorted(snapshot.get("ids") or [])
+        if name == generation.memory_collection and generation.memory_last_id:
+            ids = [doc_id for doc_id in ids if doc_id > generation.memory_last_id]
+
+        for start in range(0, len(ids), page_size):
+            batch = ids[start:start + page_size]
+            page = await collection.get(ids=batch, include=["documents", "metadatas"])
+
+            grouped: Dict[str, Dict[str, List[Any]]] = {}
+            for doc_id, text, meta in zip(page.get("ids") or [], page["documents"], page["metadatas"]):
+                meta = meta or {}
+                if not text or meta.get("user_id") is None:
+                    continue
+                shadow = collection_for_user(target.collection(vector_store.memory_collection_name),
+                                             str(meta["user_id"]))
+                group = grouped.setdefault(shadow, {"ids": [], "documents": [], "metadatas": []})
+                group["ids"].append(doc_id)
+                group["documents"].append(text)
+                group["metadatas"].append(meta)
+
+            for shadow, group in grouped.items():
+                vectors = await embedder.aembed_documents(group["documents"])
+                shadow_collection = await vector_store.async_store.collection(shadow)
+                await shadow_collection.upsert(ids=group["ids"], embeddings=vectors,
+                                               documents=group["documents"], metadatas=group["metadatas"])
+
+            await asyncio.to_thread(
+                _checkpoint, generation.id,
+                memory_collection=name, memory_last_id=batch[-1], memories_done=len(batch)
+            )
+            await throttle.wait(len(batch))
+        logger.info(f"[generation {generation.id}] memories of '{name}' re-indexed")
+
+    await asyncio.to_thread(_checkpoint, generation.id, memories_finished=True)
+
+
+async def run_generation(batch_documents: int = REINDEX_BATCH_DOCUMENTS,
+                         max_chunks_per_second: float = REINDEX_MAX_CHUNKS_PER_SECOND,
+                         max_concurrency: int = REINDEX_MAX_CONCURRENCY,
+                         swap: bool = True) -> None:
+    """Builds (or resumes building) the current 'building' generation, then optionally swaps it in."""
+    with SessionLocal() as db:
+        generation = _building_generation(db)
+        if generation is None:
+            raise ValueError("No generation is building - use `start` first.")
+        db.expunge(generation)
+        source = _active_settings(db)
+    target = settings_from_row(generation)
+
+    # Every worker must see the building generation (and dual-write to it) before we copy
+    age = (datetime.datetime.now(datetime.timezone.utc) - generation.created_at).total_seconds()
+    if age < VECTOR_GENERATION_CACHE_TTL:
+        logger.info(f"Waiting {VECTOR_GENERATION_CACHE_TTL - age:.0f}s for workers to start dual-writing...")
+        await asyncio.sleep(VECTOR_GENERATION_CACHE_TTL - age)
+
+    throttle = Throttle(max_chunks_per_second)
+    try:
+        if not generation.documents_finished:
+            await _reindex_documents(generation, target, throttle, batch_documents, max_concurrency)
+        if not generation.memories_finished:
+            await _reindex_memories(generation, source, target, throttle, page_size=batch_documents * 10)
+    except Exception as e:
+        logger.error(f"Re-indexing of generation {generation.id} stopped: {e}. Run `resume` to continue.",
+                     exc_info=True)
+        await asyncio.to_thread(_checkpoint, generation.id, last_error=str(e)[:2000])
+        raise
+
+    logger.info(f"Generation {generation.id} is complete.")
+    if swap:
+        swap_generation(generation.id)
+
+
+def swap_generation(generation_id: int) -> None:
+    """Atomically makes a completed generation the active one."""
+    with SessionLocal() as db:
+        generation = db.query(VectorIndexGeneration).filter(
+            VectorIndexGeneration.id == generation_id
+        ).with_for_update().one()
+        if generation.status != "building" or not (generation.documents_finished and generation.memories_finished):
+            raise ValueError(f"Generation {generation_id} is not a completed building generation.")
+
+        db.query(VectorIndexGeneration).filter(
+            VectorIndexGeneration.status == "active"
+        ).update({"status": "retired"}, synchronize_session=False)
+        generation.status = "active"
+        generation.activated_at = datetime.datetime.now(datetime.timezone.utc)
+        db.commit()
+
+    get_generation_resolver().invalidate()
+    logger.info(f"Generation {generation_id} is now active (workers switch within {VECTOR_GENERATION_CACHE_TTL:.0f}s).")
+
+
+def _generation_collections(settings: IndexSettings) -> List[str]:
+    names = []
+    for base_name in (vector_store.collection_name, vector_store.centroid_collection_name,
+                      vector_store.memory_collection_name):
+        names.extend(vector_store._list_partitions(settings.collection(base_name)))
+    return names
+
+
+def cancel_generation() -> None:
+    """Stops the building generation and drops its collections."""
+    with SessionLocal() as db:
+        generation = _building_generation(db)
+        if generation is None:
+            logger.info("No generation is building.")
+            return
+        generation.status = "cancelled"
+        db.commit()
+        target = settings_from_row(generation)
+    get_generation_resolver().invalidate()
+    vector_store.drop_collections(_generation_collections(target))
+    logger.info(f"Generation {target.generation_id} cancelled.")
+
+
+def cleanup_generations(include_legacy: bool = False) -> None:
+    """Drops collections of retired (and cancelled) generations, optionally also the legacy ones."""
+    with SessionLocal() as db:
+        stale = db.query(VectorIndexGeneration).filter(
+            VectorIndexGeneration.status.in_(["retired", "cancelled"])
+        ).all()
+        for generation in stale:
+            vector_store.drop_collections(_generation_collections(settings_from_row(generation)))
+            generation.status = "dropped"
+        db.commit()
+
+        if include_legacy:
+            if _active_settings(db) == LEGACY_SETTINGS:
+                raise ValueError("The legacy collections are still active.")
+            vector_store.drop_collections(_generation_collections(LEGACY_SETTINGS))
+    logger.info(f"Dropped collections of {len(stale)} generations{' and the legacy collections' if include_legacy else ''}.")
+
+
+def print_status() -> None:
+    with SessionLocal() as db:
+        for generation in db.query(VectorIndexGeneration).order_by(VectorIndexGeneration.id).all():
+            print(
+                f"g{generation.id:<4} {generation.status:<10} {generation.embedding_model}"
+                f"@{generation.embedding_dimensions or 'native'}  memories: {generation.memory_embedding_model or '?'}"
+                f"@{generation.memory_embedding_dimensions or 'native'}  documents={generation.documents_done}"
+                f"{' (done)' if generation.documents_finished else ''} chunks={generation.chunks_done} "
+                f"memories={generation.memories_done}{' (done)' if generation.memories_finished else ''}"
+                f"{'  last_error=' + generation.last_error if generation.last_error else ''}"
+            )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Re-embed the vector store into a new index generation.")
+    parser.add_argument("command", choices=["start", "resume", "status", "swap", "cancel", "cleanup"])
+    parser.add_argument("--model", default=LEGACY_SETTINGS.embedding_model)
+    parser.add_argument("--dimensions", type=int, default=None)
+    parser.add_argument("--memory-model", default=MEMORY_EMBEDDING_MODEL,
+                        help="Model of user-memories (default: MEMORY_EMBEDDING_MODEL, else --model)")
+    parser.add_argument("--memory-dimensions", type=int, default=MEMORY_EMBEDDING_DIMENSIONS)
+    parser.add_argument("--chunk-size", type=int, default=None, help="Re-chunk documents (default: sections 1:1)")
+    parser.add_argument("--chunk-overlap", type=int, default=150)
+    parser.add_argument("--batch-documents", type=int, default=REINDEX_BATCH_DOCUMENTS)
+    parser.add_argument("--max-chunks-per-second", type=float, default=REINDEX_MAX_CHUNKS_PER_SECOND)
+    parser.add_argument("--concurrency", type=int, default=REINDEX_MAX_CONCURRENCY)
+    parser.add_argument("--no-swap", action="store_true", help="Leave the finished generation for a manual `swap`")
+    parser.add_argument("--legacy", action="store_true", help="cleanup: also drop the pre-generation collections")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "status":
+        print_status()
+        return
+    if args.command == "cancel":
+        cancel_generation()
+        return
+    if args.command == "cleanup":
+        cleanup_generations(include_legacy=args.legacy)
+        return
+    if args.command == "swap":
+        with SessionLocal() as db:
+            generation = _building_generation(db)
+        if generation is None:
+            raise SystemExit("No generation is building.")
+        swap_generation(generation.id)
+        return
+
+    if args.command == "start":
+        start_generation(args.model, args.dimensions, args.chunk_size,
+                         args.chunk_overlap if args.chunk_size else None,
+                         args.memory_model, args.memory_dimensions)
+    asyncio.run(run_generation(
+        batch_documents=args.batch_documents,
+        max_chunks_per_second=args.max_chunks_per_second,
+        max_concurrency=args.concurrency,
+        swap=not args.no_swap,
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# reranker.py
+"""
+Optional cross-encoder reranking of hybrid search candidates.
+
+A cross-encoder reads (query, chunk) together, which ranks far better than comparing
+two independently computed embeddings, at the cost of one model pass per pair. A
+small multilingual MiniLM run on CPU (ONNX backend by default) keeps that in the tens
+of milliseconds for RERANKER_CANDIDATES pairs.
+
+Latency is capped per query: pairs are scored in batches of RERANKER_BATCH_SIZE and,
+before each batch, the time it is expected to take (measured on earlier batches) is
+checked against what is left of RERANKER_TIME_BUDGET_MS. Before anything has been
+measured, RERANKER_COLD_MS_PER_PAIR stands in for that estimate and the first batch is
+shrunk to fit. When the budget would be exceeded, or the model is still loading, the
+first-stage order is returned unchanged.
+
+Enabled with RERANKER_ENABLED=true; needs sentence-transformers (and optimum/onnxruntime
+for RERANKER_BACKEND=onnx).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .config import (
+    LOCAL_EMBEDDING_DEVICE,
+    RERANKER_BACKEND,
+    RERANKER_BATCH_SIZE,
+    RERANKER_COLD_MS_PER_PAIR,
+    RERANKER_ENABLED,
+    RERANKER_MAX_LENGTH,
+    RERANKER_MODEL,
+    RERANKER_TIME_BUDGET_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    from sentence_transformers import CrossEncoder
+    CROSS_ENCODER_AVAILABLE = True
+except ImportError:
+    CROSS_ENCODER_AVAILABLE = False
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, content) pairs with a cross-encoder under a time budget.
+    The model is loaded in a background thread; until it is ready, results pass through.
+    """
+
+    def __init__(self, model_name: str = RERANKER_MODEL, batch_size: int = RERANKER_BATCH_SIZE,
+                 time_budget_ms: float = RERANKER_TIME_BUDGET_MS, model: Any = None,
+                 cold_ms_per_pair: float = RERANKER_COLD_MS_PER_PAIR):
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.time_budget_ms = time_budget_ms
+        self.cold_seconds_per_pair = cold_ms_per_pair / 1000.0
+        self._model = model  # gotowy model (np. w benchmarkach); inaczej ładowany w tle
+        self._lock = threading.Lock()
+        self._seconds_per_pair: Optional[float] = None
+        if model is None:
+            threading.Thread(target=self._load, name="reranker-load", daemon=True).start()
+
+    def _load(self) -> None:
+        kwargs: Dict[str, Any] = {"device": LOCAL_EMBEDDING_DEVICE, "max_length": RERANKER_MAX_LENGTH}
+        if RERANKER_BACKEND == "onnx":
+            kwargs["backend"] = "onnx"
+        started = time.perf_counter()
+        try:
+            self._model = CrossEncoder(self.model_name, **kwargs)
+            logger.info(f"Reranker '{self.model_name}' ({RERANKER_BACKEND}) loaded "
+                        f"in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            logger.warning(f"Reranker '{self.model_name}' could not be loaded: {e}. First-stage order is kept.")
+
+    @property
+    def ready(self) -> bool:
+        return self._model is not None
+
+    def _score(self, query: str, contents: List[str], deadline: float) -> Optional[List[float]]:
+        scores: List[float] = []
+        with self._lock:  # jeden przebieg modelu naraz - wątki nie konkurują o rdzenie CPU
+            start = 0
+            while start < len(contents):
+                now = time.perf_counter()
+                size = min(self.batch_size, len(contents) - start)
+                if self._seconds_per_pair is None:
+                    # Zimny start: bez pomiaru pierwsza partia jest przycinana do tego,
+                    # co przy ostrożnym koszcie pary mieści się w budżecie
+                    size = min(size, int((deadline - now) / self.cold_seconds_per_pair))
+                    if size < 1:
+                        return None
+                elif now + self._seconds_per_pair * size > deadline:
+                    return None
+                batch = contents[start:start + size]
+                batch_scores = self._model.predict(
+                    [(query, content) for content in batch],
+                    batch_size=len(batch), convert_to_numpy=True, show_progress_bar=False
+                )
+                per_pair = (time.perf_counter() - now) / len(batch)
+                # Średnia krocząca kosztu pary - oszacowanie, czy kolejna partia zmieści się w budżecie
+                self._seconds_per_pair = per_pair if self._seconds_per_pair is None \
+                    else 0.8 * self._seconds_per_pair + 0.2 * per_pair
+                scores.extend(float(s) for s in batch_scores)
+                start += size
+        return scores
+
+    def rerank(self, query: str, results: List[Dict[str, Any]], n_results: int) -> List[Dict[str, Any]]:
+        """
+        Best `n_results` of `results` by cross-encoder score (stored as `rerank_score`),
+        or the first `n_results` in their original order when the budget does not allow it.
+        """
+        if not self.ready or len(results) <= 1:
+            return results[:n_results]
+
+        started = time.perf_counter()
+        try:
+            scores = self._score(query, [r.get("content") or "" for r in results],
+                                 started + self.time_budget_ms / 1000.0)
+        except Exception as e:
+            logger.warning(f"Reranking failed, keeping first-stage order: {e}")
+            return results[:n_results]
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if scores is None:
+            logger.info(f"Reranking skipped: budget {self.time_budget_ms:.0f} ms exceeded "
+                        f"after {elapsed_ms:.0f} ms for {len(results)} candidates")
+            return results[:n_results]
+
+        for result, score in zip(results, scores):
+            result["rerank_score"] = score
+        reranked = sorted(results, key=lambda r: r["rerank_score"], reverse=True)
+        logger.debug(f"Reranked {len(results)} candidates in {elapsed_ms:.0f} ms")
+        return reranked[:n_results]
+
+    async def arerank(self, query: str, results: List[Dict[str, Any]], n_results: int) -> List[Dict[str, Any]]:
+        """Asynchroniczna wersja `rerank` (model działa w wątku)."""
+        if not self.ready or len(results) <= 1:
+            return results[:n_results]
+        return await asyncio.to_thread(self.rerank, query, results, n_results)
+
+
+# Global instance (singleton pattern)
+_reranker: Optional[CrossEncoderReranker] = None
+_reranker_initialized = False
+
+
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    """
+    Get the global reranker. Returns None when RERANKER_ENABLED is false or
+    sentence-transformers is not installed.
+    """
+    global _reranker, _reranker_initialized
+    if _reranker_initialized:
+        return _reranker
+
+    _reranker_initialized = True
+    if not RERANKER_ENABLED:
+        return None
+    if not CROSS_ENCODER_AVAILABLE:
+        logger.warning("RERANKER_ENABLED is set but sentence-transformers is not installed. Reranking disabled.")
+        return None
+    _reranker = CrossEncoderReranker()
+    return _reranker
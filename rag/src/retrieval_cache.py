@@ -0,0 +1,217 @@
+# retrieval_cache.py
+"""
+Cache of final retrieval results (`search_engine.search_and_rerank`).
+
+Entries are keyed by (user, normalized query, n_results, filters, search settings,
+active index generation, corpus version). The corpus version is a per-user counter
+bumped after every change of the user's searchable data: vector upserts and deletes
+in vector_store.py and document section writes in the files/notion/workspace
+routers (sections feed the full-text index). A bump makes all earlier entries of the user unreachable, so a
+stale result is never served; old entries simply expire (RETRIEVAL_CACHE_TTL).
+A global counter (bumped when the whole collection is dropped) is part of every key.
+
+Backends:
+- RedisRetrievalBackend: shared between workers and the ingest/reindex processes
+- MemoryRetrievalBackend: in-process LRU; used when Redis is unavailable. Version
+  bumps are then visible only inside the process that made them, which is safe for
+  the default single-worker deployment only.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import REDIS_URL, RETRIEVAL_CACHE_BACKEND, RETRIEVAL_CACHE_MAX_ENTRIES, RETRIEVAL_CACHE_TTL
+from .embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+_GLOBAL = "*"
+
+
+def normalize_query(query: str) -> str:
+    """Case and whitespace do not change retrieval results."""
+    return normalize_text(query).lower()
+
+
+def retrieval_cache_key(user_id: str, query: str, version: str, **params: Any) -> str:
+    """Stable key for one retrieval; `params` are n_results, filters, settings etc."""
+    payload = json.dumps(
+        {"user_id": str(user_id), "query": normalize_query(query), "version": version, **params},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MemoryRetrievalBackend:
+    """In-process LRU with TTL (see module docstring for its limits)."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def versions(self, user_id: str) -> Tuple[int, int]:
+        with self._lock:
+            return self._versions.get(_GLOBAL, 0), self._versions.get(str(user_id), 0)
+
+    def bump(self, user_id: str) -> None:
+        with self._lock:
+            self._versions[str(user_id)] = self._versions.get(str(user_id), 0) + 1
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisRetrievalBackend:
+    """Redis retrieval cache shared between workers; entries expire with TTL, versions never do."""
+
+    def __init__(self, url: str, ttl_seconds: float, prefix: str = "retrieval"):
+        import redis  # sync client; retrieval also runs in worker threads
+
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+        self._redis.ping()
+        logger.info(f"Retrieval cache initialized with Redis backend (ttl={ttl_seconds:.0f}s)")
+
+    def _version_key(self, user_id: str) -> str:
+        return f"{self.prefix}:version:{user_id}"
+
+    def versions(self, user_id: str) -> Tuple[int, int]:
+        global_version, user_version = self._redis.mget(self._version_key(_GLOBAL), self._version_key(str(user_id)))
+        return int(global_version or 0), int(user_version or 0)
+
+    def bump(self, user_id: str) -> None:
+        self._redis.incr(self._version_key(str(user_id)))
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._redis.get(f"{self.prefix}:{key}")
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key: str, value: str) -> None:
+        self._redis.set(f"{self.prefix}:{key}", value, ex=max(1, int(self.ttl_seconds)))
+
+
+class RetrievalCache:
+    """Backend-agnostic cache front with hit/miss counters. Backend errors count as misses."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def corpus_version(self, user_id: str) -> Optional[str]:
+        """"<global>.<user>" or None when the versions cannot be read (then nothing is cached)."""
+        try:
+            global_version, user_version = self.backend.versions(user_id)
+        except Exception as e:
+            logger.warning(f"Retrieval cache version lookup failed: {e}")
+            return None
+        return f"{global_version}.{user_version}"
+
+    def bump(self, user_id: str) -> None:
+        try:
+            self.backend.bump(user_id)
+        except Exception as e:
+            logger.error(f"Could not bump corpus version of user {user_id}, cached results may be stale: {e}")
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Retrieval cache lookup failed, treating as miss: {e}")
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, results: List[Dict[str, Any]]) -> None:
+        try:
+            self.backend.set(key, json.dumps(results, ensure_ascii=False, default=str))
+        except Exception as e:
+            logger.warning(f"Retrieval cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "backend": type(self.backend).__name__,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# Global instance (singleton pattern)
+_retrieval_cache: Optional[RetrievalCache] = None
+_retrieval_cache_initialized = False
+_retrieval_cache_lock = threading.Lock()
+
+
+def get_retrieval_cache() -> Optional[RetrievalCache]:
+    """
+    Get the global retrieval cache configured via RETRIEVAL_CACHE_BACKEND
+    ("redis" falls back to the in-process backend, "none" disables caching).
+    """
+    global _retrieval_cache, _retrieval_cache_initialized
+    if _retrieval_cache_initialized:
+        return _retrieval_cache
+
+    with _retrieval_cache_lock:
+        if _retrieval_cache_initialized:
+            return _retrieval_cache
+        if RETRIEVAL_CACHE_BACKEND == "redis":
+            try:
+                _retrieval_cache = RetrievalCache(RedisRetrievalBackend(REDIS_URL, RETRIEVAL_CACHE_TTL))
+            except Exception as e:
+                logger.warning(f"Retrieval cache: Redis unavailable ({e}), using the in-process backend.")
+        if _retrieval_cache is None and RETRIEVAL_CACHE_BACKEND in ("redis", "memory"):
+            _retrieval_cache = RetrievalCache(MemoryRetrievalBackend(RETRIEVAL_CACHE_MAX_ENTRIES, RETRIEVAL_CACHE_TTL))
+        if _retrieval_cache is None:
+            logger.info("Retrieval cache disabled.")
+        _retrieval_cache_initialized = True
+    return _retrieval_cache
+
+
+def bump_corpus_version(user_id: Optional[str]) -> None:
+    """Invalidates cached retrievals of `user_id` (None: of every user)."""
+    cache = get_retrieval_cache()
+    if cache is not None:
+        cache.bump(_GLOBAL if user_id is None else str(user_id))
+
+
+async def abump_corpus_version(user_id: Optional[str]) -> None:
+    """Asynchroniczna wersja `bump_corpus_version`."""
+    await asyncio.to_thread(bump_corpus_version, user_id)
+
+
+def corpus_version(user_id: str) -> Optional[str]:
+    """Current corpus version of the user (None when caching is off or unavailable)."""
+    cache = get_retrieval_cache()
+    return cache.corpus_version(str(user_id)) if cache is not None else None
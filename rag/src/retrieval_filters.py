@@ -0,0 +1,150 @@
+# retrieval_filters.py
+"""
+Restricting retrieval to a part of the user's documents.
+
+`RetrievalFilters` names the scopes a caller knows: category names, document ids, file
+names and a workspace (= the categories assigned to it). Scopes combine with AND,
+values within one scope with OR.
+
+Vectors carry only user_id/document_id (see document_registry.py), so the filters are
+first resolved against WorkspaceDocument into the ids of the documents in scope
+(`resolve_filters`, one query). The resulting `DocumentScope` is pushed down into both
+searches, so chunks outside the scope are never scored:
+
+- Chroma:   {"$and": [{"user_id": ...}, {"document_id": {"$in": [...]}}]}  (`chroma_where`)
+- Postgres: WorkspaceDocument.id IN (...)  (lexical_index.search_sections)
+
+Vectors written before the document registry have no document_id but still carry
+`category`/`file_name` themselves; they match through an $or on those keys (not for
+document id scopes, which they cannot satisfy).
+"""
+
+import logging
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_
+
+from .database import SessionLocal
+from .models import FileCategory, Workspace, WorkspaceCategory, WorkspaceDocument
+
+logger = logging.getLogger(__name__)
+
+# Nazwa kategorii dokumentów bez kategorii (jak w document_registry.load_documents)
+DEFAULT_CATEGORY = "General"
+
+
+@dataclass(frozen=True)
+class RetrievalFilters:
+    """Scopes of one retrieval; empty tuples / None mean "not restricted"."""
+    categories: Tuple[str, ...] = ()
+    document_ids: Tuple[str, ...] = ()
+    file_names: Tuple[str, ...] = ()
+    workspace_id: Optional[str] = None
+
+    def is_empty(self) -> bool:
+        return not (self.categories or self.document_ids or self.file_names or self.workspace_id)
+
+
+@dataclass(frozen=True)
+class DocumentScope:
+    """Resolved filters: ids of the documents in scope and the condition for pre-registry vectors."""
+    document_ids: Tuple[str, ...]
+    legacy_where: Optional[Dict[str, Any]] = None
+
+    def is_empty(self) -> bool:
+        return not self.document_ids and self.legacy_where is None
+
+    def cache_params(self) -> Dict[str, Any]:
+        """Part of the retrieval cache key; a document changing category changes the key."""
+        return {"document_ids": sorted(self.document_ids), "legacy": self.legacy_where}
+
+
+def document_uuids(values: Iterable[Any]) -> List[uuid.UUID]:
+    """Values parsed as UUIDs; invalid ones are skipped (they match no document)."""
+    keys = []
+    for value in values:
+        try:
+            keys.append(uuid.UUID(str(value)))
+        except ValueError:
+            continue
+    return keys
+
+
+def _category_condition(names: List[str]):
+    condition = FileCategory.name.in_(names)
+    if DEFAULT_CATEGORY in names:
+        condition = or_(condition, WorkspaceDocument.category_id.is_(None))
+    return condition
+
+
+def _legacy_where(filters: RetrievalFilters, workspace_categories: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+    if filters.document_ids:
+        return None
+    conditions = []
+    for key, values in (("category", filters.categories or None), ("category", workspace_categories),
+                        ("file_name", filters.file_names or None)):
+        if values is None:
+            continue
+        if not values:
+            return None  # pusty zakres (np. workspace bez kategorii) - nic nie pasuje
+        conditions.append({key: {"$in": sorted(values)}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def resolve_filters(filters: Optional[RetrievalFilters], user_id: str) -> Optional[DocumentScope]:
+    """
+    Documents of `user_id` matching `filters`. None when there is nothing to restrict
+    (no filters); an empty scope when nothing matches.
+    """
+    if filters is None or filters.is_empty():
+        return None
+    try:
+        owner_id = int(user_id)
+    except (TypeError, ValueError):
+        return DocumentScope(document_ids=())
+
+    with SessionLocal() as db:
+        workspace_categories: Optional[List[str]] = None
+        query = db.query(WorkspaceDocument.id).outerjoin(
+            FileCategory, FileCategory.id == WorkspaceDocument.category_id
+        ).filter(WorkspaceDocument.user_id == owner_id)
+
+        if filters.workspace_id:
+            rows = db.query(FileCategory.id, FileCategory.name).join(
+                WorkspaceCategory, WorkspaceCategory.category_id == FileCategory.id
+            ).join(
+                Workspace, Workspace.id == WorkspaceCategory.workspace_id
+            ).filter(
+                Workspace.id.in_(document_uuids([filters.workspace_id])),
+                Workspace.user_id == owner_id,
+            ).all()
+            workspace_categories = [name for _, name in rows]
+            query = query.filter(WorkspaceDocument.category_id.in_([category_id for category_id, _ in rows]))
+        if filters.categories:
+            query = query.filter(_category_condition(list(filters.categories)))
+        if filters.document_ids:
+            query = query.filter(WorkspaceDocument.id.in_(document_uuids(filters.document_ids)))
+        if filters.file_names:
+            names = list(filters.file_names)
+            query = query.filter(or_(WorkspaceDocument.original_filename.in_(names),
+                                     WorkspaceDocument.title.in_(names)))
+        document_ids = tuple(sorted(str(document_id) for (document_id,) in query.all()))
+
+    return DocumentScope(document_ids=document_ids, legacy_where=_legacy_where(filters, workspace_categories))
+
+
+def chroma_where(user_id: str, scope: Optional[DocumentScope]) -> Dict[str, Any]:
+    """Chroma `where` for the user's vectors in `scope` (all of them for None). Assumes a non-empty scope."""
+    if scope is None:
+        return {"user_id": user_id}
+    conditions = []
+    if scope.document_ids:
+        conditions.append({"document_id": {"$in": list(scope.document_ids)}})
+    if scope.legacy_where is not None:
+        conditions.append(scope.legacy_where)
+    match = conditions[0] if len(conditions) == 1 else {"$or": conditions}
+    return {"$and": [{"user_id": {"$eq": user_id}}, match]}
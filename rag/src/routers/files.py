@@ -15,7 +15,8 @@ from ..schemas import (
 )
 from ..dependencies import get_db
 from ..auth import get_current_user, get_current_user_optional, verify_jwt_token
-from ..vector_store import delete_file_from_vector_store, create_vector_store
+from ..vector_store import adelete_file_from_vector_store, acreate_vector_store
+from ..retrieval_cache import abump_corpus_version
 from ..file_processor.pdf_processor import PDFProcessor
 from ..file_processor.documents_processor import DocumentProcessor
 from ..file_processor.math_extractor import MathExtractor, extract_math_from_text, check_math_content
@@ -606,22 +607,13 @@ async def upload_file(
             logger.error("Failed to create text chunks from the document.")
             raise HTTPException(status_code=500, detail="Failed to create text chunks from the document.")
 
-        await asyncio.to_thread(
-            create_vector_store,
-            chunks=chunks,
-            user_id=user_id,
-            file_name=safe_filename,
-            file_description=file_description,
-            category=category.name,
-        )
-        logger.info(f"Vector store updated for user_id: {user_id}")
-
-        # Create WorkspaceDocument
+        # Create WorkspaceDocument first - vectors reference it by id (document registry)
         new_document = WorkspaceDocument(
             user_id=current_user.id_,
             category_id=category_uuid,
             title=safe_filename,
             original_filename=safe_filename,
+            description=file_description or None,
             file_type=file_extension[1:] if file_extension else None,
             total_length=len(text_content),
             total_sections=len(chunks)
@@ -715,7 +707,7 @@ async def upload_file(
                         "is_table": is_table_chunk,
                         "has_math": has_math,
                         "math_blocks": math_blocks if has_math else [],
-                        "is_page_start": is_page_start  # Mark first section of each page
+                        "is_page_start": is_page_start,  # Mark first section of each page
                     },
                     char_start=chunk_start,
                     char_end=chunk_end
@@ -725,14 +717,32 @@ async def upload_file(
                 # Update search position for next chunk (account for overlap)
                 search_start = max(search_start, chunk_start + 1)
 
+            ingest_report = await acreate_vector_store(
+                chunks=chunks,
+                user_id=user_id,
+                document_id=str(new_document.id),
+                pages=[section.section_metadata["page_number"] for section in sections_to_add],
+            )
+            # Sekcje powstają dla wszystkich chunków - także tych pominiętych jako prawie-duplikaty
+            duplicate_of = ingest_report.duplicate_of if ingest_report else {}
+            chunk_ids = ingest_report.chunk_ids if ingest_report else {}
+            logger.info(f"Vector store updated for user_id: {user_id} ({len(duplicate_of)} near-duplicate chunks collapsed)")
+            for idx, section in enumerate(sections_to_add):
+                section.vector_id = chunk_ids.get(idx)
+                if idx in duplicate_of:
+                    section.section_metadata["vector_duplicate_of"] = duplicate_of[idx]
+
             if sections_to_add:
                 db.add_all(sections_to_add)
                 db.commit()
                 logger.info(f"Added {len(sections_to_add)} sections for document {new_document.id}")
+                # Sekcje zasilają indeks pełnotekstowy - unieważnij wyniki z cache
+                await abump_corpus_version(user_id)
 
         except Exception as inner_e:
             db.rollback()
             logger.error(f"Failed to add sections. Cleaning up document {new_document.id}. Error: {inner_e}")
+            await adelete_file_from_vector_store(user_id, document_id=str(new_document.id))
             try:
                 db.query(WorkspaceDocument).filter(WorkspaceDocument.id == new_document.id).delete()
                 db.commit()
@@ -913,9 +923,11 @@ async def delete_knowledge(
             deleted_from_vector_store=False
         )
     
-    # Delete from vector store using original_filename (what was indexed)
+    # Delete from vector store by document id (and original_filename - what older vectors were indexed under)
     vector_file_name = document.original_filename or document.title
-    deleted_from_vector_store = delete_file_from_vector_store(user_id, vector_file_name)
+    deleted_from_vector_store = await adelete_file_from_vector_store(
+        user_id, file_name=vector_file_name, document_id=str(document.id)
+    )
     if not deleted_from_vector_store:
         logger.warning(f"Could not delete vectors for file: {vector_file_name} from vector store.")
 
@@ -928,6 +940,7 @@ async def delete_knowledge(
         db.delete(document)
         db.commit()
         logger.info(f"Deleted document record from database: {document.id}")
+        await abump_corpus_version(user_id)
     except Exception as e:
         db.rollback()
         logger.error(f"Error deleting file record from database: {e}")
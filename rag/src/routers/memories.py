@@ -4,18 +4,23 @@ Router for managing user memories (long-term memory storage).
 Allows users to view, add, search, and delete their memories.
 """
 
+import asyncio
+
 from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
 
+from .. import memory_index
 from ..auth import get_current_user
 from ..models import User
 from ..vector_store import (
-    add_user_memory,
-    search_user_memories,
-    delete_all_user_memories,
-    memory_client
+    aadd_user_memory,
+    asearch_user_memories,
+    adelete_all_user_memories,
+    aget_user_memories,
+    aget_memories_by_ids,
+    adelete_memories,
 )
 
 import logging
@@ -24,6 +29,16 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+async def _ensure_indexed(user_id: str) -> None:
+    """One-time backfill of the memory index for users with memories from before it existed."""
+    if not await asyncio.to_thread(memory_index.is_indexed, user_id):
+        results = await aget_user_memories(user_id=user_id, include=["metadatas"])
+        if await asyncio.to_thread(memory_index.backfill, user_id, results):
+            # Zapisy między odczytem a commitem backfillu zostały pominięte - czytamy ponownie
+            latest = await aget_user_memories(user_id=user_id, include=["metadatas"])
+            await asyncio.to_thread(memory_index.reconcile_backfill, user_id, results, latest)
+
+
 # ================== Pydantic Schemas ==================
 
 class MemoryCreate(BaseModel):
@@ -63,6 +78,7 @@ class MemoryListResponse(BaseModel):
     """Schema for listing all memories."""
     memories: List[MemoryRead]
     total_count: int
+    next_cursor: Optional[str] = None
 
 
 class MessageResponse(BaseModel):
@@ -76,45 +92,56 @@ class MessageResponse(BaseModel):
 @router.get("/", response_model=MemoryListResponse)
 async def list_memories(
     limit: int = Query(default=50, ge=1, le=100, description="Maximum number of memories to return"),
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
     current_user: User = Depends(get_current_user),
 ):
     """
-    List all memories for the current user.
-    Returns memories sorted by creation date (newest first).
+    List memories for the current user, newest first.
+    Pages come from the Postgres memory index; only the memories of the page are read from ChromaDB.
     """
     user_id = str(current_user.id_)
     logger.info(f"Listing memories for user_id: {user_id}")
 
     try:
-        # Get all memories from ChromaDB for this user
-        results = memory_client.get(
-            where={"user_id": user_id},
-            limit=limit,
-            include=["documents", "metadatas"]
-        )
+        await _ensure_indexed(user_id)
+        try:
+            ids, next_cursor = await asyncio.to_thread(memory_index.list_page, user_id, limit, cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stats = await asyncio.to_thread(memory_index.get_stats, user_id)
 
         memories = []
-        if results and results.get("ids"):
-            for i, doc_id in enumerate(results["ids"]):
-                metadata = results["metadatas"][i] if results.get("metadatas") else {}
-                text = results["documents"][i] if results.get("documents") else ""
-
+        if ids:
+            results = await aget_memories_by_ids(
+                user_id=user_id,
+                ids=ids,
+                include=["documents", "metadatas"]
+            )
+            by_id = {
+                doc_id: (results["documents"][i], results["metadatas"][i] or {})
+                for i, doc_id in enumerate(results.get("ids") or [])
+            }
+            # Kolejność strony wyznacza indeks (created_at DESC), nie ChromaDB
+            for doc_id in ids:
+                if doc_id not in by_id:
+                    continue
+                text, metadata = by_id[doc_id]
                 memories.append(MemoryRead(
                     id=doc_id,
-                    text=text,
+                    text=text or "",
                     importance=metadata.get("importance", 0.5),
                     created_at=metadata.get("created_at", ""),
                     last_accessed=metadata.get("last_accessed")
                 ))
 
-        # Sort by created_at (newest first)
-        memories.sort(key=lambda x: x.created_at, reverse=True)
-
         return MemoryListResponse(
-            memories=memories[:limit],
-            total_count=len(memories)
+            memories=memories,
+            total_count=stats["total_memories"],
+            next_cursor=next_cursor
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing memories: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error retrieving memories: {str(e)}")
@@ -133,7 +160,7 @@ async def create_memory(
     logger.info(f"Creating memory for user_id: {user_id}, text: '{memory.text[:50]}...'")
 
     try:
-        doc_id = add_user_memory(
+        doc_id = await aadd_user_memory(
             user_id=user_id,
             text=memory.text,
             importance=memory.importance
@@ -170,7 +197,7 @@ async def search_memories(
     logger.info(f"Searching memories for user_id: {user_id}, query: '{request.query}'")
 
     try:
-        memories = search_user_memories(
+        memories = await asearch_user_memories(
             query=request.query,
             user_id=user_id,
             n_results=request.n_results,
@@ -201,7 +228,8 @@ async def delete_memory(
 
     try:
         # Verify the memory belongs to the user before deleting
-        results = memory_client.get(
+        results = await aget_memories_by_ids(
+            user_id=user_id,
             ids=[memory_id],
             include=["metadatas"]
         )
@@ -214,7 +242,7 @@ async def delete_memory(
             raise HTTPException(status_code=403, detail="Not authorized to delete this memory")
 
         # Delete the memory
-        memory_client.delete(ids=[memory_id])
+        await adelete_memories(user_id=user_id, ids=[memory_id])
 
         return MessageResponse(
             message=f"Memory {memory_id} deleted successfully",
@@ -240,7 +268,7 @@ async def delete_all_memories(
     logger.info(f"Deleting all memories for user_id: {user_id}")
 
     try:
-        success = delete_all_user_memories(user_id)
+        success = await adelete_all_user_memories(user_id)
 
         if success:
             return MessageResponse(
@@ -263,47 +291,14 @@ async def get_memory_stats(
 ):
     """
     Get statistics about user's memories.
-    Returns count and importance distribution.
+    Returns count and importance distribution (precomputed counters, no collection scan).
     """
     user_id = str(current_user.id_)
     logger.info(f"Getting memory stats for user_id: {user_id}")
 
     try:
-        results = memory_client.get(
-            where={"user_id": user_id},
-            include=["metadatas"]
-        )
-
-        total_count = len(results.get("ids", []))
-
-        # Calculate importance distribution
-        importance_sum = 0.0
-        high_importance = 0  # >= 0.7
-        medium_importance = 0  # 0.3 - 0.7
-        low_importance = 0  # < 0.3
-
-        if results.get("metadatas"):
-            for metadata in results["metadatas"]:
-                imp = metadata.get("importance", 0.5)
-                importance_sum += imp
-                if imp >= 0.7:
-                    high_importance += 1
-                elif imp >= 0.3:
-                    medium_importance += 1
-                else:
-                    low_importance += 1
-
-        avg_importance = importance_sum / total_count if total_count > 0 else 0.0
-
-        return {
-            "total_memories": total_count,
-            "average_importance": round(avg_importance, 2),
-            "importance_distribution": {
-                "high": high_importance,
-                "medium": medium_importance,
-                "low": low_importance
-            }
-        }
+        await _ensure_indexed(user_id)
+        return await asyncio.to_thread(memory_index.get_stats, user_id)
 
     except Exception as e:
         logger.error(f"Error getting memory stats: {e}", exc_info=True)
@@ -26,7 +26,8 @@ from ..dependencies import get_db
 from ..auth import get_current_user
 from ..services.notion_service import NotionService, webhook_debouncer
 from ..services.subscription import SubscriptionService
-from ..vector_store import create_vector_store, delete_file_from_vector_store
+from ..vector_store import acreate_vector_store, adelete_file_from_vector_store
+from ..retrieval_cache import abump_corpus_version
 from ..chunking import create_chunks
 from ..config import settings
 
@@ -358,27 +359,19 @@ async def import_notion_page(
     # Create chunks for RAG
     try:
         chunks = create_chunks(markdown_content, chunk_size=1200, overlap=150)
-        if not chunks:
-            raise HTTPException(status_code=500, detail="Failed to process content")
-        
-        # Add to vector store
-        create_vector_store(
-            chunks=chunks,
-            user_id=str(current_user.id_),
-            file_name=f"notion_{request.page_id}",
-            file_description=f"Imported from Notion: {title}",
-            category=category.name
-        )
     except Exception as e:
-        logger.error(f"Failed to create vectors for Notion page: {e}")
+        logger.error(f"Failed to chunk Notion page {request.page_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to process document")
+    if not chunks:
+        raise HTTPException(status_code=500, detail="Failed to process content")
     
-    # Create document record
+    # Create document record first - vectors reference it by id (document registry)
     new_document = WorkspaceDocument(
         user_id=current_user.id_,
         category_id=category_uuid,
         title=title,
         original_filename=f"notion_{request.page_id}",
+        description=f"Imported from Notion: {title}",
         file_type="notion",
         total_length=len(markdown_content),
         total_sections=len(chunks),
@@ -391,7 +384,21 @@ async def import_notion_page(
     )
     
     db.add(new_document)
-    db.flush()  # Get document ID before creating sections
+    db.flush()  # Get document ID before creating vectors and sections
+    
+    # Add to vector store
+    try:
+        ingest_report = await acreate_vector_store(
+            chunks=chunks,
+            user_id=str(current_user.id_),
+            document_id=str(new_document.id)
+        )
+        chunk_ids = ingest_report.chunk_ids if ingest_report else {}
+    except Exception as e:
+        logger.error(f"Failed to create vectors for Notion page: {e}")
+        db.rollback()
+        await adelete_file_from_vector_store(str(current_user.id_), document_id=str(new_document.id))
+        raise HTTPException(status_code=500, detail="Failed to process document")
     
     # Create sections
     char_offset = 0
@@ -407,7 +414,8 @@ async def import_notion_page(
                 "chunk_index": idx
             },
             char_start=char_offset,
-            char_end=char_offset + len(chunk)
+            char_end=char_offset + len(chunk),
+            vector_id=chunk_ids.get(idx)
         )
         db.add(section)
         char_offset += len(chunk)
@@ -417,6 +425,7 @@ async def import_notion_page(
     
     db.commit()
     db.refresh(new_document)
+    await abump_corpus_version(current_user.id_)
     
     logger.info(f"Imported Notion page {request.page_id} as document {new_document.id}")
     
@@ -482,28 +491,35 @@ async def sync_notion_document(
     
     markdown_content = page_content.get("content_markdown", "")
     
-    # Delete old vectors
-    delete_file_from_vector_store(
-        user_id=str(current_user.id_),
-        file_name=f"notion_{document.notion_page_id}"
-    )
-    
     # Create new chunks
     chunks = create_chunks(markdown_content, chunk_size=1200, overlap=150)
     
+    # Vectors of unchanged chunks (same deterministic id) are kept; only changed chunks are re-embedded
+    previous_ids = [
+        vector_id for (vector_id,) in db.query(DocumentSection.vector_id).filter(
+            DocumentSection.document_id == document.id,
+            DocumentSection.vector_id.isnot(None)
+        ).all()
+    ]
+    if not previous_ids or not chunks:
+        # Sections indexed before vector ids were recorded - replace the whole file
+        await adelete_file_from_vector_store(
+            user_id=str(current_user.id_),
+            file_name=f"notion_{document.notion_page_id}",
+            document_id=str(document.id)
+        )
+        previous_ids = []
+    
+    chunk_ids = {}
     if chunks:
         # Add new vectors
-        category = db.query(FileCategory).filter(
-            FileCategory.id == document.category_id
-        ).first()
-        
-        create_vector_store(
+        ingest_report = await acreate_vector_store(
             chunks=chunks,
             user_id=str(current_user.id_),
-            file_name=f"notion_{document.notion_page_id}",
-            file_description=f"Synced from Notion: {document.title}",
-            category=category.name if category else "General"
+            document_id=str(document.id),
+            replace_ids=previous_ids
         )
+        chunk_ids = ingest_report.chunk_ids if ingest_report else {}
     
     # Delete old sections
     db.query(DocumentSection).filter(
@@ -525,7 +541,8 @@ async def sync_notion_document(
                 "synced_at": datetime.utcnow().isoformat()
             },
             char_start=char_offset,
-            char_end=char_offset + len(chunk)
+            char_end=char_offset + len(chunk),
+            vector_id=chunk_ids.get(idx)
         )
         db.add(section)
         char_offset += len(chunk)
@@ -540,6 +557,7 @@ async def sync_notion_document(
         )
     
     db.commit()
+    await abump_corpus_version(current_user.id_)
     
     logger.info(f"Synced Notion document {document_id}")
     
@@ -11,7 +11,7 @@ from ..dependencies import get_db
 from ..auth import get_current_user
 from ..models import User
 from ..agent.agent import ChatAgent
-from ..services.workspace_chat import WorkspaceChatService
+from ..services.workspace_chat import WorkspaceChatService, build_retrieval_filters
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -68,8 +68,16 @@ async def query_knowledge(
             workspace_context = None
             workspace_context_source = None
             workspace_info = None  # Initialize workspace_info
+            retrieval_filters = None
 
             if chat_type == "workspace" and workspace_metadata:
+                # RAG w czacie workspace przeszukuje otwarty dokument, a bez niego kategorie workspace
+                # (ten sam zakres co WorkspaceChatService - pierwszeństwo ustala build_retrieval_filters)
+                retrieval_filters = build_retrieval_filters(
+                    document_id=workspace_metadata.document_id,
+                    workspace_id=workspace_metadata.workspace_id
+                )
+
                 # Get context from highlights if colors are specified
                 if workspace_metadata.filter_colors and len(workspace_metadata.filter_colors) > 0:
                     logger.info(f"[WORKSPACE] Using color-filtered context: {workspace_metadata.filter_colors}")
@@ -124,6 +132,7 @@ async def query_knowledge(
                 workspace_context=workspace_context,
                 workspace_context_source=workspace_context_source,
                 workspace_info=workspace_info,  # Pass workspace info for LLM context
+                retrieval_filters=retrieval_filters,
             )
 
             logger.info(f"[STREAM] Starting stream for user_id: {user_id}")
@@ -20,6 +20,7 @@ from ..models import (
 )
 from ..services.document_processor import document_processor
 from ..services.workspace_chat import WorkspaceChatService, HIGHLIGHT_COLORS
+from ..retrieval_cache import abump_corpus_version
 
 logger = logging.getLogger(__name__)
 
@@ -192,6 +193,8 @@ async def upload_document(
         except Exception as e:
             logger.warning(f"Failed to index document in ChromaDB: {e}")
             # Don't fail the upload, just log warning
+        # Nowe sekcje trafiają do indeksu pełnotekstowego - wyniki z cache są nieaktualne
+        await abump_corpus_version(current_user.id_)
 
         logger.info(f"Document uploaded: {document.id} with {len(sections)} sections")
 
@@ -294,6 +297,7 @@ async def delete_document(
 
     db.delete(document)
     db.commit()
+    await abump_corpus_version(current_user.id_)
 
     return {"message": "Document deleted successfully"}
 
@@ -22,6 +22,7 @@ from ..models import (
     Conversation
 )
 from ..auth import get_current_user
+from ..retrieval_cache import abump_corpus_version
 
 logger = logging.getLogger(__name__)
 
@@ -417,6 +418,9 @@ async def update_workspace(
 
         db.commit()
         db.refresh(workspace)
+        if workspace_data.category_ids is not None:
+            # Zakres RAG czatu workspace się zmienił - odpowiedzi z cache są nieaktualne
+            await abump_corpus_version(current_user.id_)
 
         # Get categories for response
         categories = db.query(FileCategory).join(
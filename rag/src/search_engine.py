@@ -1,106 +1,311 @@
+import asyncio
 import os
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 import logging
+import time
 import numpy as np
 import uuid
 from langchain_openai import OpenAIEmbeddings
 from sklearn.metrics.pairwise import cosine_similarity
-from langchain_core.documents import Document
-from langchain_community.retrievers import BM25Retriever
 
-from .vector_store import search_vector_store  # Import z pliku vector_store.py
+from .config import (
+    GRAPH_RETRIEVAL_ENABLED,
+    GRAPH_RETRIEVAL_TIMEOUT_MS,
+    GRAPH_RETRIEVAL_WEIGHT,
+    HYBRID_FUSION,
+    HYBRID_LEXICAL_WEIGHT,
+    HYBRID_VECTOR_WEIGHT,
+    LEXICAL_SEARCH_ENABLED,
+    MMR_ENABLED,
+    MMR_LAMBDA,
+    MMR_POOL_FACTOR,
+    RERANKER_CANDIDATES,
+    RERANKER_ENABLED,
+    RERANKER_MODEL,
+    SEARCH_OVERFETCH_FACTOR,
+)
+from .graph_store import asearch_graph_chunks, search_graph_chunks
+from .lexical_index import asearch_sections, search_sections
+from .ranking import distances_to_similarities, fuse_hybrid, maximal_marginal_relevance, min_max
+from .reranker import get_reranker
+from .retrieval_cache import get_retrieval_cache, retrieval_cache_key
+from .retrieval_filters import DocumentScope, RetrievalFilters, resolve_filters
+from .vector_store import asearch_vector_store, generations, search_vector_store  # Import z pliku vector_store.py
 
 logger = logging.getLogger(__name__)
 
+# Wyszukiwanie leksykalne i grafowe w wersji synchronicznej biegną w tle, równolegle z wektorowym
+_lexical_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="lexical-search")
+_graph_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="graph-search")
 
-def search_and_rerank(query: str,
-                      user_id: str,
-                      n_results: int = 5) -> List[Dict[str, Any]]:
+
+def fuse_results(vector_results: List[Dict[str, Any]],
+                 lexical_results: List[Dict[str, Any]],
+                 n_results: int,
+                 fusion: str = HYBRID_FUSION,
+                 weights: Optional[Tuple[float, ...]] = None,
+                 graph_results: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
     """
-    Wyszukiwanie wektorowe + BM25 + reranking wyników.
+    Łączy wyniki wektorowe, pełnotekstowe i (opcjonalnie) grafowe
+    (`fusion`: "weighted" lub "rrf", patrz ranking.py).
     Zwraca listę słowników z kluczami:
     - content
     - metadata
-    - similarity_score
-    - bm25_score
-    - final_score
+    - similarity_score (podobieństwo cosinusowe, None jeśli chunk znalazło tylko wyszukiwanie leksykalne)
+    - bm25_score (ts_rank_cd z Postgresa, 0.0 jeśli brak dopasowania leksykalnego)
+    - graph_score (wynik z grafu encji, tylko przy `graph_results`; 0.0 jeśli graf nie znalazł chunku)
+    - final_score (wynik po fuzji)
     - _id
+    oraz rerank_score, jeśli wyniki ocenił cross-encoder (reranker.py).
     """
-    # 1. Wyszukanie w wektorach
-    vector_results = search_vector_store(query=query, user_id=user_id, n_results=n_results)
-
-    if not vector_results:
-        logger.info("Brak wyników z wyszukiwania wektorowego.")
-        return []
-
-    # 2. Nadanie unikalnych _id jeśli nie istnieją
-    for res in vector_results:
-        if "metadata" not in res:
-            res["metadata"] = {}
-        if "_id" not in res["metadata"]:
-            new_id = str(uuid.uuid4())
-            res["metadata"]["_id"] = new_id
-        else:
-            new_id = res["metadata"]["_id"]
-
-        # Zmieniamy klucz, by łatwiej się odwoływać w doc
-        res["_id"] = new_id
-
-    # 3. BM25 Reranking
-    # Zamieniamy wyniki wektorowe w listę Document
-    documents = []
-    for res in vector_results:
-        doc = Document(
-            page_content=res["content"],
-            metadata=res["metadata"]
-        )
-        documents.append(doc)
-
-    # Tworzymy BM25Retriever
-    retriever = BM25Retriever.from_documents(documents)
-    bm25_docs = retriever.invoke(query)
-
-    # Mapa doc_id -> rank
-    bm25_mapping = {}
-    for rank, doc in enumerate(bm25_docs, start=1):
-        doc_id = doc.metadata.get("_id")
-        if doc_id:
-            bm25_mapping[doc_id] = rank
-
-    # 4. Hybrydowe łączenie wyników: sim_score + bm25_score
-    final_results = []
-    for res in vector_results:
-        sim_score = res.get("score", 0.0)  # z wektora
-        doc_id = res["_id"]
-        bm25_rank = bm25_mapping.get(doc_id)
-        if bm25_rank:
-            bm25_score = 1 / (bm25_rank + 1e-9)
-        else:
-            bm25_score = 0.1  # default
-
-        final_score = sim_score + bm25_score
-        new_res = {
+    if weights is None:
+        weights = (HYBRID_VECTOR_WEIGHT, HYBRID_LEXICAL_WEIGHT)
+        if graph_results is not None:
+            weights += (GRAPH_RETRIEVAL_WEIGHT,)
+    fused = fuse_hybrid(vector_results, lexical_results, fusion, weights, graph_results)
+    similarities = distances_to_similarities([res["score"] for res in vector_results])
+    lexical_scores = [res["score"] for res in lexical_results]
+
+    final_docs = []
+    for entry in fused[:n_results]:
+        vector_rank, lexical_rank, *graph_rank = entry["ranks"]
+        res = entry["row"]
+        metadata = res.get("metadata") or {}
+        doc_id = res.get("id") or metadata.get("_id") or str(uuid.uuid4())
+        final_docs.append({
             "content": res["content"],
-            "metadata": res["metadata"],
-            "similarity_score": sim_score,
-            "bm25_score": bm25_score,
-            "final_score": final_score,
+            "metadata": metadata,
+            "similarity_score": float(similarities[vector_rank - 1]) if vector_rank else None,
+            "bm25_score": float(lexical_scores[lexical_rank - 1]) if lexical_rank else 0.0,
+            "final_score": entry["score"],
             "_id": doc_id
-        }
-        final_results.append(new_res)
-
-    # Sortowanie malejąco po final_score
-    final_results.sort(key=lambda x: x["final_score"], reverse=True)
-    final_docs = final_results[:n_results]
+        })
+        if graph_results is not None:
+            final_docs[-1]["graph_score"] = float(graph_results[graph_rank[0] - 1]["score"]) if graph_rank[0] else 0.0
+        if res.get("embedding") is not None:
+            final_docs[-1]["embedding"] = res["embedding"]  # tylko dla MMR, usuwany w `_select`
 
     if not final_docs:
         logger.info("Nie znaleziono sensownych informacji.")
     else:
-        logger.info(f"Znaleziono {len(final_docs)} dopasowań po hybrydowym rankingu.")
-
+        graph_info = f", grafowe {len(graph_results)}" if graph_results is not None else ""
+        logger.info(f"Znaleziono {len(final_docs)} dopasowań po hybrydowym rankingu ({fusion}) "
+                    f"z kandydatów: wektorowe {len(vector_results)}, pełnotekstowe {len(lexical_results)}"
+                    f"{graph_info}.")
     return final_docs
 
 
+def _lexical_or_empty(result, query: str, retriever: str = "Lexical") -> List[Dict[str, Any]]:
+    """
+    Wyszukiwanie leksykalne i grafowe są dodatkiem - ich błąd (np. baza bez indeksu)
+    lub przekroczony czas nie blokuje wyników.
+    """
+    if isinstance(result, BaseException):
+        logger.warning(f"{retriever} search failed for query '{query}': {type(result).__name__} {result}")
+        return []
+    return result
+
+
+def _pool_sizes(n_results: int) -> Tuple[int, int]:
+    """(kandydaci z każdego wyszukiwania, wyniki po fuzji przekazywane do rerankera/MMR)."""
+    pool = n_results
+    if MMR_ENABLED:
+        pool = max(pool, n_results * MMR_POOL_FACTOR)
+    if get_reranker() is not None:
+        pool = max(pool, RERANKER_CANDIDATES)
+    return max(n_results * max(1, SEARCH_OVERFETCH_FACTOR), pool), pool
+
+
+def _select(results: List[Dict[str, Any]], n_results: int) -> List[Dict[str, Any]]:
+    """
+    Wybiera `n_results` z puli: przy MMR_ENABLED metodą maximal marginal relevance
+    (trafność = rerank_score lub final_score, podobieństwo = zapisane wektory chunków),
+    dzięki czemu nakładające się chunki jednego fragmentu nie wypełniają kontekstu.
+    """
+    if MMR_ENABLED and len(results) > n_results:
+        relevance = min_max([r.get("rerank_score", r["final_score"]) for r in results])
+        order = maximal_marginal_relevance(relevance, [r.get("embedding") for r in results], n_results, MMR_LAMBDA)
+        results = [results[i] for i in order]
+    results = results[:n_results]
+    for result in results:
+        result.pop("embedding", None)
+    return results
+
+
+# Ustawienia wpływające na wynik - część klucza cache, by zmiana konfiguracji nie zwracała starych wyników
+_SEARCH_SETTINGS = (
+    LEXICAL_SEARCH_ENABLED, SEARCH_OVERFETCH_FACTOR, HYBRID_FUSION, HYBRID_VECTOR_WEIGHT, HYBRID_LEXICAL_WEIGHT,
+    GRAPH_RETRIEVAL_ENABLED, GRAPH_RETRIEVAL_WEIGHT,
+    MMR_ENABLED, MMR_LAMBDA, MMR_POOL_FACTOR, RERANKER_ENABLED, RERANKER_MODEL, RERANKER_CANDIDATES,
+)
+
+
+def _scope_or_none(filters: Optional[RetrievalFilters], user_id: str) -> Optional[DocumentScope]:
+    """Błąd rozwiązywania filtrów nie blokuje odpowiedzi - wyszukujemy wtedy we wszystkich dokumentach."""
+    try:
+        return resolve_filters(filters, user_id)
+    except Exception as e:
+        logger.warning(f"Could not resolve retrieval filters {filters}, searching without them: {e}")
+        return None
+
+
+def _cache_key(query: str, user_id: str, n_results: int, scope: Optional[DocumentScope] = None) -> Optional[str]:
+    """Klucz wyniku w cache (retrieval_cache.py) lub None, gdy cache jest wyłączony/niedostępny."""
+    cache = get_retrieval_cache()
+    if cache is None:
+        return None
+    version = cache.corpus_version(user_id)
+    if version is None:
+        return None
+    active, _ = generations.current()
+    return retrieval_cache_key(user_id, query, version, n_results=n_results,
+                               scope=scope.cache_params() if scope is not None else None,
+                               generation=active.generation_id, settings=_SEARCH_SETTINGS)
+
+
+def _cached(key: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+    if key is None:
+        return None
+    results = get_retrieval_cache().get(key)
+    if results is not None:
+        logger.info(f"Retrieval cache hit ({len(results)} results).")
+    return results
+
+
+def _store(key: Optional[str], results: List[Dict[str, Any]]) -> None:
+    # Wyniki bez reranku (przekroczony budżet) nie trafiają do cache - kolejne pytanie spróbuje ponownie
+    if key is None or (get_reranker() is not None and any("rerank_score" not in r for r in results)):
+        return
+    get_retrieval_cache().set(key, results)
+
+
+def search_and_rerank(query: str,
+                      user_id: str,
+                      n_results: int = 5,
+                      filters: Optional[RetrievalFilters] = None) -> List[Dict[str, Any]]:
+    """
+    Wynik `_search_and_rerank` przez cache wyników wyszukiwania (retrieval_cache.py):
+    powtórzone pytanie przy niezmienionych dokumentach użytkownika pomija wyszukiwanie.
+    `filters` (kategorie, dokumenty, pliki, workspace) zawężają oba wyszukiwania
+    już w zapytaniach do Chroma i Postgresa (retrieval_filters.py).
+    """
+    scope = _scope_or_none(filters, user_id)
+    if scope is not None and scope.is_empty():
+        logger.info(f"No documents match retrieval filters {filters}.")
+        return []
+    key = _cache_key(query, user_id, n_results, scope)
+    results = _cached(key)
+    if results is None:
+        results = _search_and_rerank(query, user_id, n_results, scope)
+        _store(key, results)
+    return results
+
+
+async def asearch_and_rerank(query: str,
+                             user_id: str,
+                             n_results: int = 5,
+                             filters: Optional[RetrievalFilters] = None) -> List[Dict[str, Any]]:
+    """Asynchroniczna wersja `search_and_rerank`."""
+    scope = await asyncio.to_thread(_scope_or_none, filters, user_id) if filters is not None else None
+    if scope is not None and scope.is_empty():
+        logger.info(f"No documents match retrieval filters {filters}.")
+        return []
+    key = await asyncio.to_thread(_cache_key, query, user_id, n_results, scope)
+    results = await asyncio.to_thread(_cached, key) if key is not None else None
+    if results is None:
+        results = await _asearch_and_rerank(query, user_id, n_results, scope)
+        if key is not None:
+            await asyncio.to_thread(_store, key, results)
+    return results
+
+
+def _search_and_rerank(query: str,
+                       user_id: str,
+                       n_results: int = 5,
+                       scope: Optional[DocumentScope] = None) -> List[Dict[str, Any]]:
+    """
+    Wyszukiwanie hybrydowe: wektorowe (Chroma) i pełnotekstowe (indeks GIN na sekcjach
+    dokumentów) uruchamiane równolegle, połączone przez `fuse_results`.
+    Dzięki temu dokładne terminy (nazwy wzorów, kody kursów) trafiają do wyników
+    nawet wtedy, gdy embedding ich nie znalazł. Przy GRAPH_RETRIEVAL_ENABLED trzecim
+    źródłem są chunki powiązane z encjami z grafu (graph_store.py), o ile zdążą
+    w GRAPH_RETRIEVAL_TIMEOUT_MS. Każde wyszukiwanie zwraca
+    n_results * SEARCH_OVERFETCH_FACTOR kandydatów. Przy włączonym rerankerze
+    (reranker.py) najlepsze RERANKER_CANDIDATES po fuzji ocenia cross-encoder,
+    a ostateczne wyniki wybiera MMR (`_select`).
+    """
+    candidates, pool = _pool_sizes(n_results)
+    document_ids = scope.document_ids if scope is not None else None
+    started = time.perf_counter()
+    lexical_future = graph_future = None
+    if LEXICAL_SEARCH_ENABLED:
+        lexical_future = _lexical_executor.submit(search_sections, query, user_id, candidates, document_ids)
+    if GRAPH_RETRIEVAL_ENABLED:
+        graph_future = _graph_executor.submit(search_graph_chunks, query, user_id, candidates, document_ids)
+
+    vector_results = search_vector_store(query=query, user_id=user_id, n_results=candidates,
+                                         include_embeddings=MMR_ENABLED, scope=scope)
+
+    lexical_results: List[Dict[str, Any]] = []
+    if lexical_future is not None:
+        try:
+            lexical_results = lexical_future.result()
+        except Exception as e:
+            lexical_results = _lexical_or_empty(e, query)
+
+    graph_results = None
+    if graph_future is not None:
+        # Budżet grafu liczy się od startu wyszukiwania - nie wydłuża go ponad GRAPH_RETRIEVAL_TIMEOUT_MS
+        remaining = GRAPH_RETRIEVAL_TIMEOUT_MS / 1000.0 - (time.perf_counter() - started)
+        try:
+            graph_results = graph_future.result(timeout=max(0.0, remaining))
+        except Exception as e:
+            graph_results = _lexical_or_empty(e, query, "Graph")
+
+    if not vector_results and not lexical_results and not graph_results:
+        logger.info("Brak wyników z wyszukiwania wektorowego, pełnotekstowego i grafowego.")
+        return []
+    fused = fuse_results(vector_results, lexical_results, pool, graph_results=graph_results)
+    reranker = get_reranker()
+    if reranker is not None:
+        fused = reranker.rerank(query, fused, len(fused))
+    return _select(fused, n_results)
+
+
+async def _asearch_and_rerank(query: str,
+                              user_id: str,
+                              n_results: int = 5,
+                              scope: Optional[DocumentScope] = None) -> List[Dict[str, Any]]:
+    """Asynchroniczna wersja `_search_and_rerank` (wszystkie wyszukiwania współbieżnie)."""
+    candidates, pool = _pool_sizes(n_results)
+    document_ids = scope.document_ids if scope is not None else None
+    searches = {"vector": asearch_vector_store(query=query, user_id=user_id, n_results=candidates,
+                                               include_embeddings=MMR_ENABLED, scope=scope)}
+    if LEXICAL_SEARCH_ENABLED:
+        searches["lexical"] = asearch_sections(query, user_id, candidates, document_ids)
+    if GRAPH_RETRIEVAL_ENABLED:
+        searches["graph"] = asyncio.wait_for(asearch_graph_chunks(query, user_id, candidates, document_ids),
+                                             GRAPH_RETRIEVAL_TIMEOUT_MS / 1000.0)
+
+    results = dict(zip(searches, await asyncio.gather(*searches.values(), return_exceptions=True)))
+    vector_results = results["vector"]
+    if isinstance(vector_results, BaseException):
+        logger.error(f"Vector search failed for query '{query}': {vector_results}")
+        vector_results = []
+    lexical_results = _lexical_or_empty(results["lexical"], query) if "lexical" in results else []
+    graph_results = _lexical_or_empty(results["graph"], query, "Graph") if "graph" in results else None
+
+    if not vector_results and not lexical_results and not graph_results:
+        logger.info("Brak wyników z wyszukiwania wektorowego, pełnotekstowego i grafowego.")
+        return []
+    fused = fuse_results(vector_results, lexical_results, pool, graph_results=graph_results)
+    reranker = get_reranker()
+    if reranker is not None:
+        fused = await reranker.arerank(query, fused, len(fused))
+    return _select(fused, n_results)
+
+
 def process_vector_results(vector_results: Dict[str, Any], query_embedding: np.ndarray) -> List[Dict[str, Any]]:
     """
     Przetwarza wyniki z vector_store i oblicza cosinus similarity z query_embedding.
@@ -175,8 +380,7 @@ def upload():
     # Parametry testowe
     test_file_path = '../data/amos_pulapki.txt'  # Ścieżka do pliku
     test_user_id = 'user-123'
-    test_file_description = 'Testowy plik Jedrek'
-    test_category = 'test-category'
+    test_document_id = str(uuid.uuid4())
 
     # Otwieranie i czytanie pliku
 
@@ -192,8 +396,7 @@ def upload():
         create_vector_store(
             chunks=chunks,
             user_id=test_user_id,
-            file_description=test_file_description,
-            category=test_category
+            document_id=test_document_id
         )
         logger.info("Chunku zostały pomyślnie dodane do vector store.")
     except Exception as e:
@@ -1,7 +1,7 @@
 # Services module
 from .subscription import SubscriptionService
 from .document_processor import DocumentProcessor, document_processor
-from .workspace_chat import WorkspaceChatService, HIGHLIGHT_COLORS, search_documents_by_user
+from .workspace_chat import WorkspaceChatService, HIGHLIGHT_COLORS, build_retrieval_filters, search_documents_by_user
 from .storage_service import StorageService, get_storage_service
 
 __all__ = [
@@ -10,6 +10,7 @@ __all__ = [
     'document_processor',
     'WorkspaceChatService',
     'HIGHLIGHT_COLORS',
+    'build_retrieval_filters',
     'search_documents_by_user',
     'StorageService',
     'get_storage_service',
@@ -14,6 +14,7 @@ from ..models import (
     DocumentSection,
     UserHighlight,
 )
+from ..retrieval_filters import RetrievalFilters
 
 logger = logging.getLogger(__name__)
 
@@ -47,7 +48,8 @@ class WorkspaceChatService:
         query: str,
         document_id: Optional[UUID] = None,
         filter_colors: Optional[List[str]] = None,
-        max_context_length: int = 8000
+        max_context_length: int = 8000,
+        workspace_id: Optional[UUID] = None
     ) -> Dict[str, Any]:
         """
         Get context for AI query based on filter mode.
@@ -58,6 +60,8 @@ class WorkspaceChatService:
             filter_colors: List of color codes to filter by (e.g., ['red', 'yellow'])
                           If None or empty, uses standard RAG
             max_context_length: Maximum characters for context
+            workspace_id: Optional workspace whose categories limit RAG search
+                          (ignored when document_id is given)
 
         Returns:
             Dict with:
@@ -81,7 +85,8 @@ class WorkspaceChatService:
             return await self._get_rag_context(
                 query=query,
                 document_id=document_id,
-                max_length=max_context_length
+                max_length=max_context_length,
+                workspace_id=workspace_id
             )
 
     async def _get_highlights_context(
@@ -193,17 +198,20 @@ class WorkspaceChatService:
         self,
         query: str,
         document_id: Optional[UUID],
-        max_length: int
+        max_length: int,
+        workspace_id: Optional[UUID] = None
     ) -> Dict[str, Any]:
         """
-        Use standard RAG with ChromaDB for context retrieval.
+        Use standard RAG with ChromaDB for context retrieval,
+        limited to the given document or workspace.
         """
         try:
             # Search using existing vector store
             results = await search_documents_by_user(
                 query=query,
                 user_id=self.user_id,
-                n_results=5
+                n_results=5,
+                filters=build_retrieval_filters(document_id=document_id, workspace_id=workspace_id)
             )
 
             if not results:
@@ -305,18 +313,33 @@ class WorkspaceChatService:
         return summary
 
 
-async def search_documents_by_user(query: str, user_id: str, n_results: int = 5) -> List[Dict]:
+def build_retrieval_filters(document_id: Optional[Any] = None,
+                            workspace_id: Optional[Any] = None) -> Optional[RetrievalFilters]:
+    """
+    Retrieval scope of a workspace chat: the open document if there is one,
+    otherwise the workspace's categories. None means all user's documents.
+    """
+    if document_id:
+        return RetrievalFilters(document_ids=(str(document_id),))
+    if workspace_id:
+        return RetrievalFilters(workspace_id=str(workspace_id))
+    return None
+
+
+async def search_documents_by_user(query: str, user_id: str, n_results: int = 5,
+                                   filters: Optional[RetrievalFilters] = None) -> List[Dict]:
     """
     Helper function to search documents using existing vector store.
     This integrates with the existing RAG system.
     """
-    from ..search_engine import search_and_rerank
+    from ..search_engine import asearch_and_rerank
 
     try:
-        results = search_and_rerank(
+        results = await asearch_and_rerank(
             query=query,
             user_id=user_id,
-            n_results=n_results
+            n_results=n_results,
+            filters=filters
         )
         return results or []
     except Exception as e:
@@ -0,0 +1,148 @@
+# vector_partitioning.py
+"""
+Routing of users to ChromaDB collections.
+
+Modes (VECTOR_PARTITION_MODE):
+- "single": every user shares the base collection (legacy behaviour)
+- "user":   one collection per user, e.g. "torched-rag-u-42"
+- "bucket": users are hashed into VECTOR_PARTITION_BUCKETS collections, e.g. "torched-rag-b007"
+
+With partitioning, search cost and HNSW memory scale with the user's own corpus instead
+of the total corpus. During the migration window VECTOR_PARTITION_DUAL_READ=true also reads
+the legacy base collection, so nothing disappears before `migrate` has moved it.
+
+Migration (moves stored vectors, nothing is re-embedded), run from the `rag` directory:
+
+    python -m src.vector_partitioning migrate [--delete-source] [--offset N]
+"""
+
+import argparse
+import hashlib
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from .config import VECTOR_PARTITION_MODE, VECTOR_PARTITION_BUCKETS, VECTOR_PARTITION_DUAL_READ
+
+logger = logging.getLogger(__name__)
+
+# Chroma collection names: 3-63 characters, [a-zA-Z0-9._-], alphanumeric at both ends
+_MAX_COLLECTION_NAME = 63
+
+
+def _user_bucket(user_id: str, buckets: int) -> int:
+    digest = hashlib.sha1(str(user_id).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % buckets
+
+
+def collection_for_user(base_name: str, user_id: str, mode: str = VECTOR_PARTITION_MODE,
+                        buckets: int = VECTOR_PARTITION_BUCKETS) -> str:
+    """Name of the collection that stores (and receives new) data of `user_id`."""
+    if mode == "user":
+        safe_id = re.sub(r'[^a-zA-Z0-9_-]', '-', str(user_id)).strip('-_') or "0"
+        name = f"{base_name}-u-{safe_id}"
+        if len(name) > _MAX_COLLECTION_NAME:
+            name = f"{base_name}-u-{hashlib.sha1(str(user_id).encode('utf-8')).hexdigest()[:16]}"
+        return name
+    if mode == "bucket":
+        return f"{base_name}-b{_user_bucket(user_id, buckets):03d}"
+    return base_name
+
+
+def read_collections_for_user(base_name: str, user_id: str, mode: str = VECTOR_PARTITION_MODE,
+                              dual_read: bool = VECTOR_PARTITION_DUAL_READ) -> List[str]:
+    """Collections that may hold data of `user_id` (partition first, legacy base during dual-read)."""
+    primary = collection_for_user(base_name, user_id, mode)
+    if dual_read and primary != base_name:
+        return [primary, base_name]
+    return [primary]
+
+
+def migrate_collection(chroma_client, base_name: str, page_size: int = 500, offset: int = 0,
+                       delete_source: bool = False, mode: str = VECTOR_PARTITION_MODE) -> int:
+    """
+    Copies every record of the legacy `base_name` collection into the partition of its
+    `user_id`, reusing the stored embeddings. Returns the number of moved records.
+
+    With `delete_source`, moved records are removed from the legacy collection, so paging
+    only skips over the records that were left in place.
+    """
+    if mode == "single":
+        logger.warning("VECTOR_PARTITION_MODE is 'single' - nothing to migrate.")
+        return 0
+
+    source = chroma_client.get_or_create_collection(name=base_name, embedding_function=None)
+    targets: Dict[str, Any] = {}
+    moved = 0
+
+    while True:
+        page = source.get(
+            limit=page_size,
+            offset=offset,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        ids = page.get("ids") or []
+        if not ids:
+            break
+
+        grouped: Dict[str, Dict[str, List[Any]]] = {}
+        skipped = 0
+        for i, record_id in enumerate(ids):
+            metadata = page["metadatas"][i] or {}
+            user_id = metadata.get("user_id")
+            if user_id is None:
+                logger.warning(f"Record {record_id} in '{base_name}' has no user_id - left in place.")
+                skipped += 1
+                continue
+            target_name = collection_for_user(base_name, str(user_id), mode)
+            group = grouped.setdefault(target_name, {"ids": [], "embeddings": [], "documents": [], "metadatas": []})
+            group["ids"].append(record_id)
+            group["embeddings"].append(page["embeddings"][i])
+            group["documents"].append(page["documents"][i])
+            group["metadatas"].append(metadata)
+
+        for target_name, group in grouped.items():
+            if target_name not in targets:
+                targets[target_name] = chroma_client.get_or_create_collection(name=target_name, embedding_function=None)
+            targets[target_name].upsert(**group)
+            moved += len(group["ids"])
+            if delete_source:
+                source.delete(ids=group["ids"])
+
+        # Records that stay in the legacy collection keep their positions
+        offset += skipped if delete_source else len(ids)
+        logger.info(f"[{base_name}] moved {moved} records so far (next offset: {offset})")
+
+        if len(ids) < page_size:
+            break
+
+    logger.info(f"[{base_name}] migration finished: {moved} records moved into {len(targets)} collections.")
+    return moved
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Move vectors from shared collections into per-user partitions.")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--offset", type=int, default=0, help="Resume from this offset of the legacy collection")
+    parser.add_argument("--delete-source", action="store_true", help="Remove moved records from the legacy collection")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from .vector_store import (
+        _chroma_client, collection_name, centroid_collection_name, memory_collection_name, generations
+    )
+
+    active, _ = generations.current()
+    for base_name in (collection_name, centroid_collection_name, memory_collection_name):
+        migrate_collection(
+            _chroma_client,
+            active.collection(base_name),
+            page_size=args.page_size,
+            offset=args.offset,
+            delete_source=args.delete_source
+        )
+
+
+if __name__ == "__main__":
+    main()
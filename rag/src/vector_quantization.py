@@ -0,0 +1,352 @@
+# vector_quantization.py
+"""
+Quantized copies of document vectors for a cheap first-pass search.
+
+VECTOR_QUANTIZATION:
+- "none":   searches go straight to Chroma (default)
+- "int8":   one signed byte per dimension + per-vector scale (4x smaller than float32)
+- "binary": one bit per dimension, compared with Hamming distance (32x smaller)
+
+The codes live in a local SQLite file next to the Chroma data. A search scores the
+user's codes in numpy, keeps the best `n_results * VECTOR_RESCORE_FACTOR` candidates
+and rescores them with the full-precision vectors fetched from Chroma, so the final
+ranking uses exact distances.
+
+Vectors stored before quantization was enabled have no codes; fill them in with
+(run from the `rag` directory):
+
+    python -m src.vector_quantization backfill
+
+The first pass only sees vectors that have codes, so it is used for a (collection, user)
+only while the codes cover all of the user's vectors in Chroma (checked against Chroma,
+re-checked when the code count changes or after VECTOR_QUANTIZATION_COVERAGE_TTL).
+Partial coverage is logged and the search goes to Chroma directly.
+
+The SQLite file is local to one host and only receives the writes of that host's
+workers. It cannot be shared between API replicas: with several replicas writing to
+one Chroma, each one's codes cover only part of the data and searches fall back to
+exact Chroma queries. Enable quantization on single-host deployments only.
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import VECTOR_QUANTIZATION, VECTOR_QUANTIZATION_COVERAGE_TTL, VECTOR_QUANTIZATION_PATH
+
+logger = logging.getLogger(__name__)
+
+# Number of set bits for every byte value (Hamming distance on packed codes)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8 quantization. Returns (codes, scales)."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """Sign bits packed into bytes (dimensions / 8 bytes per vector)."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    return np.packbits(vectors > 0, axis=1)
+
+
+def int8_scores(query: np.ndarray, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Approximate inner products (higher is better)."""
+    return (codes.astype(np.float32) @ np.asarray(query, dtype=np.float32)) * scales
+
+
+def hamming_distances(query_bits: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Hamming distances between one packed query and packed codes (lower is better)."""
+    return _POPCOUNT[np.bitwise_xor(codes, query_bits)].sum(axis=1)
+
+
+def first_pass(query: Sequence[float], codes: np.ndarray, scales: Optional[np.ndarray], mode: str,
+               k: int) -> np.ndarray:
+    """Indices of the `k` best candidates according to the quantized codes."""
+    if len(codes) == 0:
+        return np.array([], dtype=np.int64)
+    query = np.asarray(query, dtype=np.float32)
+    if mode == "binary":
+        order_key = hamming_distances(quantize_binary(query)[0], codes)
+    else:
+        order_key = -int8_scores(query, codes, scales)
+    k = min(k, len(codes))
+    top = np.argpartition(order_key, k - 1)[:k]
+    return top[np.argsort(order_key[top], kind="stable")]
+
+
+def l2_distances(query: Sequence[float], vectors: Sequence[Sequence[float]]) -> np.ndarray:
+    """Squared L2 distances, the same metric Chroma reports for the default 'l2' space."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    diff = matrix - np.asarray(query, dtype=np.float32)
+    return np.einsum("ij,ij->i", diff, diff)
+
+
+def rescore_rows(query: Sequence[float], got: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Turns a Chroma `get(..., include=[embeddings, documents, metadatas])` into scored rows."""
+    ids = got.get("ids") or []
+    if not ids:
+        return []
+    distances = l2_distances(query, got["embeddings"])
+    documents = got.get("documents") or [None] * len(ids)
+    metadatas = got.get("metadatas") or [{}] * len(ids)
+    return [
+        {"id": doc_id, "content": doc, "metadata": meta or {}, "score": float(dist), "embedding": embedding}
+        for doc_id, doc, meta, dist, embedding in zip(ids, documents, metadatas, distances, got["embeddings"])
+    ]
+
+
+class QuantizedIndex:
+    """
+    Per-collection store of quantized vectors (SQLite), with an in-process cache of the
+    decoded code matrix of each (collection, user). The cache is invalidated when the
+    row count or the newest rowid of that user changes, so writes from other workers are
+    picked up on the next search.
+    """
+
+    def __init__(self, path: str, mode: str, max_cached_users: int = 256,
+                 coverage_ttl: float = VECTOR_QUANTIZATION_COVERAGE_TTL):
+        if mode not in ("int8", "binary"):
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.max_cached_users = max_cached_users
+        self.coverage_ttl = coverage_ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._matrices: "OrderedDict[Tuple[str, str], Tuple[Tuple[int, int], Any]]" = OrderedDict()
+        # (kolekcja, użytkownik) -> (liczba kodów, czas sprawdzenia, czy kody pokrywają Chroma)
+        self._coverage: "OrderedDict[Tuple[str, str], Tuple[int, float, bool]]" = OrderedDict()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS vector_codes (
+                collection TEXT NOT NULL,
+                id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                source_key TEXT,
+                code BLOB NOT NULL,
+                scale REAL NOT NULL,
+                PRIMARY KEY (collection, id)
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(vector_codes)")}
+        if "source_key" not in columns:
+            # Pliki sprzed rejestru dokumentów: kolumna nazywała się file_name, choć trzymała też document_id
+            self._conn.execute("ALTER TABLE vector_codes RENAME COLUMN file_name TO source_key")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_vector_codes_user ON vector_codes (collection, user_id)")
+        self._conn.commit()
+        logger.info(f"Quantized vector index ({mode}) at {path}")
+
+    def _encode(self, vectors: Sequence[Sequence[float]]) -> Tuple[List[bytes], List[float]]:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if self.mode == "binary":
+            codes = quantize_binary(matrix)
+            return [row.tobytes() for row in codes], [1.0] * len(codes)
+        codes, scales = quantize_int8(matrix)
+        return [row.tobytes() for row in codes], scales.tolist()
+
+    def upsert(self, collection: str, ids: List[str], vectors: Sequence[Sequence[float]],
+               metadatas: List[Dict[str, Any]]) -> None:
+        if not ids:
+            return
+        codes, scales = self._encode(vectors)
+        rows = [
+            # Klucz źródła: document_id (lub file_name wektorów sprzed rejestru dokumentów)
+            (collection, doc_id, str(meta.get("user_id", "")), meta.get("document_id") or meta.get("file_name"),
+             code, scale)
+            for doc_id, meta, code, scale in zip(ids, metadatas, codes, scales)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vector_codes (collection, id, user_id, source_key, code, scale) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def delete(self, collection: str, user_id: Optional[str] = None, source_key: Optional[str] = None,
+               ids: Optional[List[str]] = None) -> None:
+        """`source_key` is the document_id (or the file_name of vectors from before the document registry)."""
+        clauses, params = ["collection = ?"], [collection]
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(str(user_id))
+        if source_key is not None:
+            clauses.append("source_key = ?")
+            params.append(source_key)
+        with self._lock:
+            if ids:
+                for start in range(0, len(ids), 500):
+                    batch = ids[start:start + 500]
+                    self._conn.execute(
+                        f"DELETE FROM vector_codes WHERE {' AND '.join(clauses)} "
+                        f"AND id IN ({','.join('?' * len(batch))})",
+                        params + batch
+                    )
+            else:
+                self._conn.execute(f"DELETE FROM vector_codes WHERE {' AND '.join(clauses)}", params)
+            self._conn.commit()
+
+    def _signature(self, key: Tuple[str, str]) -> Tuple[int, int]:
+        # Wywoływane pod self._lock
+        return tuple(self._conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM vector_codes WHERE collection = ? AND user_id = ?",
+            key
+        ).fetchone())
+
+    def _user_matrix(self, collection: str, user_id: str):
+        key = (collection, str(user_id))
+        with self._lock:
+            signature = self._signature(key)
+            cached = self._matrices.get(key)
+            if cached is not None and cached[0] == signature:
+                self._matrices.move_to_end(key)
+                return cached[1]
+
+            rows = self._conn.execute(
+                "SELECT id, code, scale FROM vector_codes WHERE collection = ? AND user_id = ?", key
+            ).fetchall()
+
+        dtype = np.uint8 if self.mode == "binary" else np.int8
+        ids = [row[0] for row in rows]
+        codes = np.stack([np.frombuffer(row[1], dtype=dtype) for row in rows]) if rows else np.empty((0, 0), dtype)
+        scales = np.array([row[2] for row in rows], dtype=np.float32)
+        matrix = (ids, codes, scales)
+
+        with self._lock:
+            self._matrices[key] = (signature, matrix)
+            self._matrices.move_to_end(key)
+            while len(self._matrices) > self.max_cached_users:
+                self._matrices.popitem(last=False)
+        return matrix
+
+    def candidates(self, collections: List[str], user_id: str, query: Sequence[float],
+                   k: int) -> Dict[str, List[str]]:
+        """Best `k` candidate ids per collection according to the quantized codes."""
+        result: Dict[str, List[str]] = {}
+        for collection in collections:
+            ids, codes, scales = self._user_matrix(collection, user_id)
+            top = first_pass(query, codes, scales, self.mode, k)
+            if len(top):
+                result[collection] = [ids[i] for i in top]
+        return result
+
+    def coverage(self, collection: str, user_id: str) -> Optional[bool]:
+        """
+        Cached answer of "do the codes cover all of the user's vectors in `collection`", or
+        None when it has to be (re)checked with `record_coverage`.
+        """
+        key = (collection, str(user_id))
+        with self._lock:
+            codes = self._signature(key)[0]
+            cached = self._coverage.get(key)
+        if cached is None or cached[0] != codes or time.monotonic() - cached[1] >= self.coverage_ttl:
+            return None
+        return cached[2]
+
+    def record_coverage(self, collection: str, user_id: str, stored: int) -> bool:
+        """Compares the code count with the `stored` vector count from Chroma and caches the result."""
+        key = (collection, str(user_id))
+        with self._lock:
+            codes = self._signature(key)[0]
+            covered = codes >= stored
+            self._coverage[key] = (codes, time.monotonic(), covered)
+            self._coverage.move_to_end(key)
+            while len(self._coverage) > self.max_cached_users:
+                self._coverage.popitem(last=False)
+        if not covered:
+            logger.warning(f"Quantized codes cover {codes}/{stored} vectors of user {user_id} in '{collection}' "
+                           f"- searching Chroma directly (run the backfill on this host).")
+        return covered
+
+    def count(self) -> int:
+        with self._lock:
+            (total,) = self._conn.execute("SELECT COUNT(*) FROM vector_codes").fetchone()
+        return total
+
+
+# Global instance (singleton pattern)
+_quantized_index: Optional[QuantizedIndex] = None
+_quantized_index_initialized = False
+
+
+def get_quantized_index() -> Optional[QuantizedIndex]:
+    """
+    Get the global quantized index configured via VECTOR_QUANTIZATION.
+    Returns None when quantization is disabled or the index cannot be opened.
+    """
+    global _quantized_index, _quantized_index_initialized
+    if _quantized_index_initialized:
+        return _quantized_index
+
+    _quantized_index_initialized = True
+    if VECTOR_QUANTIZATION == "none":
+        return None
+    try:
+        _quantized_index = QuantizedIndex(VECTOR_QUANTIZATION_PATH, VECTOR_QUANTIZATION)
+    except Exception as e:
+        logger.warning(f"Quantized index '{VECTOR_QUANTIZATION}' unavailable: {e}. Searching Chroma directly.")
+        _quantized_index = None
+    return _quantized_index
+
+
+def backfill(chroma_client, collection_names: List[str], index: QuantizedIndex, page_size: int = 500) -> int:
+    """Writes codes for every vector already stored in the given collections."""
+    written = 0
+    for name in collection_names:
+        collection = chroma_client.get_or_create_collection(name=name, embedding_function=None)
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["embeddings", "metadatas"])
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            index.upsert(name, ids, page["embeddings"], [m or {} for m in page["metadatas"]])
+            written += len(ids)
+            offset += len(ids)
+            if len(ids) < page_size:
+                break
+        logger.info(f"[{name}] quantized codes written: {written} so far")
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain quantized copies of stored document vectors.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    index = get_quantized_index()
+    if index is None:
+        logger.error("VECTOR_QUANTIZATION is 'none' - nothing to do.")
+        return
+
+    from .vector_store import _chroma_client, _list_partitions, collection_name, generations
+    active, _ = generations.current()
+    total = backfill(_chroma_client, _list_partitions(active.collection(collection_name)), index,
+                     page_size=args.page_size)
+    logger.info(f"Backfill finished: {total} vectors quantized.")
+
+
+if __name__ == "__main__":
+    main()
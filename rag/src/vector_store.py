@@ -1,20 +1,68 @@
 # vector_store.py
 from datetime import datetime
+import asyncio
+import hashlib
 import logging
+import re
 import uuid
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 
 import chromadb
 from chromadb.config import Settings
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
-from .config import get_chroma_client_settings
+from langchain_core.embeddings import Embeddings
+from .config import (
+    get_chroma_client_settings,
+    VECTOR_RESCORE_FACTOR,
+    VECTOR_TWO_STAGE_ENABLED,
+    VECTOR_TWO_STAGE_TOP_DOCUMENTS,
+    VECTOR_TWO_STAGE_MIN_DOCUMENTS,
+    CHUNK_DEDUP_ENABLED,
+    CHUNK_DEDUP_SCOPE,
+    MEMORY_DEDUP_MIN_SIMILARITY,
+    MEMORY_IMPORTANCE_BUMP,
+)
+from .dedup import DedupResult, find_near_duplicates
+from .document_centroids import CENTROID_SUFFIX, CentroidDeltas, apply_delta, centroid_collection, centroid_id
+from .document_registry import ahydrate_metadatas, hydrate_metadatas
+from .embeddings import create_embeddings
+from .embedding_cache import CachedEmbeddings, get_embedding_cache, get_query_embedding_cache
+from .ingest_pipeline import IngestReport, embed_and_upsert
+from .async_vector_store import AsyncVectorStore, is_missing_collection
+from .vector_partitioning import collection_for_user, read_collections_for_user
+from .vector_quantization import get_quantized_index, rescore_rows
+from .index_generations import IndexSettings, LEGACY_SETTINGS, get_generation_resolver
+from .retrieval_cache import abump_corpus_version, bump_corpus_version
+from .retrieval_filters import DocumentScope, chroma_where
+from . import memory_index
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-# Inicjalizacja embeddings
-embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+# Inicjalizacja embeddings (z cache, aby nie embedować ponownie tych samych chunków)
+embedding_cache = get_embedding_cache()
+_embedders: Dict[Tuple[str, Optional[int]], CachedEmbeddings] = {}
+
+
+def embeddings_for(settings: IndexSettings) -> CachedEmbeddings:
+    """Embedder dla ustawień danej generacji indeksu (model i wymiar; OpenAI lub lokalny model)."""
+    key = (settings.embedding_model, settings.embedding_dimensions)
+    if key not in _embedders:
+        # Przy skróconych (Matryoshka) wektorach wymiar jest częścią klucza cache
+        model_key = f"{key[0]}@{key[1]}" if key[1] else key[0]
+        _embedders[key] = CachedEmbeddings(
+            create_embeddings(key[0], key[1]),
+            model_name=model_key,
+            cache=embedding_cache,
+            query_cache=get_query_embedding_cache(),
+        )
+    return _embedders[key]
+
+
+embeddings = embeddings_for(LEGACY_SETTINGS)
+
+# Aktywna generacja indeksu (odczyty) i ewentualnie budowana (dual-write), patrz reindex.py
+generations = get_generation_resolver()
 
 
 def _create_chroma_client():
@@ -51,6 +99,7 @@ def _create_chroma_client():
 _chroma_client = _create_chroma_client()
 
 # Initialize collections using langchain_chroma with our client
+# (kolekcje bazowe; przy partycjonowaniu dane użytkowników trafiają do kolekcji per użytkownik/bucket)
 collection_name = 'torched-rag'
 client = Chroma(
     client=_chroma_client,
@@ -58,6 +107,9 @@ client = Chroma(
     embedding_function=embeddings,
 )
 
+# Wektory centroidów dokumentów (wyszukiwanie dwuetapowe) - partycje/generacje jak w kolekcji chunków
+centroid_collection_name = f"{collection_name}{CENTROID_SUFFIX}"
+
 memory_collection_name = 'user-memories'
 memory_client = Chroma(
     client=_chroma_client,
@@ -65,84 +117,530 @@ memory_client = Chroma(
     embedding_function=embeddings,
 )
 
+# Asynchroniczny dostęp do kolekcji (nie blokuje pętli zdarzeń uvicorn)
+async_store = AsyncVectorStore(get_chroma_client_settings(), sync_client=_chroma_client)
+
+# Skwantyzowane kopie wektorów dokumentów (wstępne wyszukiwanie), None gdy VECTOR_QUANTIZATION=none
+quantized_index = get_quantized_index()
+
+_sync_collections: Dict[str, Any] = {}
+
+
+def _sync_collection(name: str, create: bool = True):
+    """
+    Zwraca (i cache'uje) synchroniczny uchwyt kolekcji Chroma. Przy `create=False` (odczyty,
+    usuwanie) brakująca kolekcja to None - zapytanie użytkownika nie zakłada pustych partycji.
+    """
+    if name not in _sync_collections:
+        try:
+            if create:
+                _sync_collections[name] = _chroma_client.get_or_create_collection(name=name, embedding_function=None)
+            else:
+                _sync_collections[name] = _chroma_client.get_collection(name=name, embedding_function=None)
+        except Exception as e:
+            if create or not is_missing_collection(e):
+                raise
+            return None
+    return _sync_collections[name]
+
+
+def _existing_collections(names: List[str]) -> List[Any]:
+    """Uchwyty tych z kolekcji `names`, które istnieją (odczyty nie zakładają kolekcji)."""
+    return [c for c in (_sync_collection(name, create=False) for name in names) if c is not None]
+
+
+def rag_collection_for(user_id: str, settings: IndexSettings = LEGACY_SETTINGS) -> str:
+    """Kolekcja, do której trafiają nowe chunki użytkownika."""
+    return collection_for_user(settings.collection(collection_name), str(user_id))
+
+
+def memory_collection_for(user_id: str, settings: IndexSettings = LEGACY_SETTINGS) -> str:
+    """Kolekcja, do której trafiają nowe wspomnienia użytkownika."""
+    return collection_for_user(settings.collection(memory_collection_name), str(user_id))
+
+
+def _read_names(base_name: str, user_id: str, active: IndexSettings) -> List[str]:
+    """Kolekcje, z których czytamy dane użytkownika."""
+    return read_collections_for_user(active.collection(base_name), str(user_id))
+
+
+def _delete_names(base_name: str, user_id: str, active: IndexSettings,
+                  building: Optional[IndexSettings]) -> List[str]:
+    """Kolekcje, z których usuwamy dane użytkownika (łącznie z budowaną generacją)."""
+    names = _read_names(base_name, user_id, active)
+    if building is not None:
+        names.append(collection_for_user(building.collection(base_name), str(user_id)))
+    return names
+
+
+def _list_partitions(base_name: str) -> List[str]:
+    """Wszystkie istniejące kolekcje należące do kolekcji bazowej (wraz z nią)."""
+    names = [getattr(c, "name", c) for c in _chroma_client.list_collections()]
+    return [
+        n for n in names
+        if n == base_name or n.startswith(f"{base_name}-u-") or re.fullmatch(rf"{re.escape(base_name)}-b\d{{3}}", n)
+    ]
+
 
 def delete_collection() -> None:
-    """Usuwa całą kolekcję z Chroma."""
+    """Usuwa całą aktywną kolekcję z Chroma (razem z jej partycjami)."""
     try:
-        client.delete_collection()
-        logger.info(f"Deleted collection '{collection_name}'.")
+        active = generations.current()[0]
+        drop_collections(_list_partitions(active.collection(collection_name))
+                         + _list_partitions(active.collection(centroid_collection_name)))
+        bump_corpus_version(None)
     except Exception as e:
         logger.error(f"Error deleting collection '{collection_name}': {e}", exc_info=True)
         raise
 
 
+def drop_collections(names: List[str]) -> None:
+    """Usuwa podane kolekcje z Chroma wraz z uchwytami w cache i kodami skwantyzowanymi."""
+    for name in names:
+        _chroma_client.delete_collection(name=name)
+        _sync_collections.pop(name, None)
+        async_store.forget(name)
+        if quantized_index is not None:
+            quantized_index.delete(name)
+        logger.info(f"Deleted collection '{name}'.")
+
+
 def generate_unique_id(user_id: str) -> str:
     """Generuje unikalne ID dokumentu."""
     return f"{user_id}_{uuid.uuid4()}"
 
 
-# POPRAWKA: Zmieniona sygnatura funkcji, aby przyjmowała `file_name`
-def create_vector_store(chunks: List[str],
-                        user_id: str,
-                        file_name: str,
-                        file_description: str,
-                        category: str) -> None:
+def chunk_vector_id(user_id: str, document_id: str, chunk_index: int, text: str) -> str:
+    """
+    Deterministyczne ID wektora chunku: ten sam dokument, pozycja i treść dają to samo ID.
+    Ponowiony ingest nadpisuje (upsert) zamiast dublować, a niezmienione chunki
+    można pominąć przy aktualizacji. ID jest zapisywane w DocumentSection.vector_id.
+    """
+    content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    key = f"{user_id}\x00{document_id}\x00{chunk_index}\x00{content_hash}".encode('utf-8')
+    return f"{user_id}_{hashlib.sha256(key).hexdigest()[:32]}"
+
+
+def _query_rows(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Spłaszcza wynik `collection.query` (dla jednego zapytania) do listy słowników."""
+    if not result or not result.get("ids"):
+        return []
+    ids = result["ids"][0]
+    documents = (result.get("documents") or [[]])[0] or [None] * len(ids)
+    metadatas = (result.get("metadatas") or [[]])[0] or [{}] * len(ids)
+    distances = (result.get("distances") or [[]])[0] or [0.0] * len(ids)
+    rows = [
+        {"id": doc_id, "content": doc, "metadata": meta or {}, "score": dist}
+        for doc_id, doc, meta, dist in zip(ids, documents, metadatas, distances)
+    ]
+    # Embeddingi tylko gdy zapytanie je zawierało (include=["embeddings", ...]) - np. dla MMR
+    embeddings = result.get("embeddings")
+    if embeddings is not None and len(embeddings) and embeddings[0] is not None:
+        for row, embedding in zip(rows, embeddings[0]):
+            row["embedding"] = embedding
+    return rows
+
+
+def _merge_query_rows(rows: List[Dict[str, Any]], n_results: int) -> List[Dict[str, Any]]:
+    """Łączy wyniki z kilku kolekcji (dual-read): usuwa duplikaty ID i sortuje po dystansie."""
+    best: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        if row["id"] not in best or row["score"] < best[row["id"]]["score"]:
+            best[row["id"]] = row
+    return sorted(best.values(), key=lambda r: r["score"])[:n_results]
+
+
+def _merge_get_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Łączy wyniki `collection.get` z kilku kolekcji w jeden słownik."""
+    merged: Dict[str, Any] = {"ids": [], "documents": [], "metadatas": []}
+    seen = set()
+    for result in results:
+        embeddings_found = result.get("embeddings")
+        for i, doc_id in enumerate(result.get("ids") or []):
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            merged["ids"].append(doc_id)
+            merged["documents"].append((result.get("documents") or [None] * (i + 1))[i])
+            merged["metadatas"].append((result.get("metadatas") or [{}] * (i + 1))[i])
+            if embeddings_found is not None:
+                merged.setdefault("embeddings", []).append(embeddings_found[i])
+    return merged
+
+
+def _chunk_metadatas(chunks: List[str], user_id: str, document_id: str, pages: Optional[List[int]] = None,
+                     dedup: Optional[DedupResult] = None) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    ID i metadane wektorów. Przy `dedup` tylko dla zachowanych chunków, z oryginalnym
+    `chunk_index` (zgodnym z DocumentSection) i SimHashem.
+
+    Metadane zawierają tylko klucze (użytkownik, dokument, chunk, strona) - nazwa pliku,
+    opis i kategoria są w WorkspaceDocument i dołączane do wyników przez document_registry.
+    """
+    indices = dedup.kept if dedup is not None else range(len(chunks))
+    ids = []
+    metadatas = []
+    for i in indices:
+        doc_id = chunk_vector_id(user_id, document_id, i, chunks[i])
+        metadata = {
+            "user_id": user_id,
+            "document_id": document_id,
+            "chunk_index": i,
+        }
+        if pages and pages[i] is not None:
+            metadata["page"] = pages[i]
+        if dedup is not None:
+            metadata["simhash"] = format(dedup.hashes[i], "016x")
+        metadatas.append(metadata)
+        ids.append(doc_id)
+    return ids, metadatas
+
+
+async def _astored_simhashes(names: List[str], user_id: str, use_sync_client: bool = False) -> List[int]:
+    """SimHashe chunków, które użytkownik ma już w kolekcjach `names`."""
+    hashes = []
+    for name in names:
+        if use_sync_client:
+            collection = _sync_collection(name, create=False)
+            got = await asyncio.to_thread(collection.get, where={"user_id": user_id},
+                                          include=["metadatas"]) if collection is not None else {}
+        else:
+            collection = await async_store.collection(name, create=False)
+            got = await collection.get(where={"user_id": user_id},
+                                       include=["metadatas"]) if collection is not None else {}
+        hashes.extend(int(m["simhash"], 16) for m in got.get("metadatas") or [] if m and m.get("simhash"))
+    return hashes
+
+
+async def adedupe_chunks(chunks: List[str], user_id: str, names: Optional[List[str]] = None,
+                         use_sync_client: bool = False) -> Optional[DedupResult]:
     """
-    Dodaje listę tekstów (chunków) do ChromaDB wraz z metadanymi,
-    w tym z nazwą pliku.
+    Wykrywa prawie-duplikaty chunków przed embedowaniem (None, gdy filtr jest wyłączony).
+    Przy CHUNK_DEDUP_SCOPE=user pomijane są też chunki zapisane wcześniej w `names`.
+    """
+    if not CHUNK_DEDUP_ENABLED:
+        return None
+    known = []
+    if CHUNK_DEDUP_SCOPE == "user" and names:
+        known = await _astored_simhashes(names, user_id, use_sync_client)
+    return await asyncio.to_thread(find_near_duplicates, chunks, known_hashes=known)
+
+
+async def aupsert_chunks(target: str,
+                        embedder: Embeddings,
+                        chunks: List[str],
+                        ids: List[str],
+                        metadatas: List[Dict[str, Any]],
+                        use_sync_client: bool = False,
+                        **pipeline_options) -> IngestReport:
+    """
+    Embeduje chunki partiami (współbieżnie) i zapisuje je do kolekcji `target`,
+    każdą partię zaraz po wyliczeniu embeddingów. Na końcu aktualizuje centroidy dokumentów.
+    """
+    deltas = CentroidDeltas()
+
+    async def upsert(batch_ids: List[str], vectors: List[List[float]], texts: List[str],
+                     batch_metadatas: List[Dict[str, Any]]) -> None:
+        if use_sync_client:
+            await asyncio.to_thread(_sync_collection(target).upsert, ids=batch_ids, embeddings=vectors,
+                                    documents=texts, metadatas=batch_metadatas)
+        else:
+            collection = await async_store.collection(target)
+            await collection.upsert(ids=batch_ids, embeddings=vectors, documents=texts, metadatas=batch_metadatas)
+        if quantized_index is not None:
+            await asyncio.to_thread(quantized_index.upsert, target, batch_ids, vectors, batch_metadatas)
+        deltas.add(vectors, batch_metadatas)
+
+    report = await embed_and_upsert(
+        texts=chunks,
+        metadatas=metadatas,
+        ids=ids,
+        embedder=embedder,
+        upsert=upsert,
+        **pipeline_options
+    )
+    await _aapply_centroid_deltas(target, deltas, use_sync_client)
+    return report
+
+
+async def _acentroid_call(chunk_collection: str, method: str, use_sync_client: bool = False, **kwargs) -> Any:
+    name = centroid_collection(chunk_collection, collection_name)
+    # Tylko zapis zakłada kolekcję centroidów; odczyt/usuwanie z brakującej to pusty wynik
+    create = method in ("add", "upsert")
+    if use_sync_client:
+        collection = _sync_collection(name, create=create)
+        return await asyncio.to_thread(getattr(collection, method), **kwargs) if collection is not None else {}
+    collection = await async_store.collection(name, create=create)
+    return await getattr(collection, method)(**kwargs) if collection is not None else {}
+
+
+async def _aapply_centroid_deltas(chunk_collection: str, deltas: CentroidDeltas, use_sync_client: bool = False) -> None:
+    """Przelicza przyrostowo centroidy dokumentów, których chunki dodano/usunięto z `chunk_collection`."""
+    if not deltas.documents:
+        return
+    try:
+        ids = [centroid_id(document_id) for document_id in deltas.documents]
+        got = await _acentroid_call(chunk_collection, "get", use_sync_client, ids=ids,
+                                    include=["embeddings", "metadatas"])
+        embeddings_found = got.get("embeddings")
+        stored = {
+            doc_id: (embeddings_found[i] if embeddings_found is not None else None, (got.get("metadatas") or [])[i])
+            for i, doc_id in enumerate(got.get("ids") or [])
+        }
+
+        upserts: List[Tuple[str, List[float], Dict[str, Any]]] = []
+        deletes: List[str] = []
+        for document_id, delta in deltas.documents.items():
+            vector, meta = stored.get(centroid_id(document_id), (None, None))
+            updated = apply_delta(document_id, vector, meta, delta)
+            if updated is None:
+                deletes.append(centroid_id(document_id))
+            else:
+                upserts.append((centroid_id(document_id), *updated))
+
+        if upserts:
+            await _acentroid_call(
+                chunk_collection, "upsert", use_sync_client,
+                ids=[row[0] for row in upserts],
+                embeddings=[row[1] for row in upserts],
+                documents=[row[2]["document_id"] for row in upserts],
+                metadatas=[row[2] for row in upserts],
+            )
+        if deletes:
+            await _acentroid_call(chunk_collection, "delete", use_sync_client, ids=deletes)
+    except Exception as e:
+        # Centroidy są pomocnicze - błąd nie może przerwać zapisu chunków (naprawia je `backfill`)
+        logger.warning(f"Document centroid update failed for '{chunk_collection}': {e}")
+
+
+async def acreate_vector_store(chunks: List[str],
+                               user_id: str,
+                               document_id: str,
+                               pages: Optional[List[int]] = None,
+                               embedder: Optional[Embeddings] = None,
+                               use_sync_client: bool = False,
+                               replace_ids: Optional[Iterable[str]] = None) -> Optional[IngestReport]:
+    """
+    Dodaje listę tekstów (chunków) dokumentu `document_id` (WorkspaceDocument) do ChromaDB.
+    `pages` to opcjonalny numer strony każdego chunku. Chunki są embedowane partiami,
+    współbieżnie, a każda partia trafia do Chroma zaraz po wyliczeniu embeddingów.
+
+    `replace_ids` to ID wektorów zapisanych wcześniej dla dokumentu (DocumentSection.vector_id).
+    Chunki o niezmienionym ID nie są ponownie embedowane, a pozostałe stare ID są usuwane.
+    `report.chunk_ids` mapuje indeks chunku na ID jego wektora (tylko dla chunków, których wektor jest zapisany).
     """
     if not chunks:
         logger.warning("No chunks provided. Nothing to add to vector store.")
-        return
+        return None
 
     try:
-        metadatas = []
-        ids = []
-        for i, chunk in enumerate(chunks):
-            doc_id = generate_unique_id(user_id)
-            meta = {
-                "user_id": user_id,
-                # WAŻNE: Dodajemy nazwę pliku do metadanych każdego wektora
-                "file_name": file_name,
-                "file_description": file_description,
-                "category": category,
-                "chunk_index": i,
-                "doc_id": doc_id
-            }
-            metadatas.append(meta)
-            ids.append(doc_id)
-
-        client.add_texts(
-            texts=chunks,
-            metadatas=metadatas,
-            ids=ids
-        )
-        logger.info(f"Added {len(chunks)} documents to ChromaDB for user_id: {user_id}, file: {file_name}")
+        active, building = await generations.acurrent()
+        previous = set(replace_ids or ())
+        dedup = await adedupe_chunks(chunks, user_id, _read_names(collection_name, user_id, active), use_sync_client)
+        if dedup is not None and previous:
+            # Chunk już zapisany dla tego pliku nie jest duplikatem "czegoś zapisanego wcześniej"
+            for i, kept in list(dedup.duplicate_of.items()):
+                if kept == -1 and chunk_vector_id(user_id, document_id, i, chunks[i]) in previous:
+                    del dedup.duplicate_of[i]
+                    dedup.kept.append(i)
+            dedup.kept.sort()
+        all_ids, all_metadatas = _chunk_metadatas(chunks, user_id, document_id, pages, dedup)
+        indices = dedup.kept if dedup is not None else list(range(len(chunks)))
+
+        pending = [n for n, doc_id in enumerate(all_ids) if doc_id not in previous]
+        ids = [all_ids[n] for n in pending]
+        metadatas = [all_metadatas[n] for n in pending]
+        texts = [chunks[indices[n]] for n in pending]
+
+        target = rag_collection_for(user_id, active)
+        report = await aupsert_chunks(target, embedder or embeddings_for(active), texts, ids, metadatas,
+                                      use_sync_client=use_sync_client)
+        # Chunk z nieudanej partii nie dostaje ID - przy następnym wgraniu zostanie zaembedowany ponownie
+        stored = previous | set(report.stored_ids)
+        report.chunk_ids = {i: doc_id for i, doc_id in zip(indices, all_ids) if doc_id in stored}
+        if dedup is not None:
+            report.duplicate_of = dedup.duplicate_of
+        logger.info(f"Vector ingest for user_id: {user_id}, document: {document_id} -> '{target}': {report.summary()}"
+                    + (f", unchanged: {len(all_ids) - len(ids)}" if previous else ""))
+        if report.failed_batches:
+            logger.error(f"Failed to add batches {report.failed_batches} to ChromaDB for document: {document_id}")
+
+        if building is not None:
+            # Trwa reindeksacja - budowana generacja też musi dostać nowy plik
+            shadow = rag_collection_for(user_id, building)
+            shadow_report = await aupsert_chunks(shadow, embeddings_for(building), texts, ids, metadatas,
+                                                 use_sync_client=use_sync_client)
+            logger.info(f"Dual-write of document: {document_id} -> '{shadow}': {shadow_report.summary()}")
+
+        stale = list(previous - set(all_ids))
+        if stale:
+            await adelete_vectors(user_id, stale, use_sync_client=use_sync_client)
+
+        if embedding_cache is not None:
+            logger.info(f"Embedding cache stats: {embedding_cache.stats()}")
+        return report
     except Exception as e:
         logger.error(f"Error adding documents to ChromaDB: {e}", exc_info=True)
+        return None
+    finally:
+        # Także po błędzie - część partii mogła już zostać zapisana
+        await abump_corpus_version(user_id)
 
 
-def search_vector_store(query: str, user_id: str, n_results: int = 5) -> List[Dict[str, Any]]:
+def create_vector_store(chunks: List[str],
+                        user_id: str,
+                        document_id: str,
+                        pages: Optional[List[int]] = None) -> Optional[IngestReport]:
+    """
+    Synchroniczna wersja `acreate_vector_store` (do użycia poza pętlą zdarzeń).
+    Zapisuje przez klienta synchronicznego - klient async jest związany z pętlą serwera.
+    """
+    return asyncio.run(acreate_vector_store(
+        chunks=chunks,
+        user_id=user_id,
+        document_id=document_id,
+        pages=pages,
+        use_sync_client=True
+    ))
+
+
+def embed_query(query: str) -> List[float]:
+    """
+    Zwraca embedding zapytania. Ten sam tekst jest embedowany tylko raz
+    w obrębie żądania (i ponownie używany między żądaniami dzięki cache TTL).
+    """
+    return embeddings_for(generations.current()[0]).embed_query(query)
+
+
+async def aembed_query(query: str) -> List[float]:
+    """Asynchroniczna wersja `embed_query`."""
+    active, _ = await generations.acurrent()
+    return await embeddings_for(active).aembed_query(query)
+
+
+def _stored_count(got: Dict[str, Any]) -> int:
+    return len(got.get("ids") or [])
+
+
+def _codes_cover(name: str, user_id: str) -> bool:
+    """Czy skwantyzowane kody obejmują wszystkie wektory użytkownika w kolekcji `name`."""
+    covered = quantized_index.coverage(name, user_id)
+    if covered is None:
+        collection = _sync_collection(name, create=False)
+        stored = _stored_count(collection.get(where={"user_id": user_id}, include=[])) if collection is not None else 0
+        covered = quantized_index.record_coverage(name, user_id, stored)
+    return covered
+
+
+def _quantized_search(names: List[str], user_id: str, vector: List[float],
+                      n_results: int) -> Optional[List[Dict[str, Any]]]:
+    """
+    Wstępne wyszukiwanie po skwantyzowanych kodach i przeliczenie odległości kandydatów
+    na pełnych wektorach z Chroma. Zwraca None, gdy kwantyzacja jest wyłączona, użytkownik
+    nie ma jeszcze kodów albo kody nie obejmują wszystkich jego wektorów (np. sprzed
+    backfillu lub zapisanych na innym hoście) - wtedy pytamy Chroma bezpośrednio.
+    """
+    if quantized_index is None:
+        return None
+    candidates = quantized_index.candidates(names, user_id, vector, n_results * VECTOR_RESCORE_FACTOR)
+    if not candidates or not all(_codes_cover(name, user_id) for name in names):
+        return None
+    rows = []
+    for name, ids in candidates.items():
+        collection = _sync_collection(name, create=False)
+        if collection is not None:
+            rows.extend(rescore_rows(vector, collection.get(ids=ids, include=["embeddings", "documents", "metadatas"])))
+    return rows
+
+
+def _documents_filter(user_id: str, document_ids: List[str]) -> Dict[str, Any]:
+    return {"$and": [{"user_id": {"$eq": user_id}}, {"document_id": {"$in": document_ids}}]}
+
+
+def _top_document_ids(rows: List[Dict[str, Any]]) -> Optional[List[str]]:
+    """Najbliższe dokumenty (etap 1) lub None, gdy użytkownik ma za mało dokumentów na dwa etapy."""
+    merged = _merge_query_rows(rows, VECTOR_TWO_STAGE_MIN_DOCUMENTS)
+    if len(merged) < VECTOR_TWO_STAGE_MIN_DOCUMENTS:
+        return None
+    return [row["metadata"]["document_id"] for row in merged[:VECTOR_TWO_STAGE_TOP_DOCUMENTS]]
+
+
+def _two_stage_applies(scope: Optional[DocumentScope]) -> bool:
+    """Etap 1 ma sens tylko wtedy, gdy zakres filtrów nie jest już węższy niż wynik etapu 1."""
+    return VECTOR_TWO_STAGE_ENABLED and (scope is None or len(scope.document_ids) > VECTOR_TWO_STAGE_TOP_DOCUMENTS)
+
+
+def _centroid_where(user_id: str, scope: Optional[DocumentScope]) -> Dict[str, Any]:
+    return _documents_filter(user_id, list(scope.document_ids)) if scope is not None else {"user_id": user_id}
+
+
+def _top_documents(names: List[str], user_id: str, vector: List[float],
+                   scope: Optional[DocumentScope] = None) -> Optional[List[str]]:
+    """Etap 1 wyszukiwania dwuetapowego: zapytanie do centroidów dokumentów użytkownika (w zakresie `scope`)."""
+    rows = []
+    for name in names:
+        collection = _sync_collection(centroid_collection(name, collection_name), create=False)
+        if collection is None:
+            continue
+        rows.extend(_query_rows(collection.query(
+            query_embeddings=[vector],
+            n_results=VECTOR_TWO_STAGE_MIN_DOCUMENTS,
+            where=_centroid_where(user_id, scope),
+            include=["metadatas", "distances"]
+        )))
+    return _top_document_ids(rows)
+
+
+def _output_rows(rows: List[Dict[str, Any]], include_embeddings: bool) -> List[Dict[str, Any]]:
+    output = []
+    for row in rows:
+        item = {"id": row["id"], "content": row["content"], "metadata": row["metadata"], "score": row["score"]}
+        if include_embeddings and row.get("embedding") is not None:
+            item["embedding"] = row["embedding"]
+        output.append(item)
+    return output
+
+
+def search_vector_store(query: str,
+                        user_id: str,
+                        n_results: int = 5,
+                        query_embedding: Optional[List[float]] = None,
+                        include_embeddings: bool = False,
+                        scope: Optional[DocumentScope] = None) -> List[Dict[str, Any]]:
     """
     Wykonuje wyszukiwanie wektorowe w Chroma, zwraca listę słowników.
+    Jeśli podano `query_embedding`, zapytanie nie jest ponownie embedowane.
+    `include_embeddings` dodaje do wyników zapisane wektory chunków (klucz `embedding`).
+    `scope` (retrieval_filters.py) zawęża wyszukiwanie w samym zapytaniu do Chroma.
     """
     if not query.strip():
         logger.warning("Empty query provided to search_vector_store.")
         return []
+    if scope is not None and scope.is_empty():
+        return []
 
     try:
-        results = client.similarity_search_with_score(
-            query=query,
-            k=n_results,
-            filter={"user_id": user_id}
-        )
-        output = []
-        for doc, score in results:
-            output.append({
-                "content": doc.page_content,
-                "metadata": doc.metadata,
-                "score": score
-            })
+        vector = query_embedding or embed_query(query)
+        names = _read_names(collection_name, user_id, generations.current()[0])
+        where = chroma_where(user_id, scope)
+        rows = None
+        documents = _top_documents(names, user_id, vector, scope) if _two_stage_applies(scope) else None
+        if documents:
+            where = _documents_filter(user_id, documents)
+        elif scope is None:
+            # Kody skwantyzowane nie mają metadanych - przy filtrach pytamy Chroma bezpośrednio
+            rows = _quantized_search(names, user_id, vector, n_results)
+        if rows is None:
+            rows = []
+            for collection in _existing_collections(names):
+                rows.extend(_query_rows(collection.query(
+                    query_embeddings=[vector],
+                    n_results=n_results,
+                    where=where,
+                    include=["documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else [])
+                )))
+        output = _output_rows(_merge_query_rows(rows, n_results), include_embeddings)
+        hydrate_metadatas([row["metadata"] for row in output])
 
         logger.info(f"Found {len(output)} results for query: '{query}', user_id: {user_id}")
         return output
@@ -151,48 +649,149 @@ def search_vector_store(query: str, user_id: str, n_results: int = 5) -> List[Di
         return []
 
 
+def _file_filter(user_id: str, file_name: Optional[str] = None, document_id: Optional[str] = None) -> Dict[str, Any]:
+    """Filtr wektorów jednego dokumentu: po `document_id` lub (wektory sprzed rejestru dokumentów) `file_name`."""
+    sources = [{key: {"$eq": value}} for key, value in (("document_id", document_id), ("file_name", file_name)) if value]
+    if not sources:
+        # Bez klucza nie da się wskazać dokumentu - nie usuwamy "czegokolwiek" użytkownika
+        raise ValueError("_file_filter needs a document_id or a file_name")
+    return {
+        "$and": [
+            {"user_id": {"$eq": user_id}},
+            sources[0] if len(sources) == 1 else {"$or": sources}
+        ]
+    }
+
+
+async def adelete_vectors(user_id: str, ids: List[str], use_sync_client: bool = False) -> None:
+    """Usuwa wektory dokumentów o dokładnie tych ID (bez filtrowania całej kolekcji po metadanych)."""
+    for name in _delete_names(collection_name, user_id, *(await generations.acurrent())):
+        deltas = CentroidDeltas()
+        if use_sync_client:
+            collection = _sync_collection(name, create=False)
+            if collection is None:
+                continue
+            got = await asyncio.to_thread(collection.get, ids=ids, include=["embeddings", "metadatas"])
+            await asyncio.to_thread(collection.delete, ids=ids)
+        else:
+            collection = await async_store.collection(name, create=False)
+            if collection is None:
+                continue
+            got = await collection.get(ids=ids, include=["embeddings", "metadatas"])
+            await collection.delete(ids=ids)
+        if got.get("embeddings") is not None:
+            deltas.remove(got["embeddings"], got.get("metadatas") or [])
+        await _aapply_centroid_deltas(name, deltas, use_sync_client)
+        if quantized_index is not None:
+            await asyncio.to_thread(quantized_index.delete, name, user_id=user_id, ids=ids)
+    await abump_corpus_version(user_id)
+    logger.info(f"Deleted {len(ids)} vectors by id for user_id={user_id}")
+
+
 # POPRAWKA: Całkowicie zmieniona implementacja funkcji usuwającej
-def delete_file_from_vector_store(user_id: str, file_name: str) -> bool:
+def delete_file_from_vector_store(user_id: str, file_name: Optional[str] = None,
+                                  document_id: Optional[str] = None) -> bool:
     """
-    Usuwa wektory z ChromaDB na podstawie user_id i file_name,
-    używając poprawnego filtra z operatorem $and.
+    Usuwa wektory z ChromaDB na podstawie user_id i document_id (lub file_name
+    dla wektorów zapisanych przed rejestrem dokumentów), filtrem z operatorem $and.
     """
     try:
-        client.delete(
-            where={
-                "$and": [
-                    {"user_id": {"$eq": user_id}},
-                    {"file_name": {"$eq": file_name}}
-                ]
-            }
-        )
-        logger.info(f"Deletion request sent for documents from ChromaDB for user_id={user_id}, file_name={file_name}")
+        for name in _delete_names(collection_name, user_id, *generations.current()):
+            collection = _sync_collection(name, create=False)
+            if collection is None:
+                continue
+            collection.delete(where=_file_filter(user_id, file_name, document_id))
+            centroids = _sync_collection(centroid_collection(name, collection_name), create=False)
+            if document_id and centroids is not None:
+                centroids.delete(ids=[centroid_id(document_id)])
+            if quantized_index is not None:
+                for source in filter(None, (document_id, file_name)):
+                    quantized_index.delete(name, user_id=user_id, source_key=source)
+        logger.info(f"Deletion request sent for documents from ChromaDB for user_id={user_id}, "
+                    f"document_id={document_id}, file_name={file_name}")
         return True
     except Exception as e:
         # Ten błąd może wystąpić, jeśli składnia filtra jest nieprawidłowa lub ChromaDB ma problem.
         logger.error(f"Error deleting documents from ChromaDB: {e}", exc_info=True)
         return False
+    finally:
+        bump_corpus_version(user_id)
+
+
+def _new_memory(user_id: str, importance: float) -> Tuple[str, Dict[str, Any]]:
+    now = datetime.now().isoformat()
+    return f"mem_{user_id}_{uuid.uuid4()}", {
+        "user_id": user_id,
+        "type": "memory",
+        "importance": importance,
+        "created_at": now,
+        "last_accessed": now
+    }
+
+
+# Dystans L2 (znormalizowane wektory: d = 2 - 2 * cos), poniżej którego wspomnienie uznajemy za to samo
+_MEMORY_MATCH_DISTANCE = 2 * (1 - MEMORY_DEDUP_MIN_SIMILARITY)
+
+
+def _reinforced_memory(metadata: Dict[str, Any], importance: float) -> Dict[str, Any]:
+    """Metadane istniejącego wspomnienia po ponownym wystąpieniu tego samego faktu."""
+    updated = dict(metadata)
+    updated["importance"] = min(1.0, max(metadata.get("importance", 0.0), importance) + MEMORY_IMPORTANCE_BUMP)
+    updated["last_accessed"] = datetime.now().isoformat()
+    updated["mentions"] = metadata.get("mentions", 1) + 1
+    return updated
+
+
+def _similar_memory(rows: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if rows and rows[0]["score"] <= _MEMORY_MATCH_DISTANCE:
+        return rows[0]
+    return None
+
+
+def update_memories(user_id: str, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+    """Aktualizuje metadane wspomnień we wszystkich kolekcjach użytkownika."""
+    for name in _delete_names(memory_collection_name, user_id, *generations.current()):
+        try:
+            for collection in _existing_collections([name]):
+                collection.update(ids=ids, metadatas=metadatas)
+        except Exception as e:
+            logger.debug(f"Memory update skipped in '{name}': {e}")
+    memory_index.record_updated(user_id, ids, metadatas)
 
 
 def add_user_memory(user_id: str, text: str, importance: float = 0.5) -> str:
     """
     Dodaje pojedynczy fakt do pamięci długoterminowej użytkownika.
+    Jeśli niemal identyczne wspomnienie już istnieje, podbija jego ważność
+    i `last_accessed` zamiast dodawać duplikat.
     """
     try:
-        doc_id = f"mem_{user_id}_{uuid.uuid4()}"
-        meta = {
-            "user_id": user_id,
-            "type": "memory",
-            "importance": importance,
-            "created_at": datetime.now().isoformat(),
-            "last_accessed": datetime.now().isoformat()
-        }
+        active, building = generations.current()
+        vectors = embeddings_for(active.for_memories()).embed_documents([text])
 
-        memory_client.add_texts(
-            texts=[text],
-            metadatas=[meta],
-            ids=[doc_id]
+        rows = []
+        for collection in _existing_collections(_read_names(memory_collection_name, user_id, active)):
+            rows.extend(_query_rows(collection.query(
+                query_embeddings=vectors, n_results=1, where={"user_id": user_id}
+            )))
+        match = _similar_memory(_merge_query_rows(rows, 1))
+        if match is not None:
+            update_memories(user_id, [match["id"]], [_reinforced_memory(match["metadata"], importance)])
+            logger.info(f"Memory reinforced for user {user_id}: '{match['content'][:30]}...'")
+            return match["id"]
+
+        doc_id, meta = _new_memory(user_id, importance)
+        _sync_collection(memory_collection_for(user_id, active)).add(
+            ids=[doc_id], embeddings=vectors, documents=[text], metadatas=[meta]
         )
+        if building is not None:
+            _sync_collection(memory_collection_for(user_id, building)).add(
+                ids=[doc_id],
+                embeddings=embeddings_for(building.for_memories()).embed_documents([text]),
+                documents=[text],
+                metadatas=[meta]
+            )
+        memory_index.record_added(user_id, doc_id, meta)
         logger.info(f"Memory added for user {user_id}: '{text[:30]}...'")
         return doc_id
     except Exception as e:
@@ -200,24 +799,34 @@ def add_user_memory(user_id: str, text: str, importance: float = 0.5) -> str:
         return ""
 
 
-def search_user_memories(query: str, user_id: str, n_results: int = 5, min_importance: float = 0.0) -> List[str]:
+def search_user_memories(query: str,
+                         user_id: str,
+                         n_results: int = 5,
+                         min_importance: float = 0.0,
+                         query_embedding: Optional[List[float]] = None) -> List[str]:
     """
     Wyszukuje semantycznie pasujące wspomnienia użytkownika.
     Zwraca listę samych tekstów (faktów).
+    `query_embedding` musi pochodzić z modelu wspomnień (MEMORY_EMBEDDING_MODEL).
     """
     try:
+        active = generations.current()[0]
+        vector = query_embedding or embeddings_for(active.for_memories()).embed_query(query)
+        rows = []
         # Filtrujemy po user_id i opcjonalnie po ważności
-        results = memory_client.similarity_search_with_score(
-            query=query,
-            k=n_results,
-            filter={"user_id": user_id}
-        )
+        for collection in _existing_collections(_read_names(memory_collection_name, user_id, active)):
+            rows.extend(_query_rows(collection.query(
+                query_embeddings=[vector],
+                n_results=n_results,
+                where={"user_id": user_id},
+                include=["documents", "metadatas", "distances"]
+            )))
 
         memories = []
-        for doc, score in results:
+        for row in _merge_query_rows(rows, n_results):
             # Próg podobieństwa (OpenAI Large: dystans cosinusowy, im mniejszy tym lepiej)
-            if doc.metadata.get("importance", 0) >= min_importance:
-                memories.append(doc.page_content)
+            if row["metadata"].get("importance", 0) >= min_importance:
+                memories.append(row["content"])
 
         logger.info(f"Retrieved {len(memories)} relevant memories for user {user_id}")
         return memories
@@ -229,9 +838,253 @@ def search_user_memories(query: str, user_id: str, n_results: int = 5, min_impor
 def delete_all_user_memories(user_id: str) -> bool:
     """Czyści całą pamięć danego użytkownika (np. na jego prośbę)."""
     try:
-        memory_client.delete(where={"user_id": user_id})
+        for collection in _existing_collections(_delete_names(memory_collection_name, user_id, *generations.current())):
+            collection.delete(where={"user_id": user_id})
+        memory_index.record_cleared(user_id)
         logger.info(f"All memories deleted for user_id={user_id}")
         return True
     except Exception as e:
         logger.error(f"Error deleting memories: {e}", exc_info=True)
-        return False
\ No newline at end of file
+        return False
+
+
+# =============================================================================
+# ASYNC API (dla endpointów i agenta - wywołania Chroma nie blokują pętli zdarzeń)
+# =============================================================================
+
+async def _aquery_partitions(names: List[str], user_id: str, vector: List[float],
+                             n_results: int, where: Optional[Dict[str, Any]] = None,
+                             include_embeddings: bool = False) -> List[Dict[str, Any]]:
+    """Zapytanie do wszystkich kolekcji użytkownika (równolegle przy dual-read)."""
+    async def query_one(name: str) -> List[Dict[str, Any]]:
+        collection = await async_store.collection(name, create=False)
+        if collection is None:
+            return []
+        return _query_rows(await collection.query(
+            query_embeddings=[vector],
+            n_results=n_results,
+            where=where or {"user_id": user_id},
+            include=["documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else [])
+        ))
+
+    results = await asyncio.gather(*(query_one(n) for n in names))
+    return _merge_query_rows([row for rows in results for row in rows], n_results)
+
+
+async def _atop_documents(names: List[str], user_id: str, vector: List[float],
+                          scope: Optional[DocumentScope] = None) -> Optional[List[str]]:
+    """Asynchroniczna wersja `_top_documents`."""
+    async def query_one(name: str) -> List[Dict[str, Any]]:
+        return _query_rows(await _acentroid_call(
+            name, "query",
+            query_embeddings=[vector],
+            n_results=VECTOR_TWO_STAGE_MIN_DOCUMENTS,
+            where=_centroid_where(user_id, scope),
+            include=["metadatas", "distances"]
+        ))
+
+    results = await asyncio.gather(*(query_one(n) for n in names))
+    return _top_document_ids([row for rows in results for row in rows])
+
+
+async def _acodes_cover(name: str, user_id: str) -> bool:
+    """Asynchroniczna wersja `_codes_cover`."""
+    covered = await asyncio.to_thread(quantized_index.coverage, name, user_id)
+    if covered is None:
+        collection = await async_store.collection(name, create=False)
+        stored = _stored_count(await collection.get(where={"user_id": user_id}, include=[])) if collection else 0
+        covered = await asyncio.to_thread(quantized_index.record_coverage, name, user_id, stored)
+    return covered
+
+
+async def _aquantized_search(names: List[str], user_id: str, vector: List[float],
+                             n_results: int) -> Optional[List[Dict[str, Any]]]:
+    """Asynchroniczna wersja `_quantized_search`."""
+    if quantized_index is None:
+        return None
+    candidates = await asyncio.to_thread(
+        quantized_index.candidates, names, user_id, vector, n_results * VECTOR_RESCORE_FACTOR
+    )
+    if not candidates:
+        return None
+    for name in names:
+        if not await _acodes_cover(name, user_id):
+            return None
+    rows = []
+    for name, ids in candidates.items():
+        collection = await async_store.collection(name, create=False)
+        if collection is not None:
+            got = await collection.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+            rows.extend(rescore_rows(vector, got))
+    return _merge_query_rows(rows, n_results)
+
+
+async def asearch_vector_store(query: str,
+                               user_id: str,
+                               n_results: int = 5,
+                               query_embedding: Optional[List[float]] = None,
+                               include_embeddings: bool = False,
+                               scope: Optional[DocumentScope] = None) -> List[Dict[str, Any]]:
+    """Asynchroniczna wersja `search_vector_store`."""
+    if not query.strip():
+        logger.warning("Empty query provided to asearch_vector_store.")
+        return []
+    if scope is not None and scope.is_empty():
+        return []
+
+    try:
+        vector = query_embedding or await aembed_query(query)
+        active, _ = await generations.acurrent()
+        names = _read_names(collection_name, user_id, active)
+        documents = await _atop_documents(names, user_id, vector, scope) if _two_stage_applies(scope) else None
+        if documents:
+            rows = await _aquery_partitions(names, user_id, vector, n_results, _documents_filter(user_id, documents),
+                                            include_embeddings)
+        else:
+            rows = await _aquantized_search(names, user_id, vector, n_results) if scope is None else None
+            if rows is None:
+                rows = await _aquery_partitions(names, user_id, vector, n_results, chroma_where(user_id, scope),
+                                                include_embeddings=include_embeddings)
+        output = _output_rows(rows, include_embeddings)
+        await ahydrate_metadatas([row["metadata"] for row in output])
+        logger.info(f"Found {len(output)} results for query: '{query}', user_id: {user_id}")
+        return output
+    except Exception as e:
+        logger.error(f"Error querying vector store: {e}", exc_info=True)
+        return []
+
+
+async def adelete_file_from_collection(name: str, user_id: str, file_name: Optional[str] = None,
+                                      document_id: Optional[str] = None) -> None:
+    """Usuwa wektory dokumentu z jednej (fizycznej) kolekcji."""
+    collection = await async_store.collection(name, create=False)
+    if collection is None:
+        return
+    await collection.delete(where=_file_filter(user_id, file_name, document_id))
+    if document_id:
+        await _acentroid_call(name, "delete", ids=[centroid_id(document_id)])
+    if quantized_index is not None:
+        for source in filter(None, (document_id, file_name)):
+            await asyncio.to_thread(quantized_index.delete, name, user_id=user_id, source_key=source)
+
+
+async def adelete_file_from_vector_store(user_id: str, file_name: Optional[str] = None,
+                                         document_id: Optional[str] = None) -> bool:
+    """Asynchroniczna wersja `delete_file_from_vector_store`."""
+    try:
+        for name in _delete_names(collection_name, user_id, *(await generations.acurrent())):
+            await adelete_file_from_collection(name, user_id, file_name, document_id)
+        logger.info(f"Deletion request sent for documents from ChromaDB for user_id={user_id}, "
+                    f"document_id={document_id}, file_name={file_name}")
+        return True
+    except Exception as e:
+        logger.error(f"Error deleting documents from ChromaDB: {e}", exc_info=True)
+        return False
+    finally:
+        await abump_corpus_version(user_id)
+
+
+async def aupdate_memories(user_id: str, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+    """Asynchroniczna wersja `update_memories`."""
+    for name in _delete_names(memory_collection_name, user_id, *(await generations.acurrent())):
+        try:
+            collection = await async_store.collection(name, create=False)
+            if collection is not None:
+                await collection.update(ids=ids, metadatas=metadatas)
+        except Exception as e:
+            logger.debug(f"Memory update skipped in '{name}': {e}")
+    await asyncio.to_thread(memory_index.record_updated, user_id, ids, metadatas)
+
+
+async def aadd_user_memory(user_id: str, text: str, importance: float = 0.5) -> str:
+    """Asynchroniczna wersja `add_user_memory`."""
+    try:
+        active, building = await generations.acurrent()
+        vectors = await embeddings_for(active.for_memories()).aembed_documents([text])
+
+        rows = await _aquery_partitions(_read_names(memory_collection_name, user_id, active), user_id, vectors[0], 1)
+        match = _similar_memory(rows)
+        if match is not None:
+            await aupdate_memories(user_id, [match["id"]], [_reinforced_memory(match["metadata"], importance)])
+            logger.info(f"Memory reinforced for user {user_id}: '{match['content'][:30]}...'")
+            return match["id"]
+
+        doc_id, meta = _new_memory(user_id, importance)
+        collection = await async_store.collection(memory_collection_for(user_id, active))
+        await collection.add(ids=[doc_id], embeddings=vectors, documents=[text], metadatas=[meta])
+        if building is not None:
+            shadow_vectors = await embeddings_for(building.for_memories()).aembed_documents([text])
+            shadow = await async_store.collection(memory_collection_for(user_id, building))
+            await shadow.add(ids=[doc_id], embeddings=shadow_vectors, documents=[text], metadatas=[meta])
+        await asyncio.to_thread(memory_index.record_added, user_id, doc_id, meta)
+        logger.info(f"Memory added for user {user_id}: '{text[:30]}...'")
+        return doc_id
+    except Exception as e:
+        logger.error(f"Error adding memory: {e}", exc_info=True)
+        return ""
+
+
+async def asearch_user_memories(query: str,
+                                user_id: str,
+                                n_results: int = 5,
+                                min_importance: float = 0.0,
+                                query_embedding: Optional[List[float]] = None) -> List[str]:
+    """Asynchroniczna wersja `search_user_memories`."""
+    try:
+        active, _ = await generations.acurrent()
+        vector = query_embedding or await embeddings_for(active.for_memories()).aembed_query(query)
+        rows = await _aquery_partitions(_read_names(memory_collection_name, user_id, active), user_id, vector, n_results)
+        memories = [row["content"] for row in rows if row["metadata"].get("importance", 0) >= min_importance]
+        logger.info(f"Retrieved {len(memories)} relevant memories for user {user_id}")
+        return memories
+    except Exception as e:
+        logger.error(f"Error searching memories: {e}", exc_info=True)
+        return []
+
+
+async def aget_user_memories(user_id: str,
+                             limit: Optional[int] = None,
+                             include: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Pobiera wspomnienia użytkownika (bez wyszukiwania semantycznego)."""
+    results = []
+    active, _ = await generations.acurrent()
+    for name in _read_names(memory_collection_name, user_id, active):
+        collection = await async_store.collection(name, create=False)
+        if collection is not None:
+            results.append(await collection.get(where={"user_id": user_id}, limit=limit, include=include))
+    return _merge_get_results(results)
+
+
+async def aget_memories_by_ids(user_id: str, ids: List[str], include: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Pobiera wspomnienia użytkownika po ich ID."""
+    results = []
+    active, _ = await generations.acurrent()
+    for name in _read_names(memory_collection_name, user_id, active):
+        collection = await async_store.collection(name, create=False)
+        if collection is not None:
+            results.append(await collection.get(ids=ids, include=include))
+    return _merge_get_results(results)
+
+
+async def adelete_memories(user_id: str, ids: List[str]) -> None:
+    """Usuwa wspomnienia użytkownika po ich ID."""
+    for name in _delete_names(memory_collection_name, user_id, *(await generations.acurrent())):
+        collection = await async_store.collection(name, create=False)
+        if collection is not None:
+            await collection.delete(ids=ids)
+    await asyncio.to_thread(memory_index.record_deleted, user_id, ids)
+
+
+async def adelete_all_user_memories(user_id: str) -> bool:
+    """Asynchroniczna wersja `delete_all_user_memories`."""
+    try:
+        for name in _delete_names(memory_collection_name, user_id, *(await generations.acurrent())):
+            collection = await async_store.collection(name, create=False)
+            if collection is not None:
+                await collection.delete(where={"user_id": user_id})
+        await asyncio.to_thread(memory_index.record_cleared, user_id)
+        logger.info(f"All memories deleted for user_id={user_id}")
+        return True
+    except Exception as e:
+        logger.error(f"Error deleting memories: {e}", exc_info=True)
+        return False
@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+
+from rag.src.async_vector_store import AsyncCollection, AsyncVectorStore, ThreadedAsyncCollection
+
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+        self.rows = {}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.rows.update(zip(ids, documents))
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        return {"ids": list(self.rows), "documents": list(self.rows.values())}
+
+
+class FakeClient:
+    def __init__(self):
+        self.collections = {}
+
+    def get_or_create_collection(self, name, embedding_function=None):
+        return self.collections.setdefault(name, FakeCollection(name))
+
+    def get_collection(self, name, embedding_function=None):
+        if name not in self.collections:
+            raise ValueError(f"Collection {name} does not exist.")
+        return self.collections[name]
+
+
+class TestAsyncVectorStore(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.store = AsyncVectorStore({"mode": "local"}, sync_client=self.client, timeout=5, pool_size=2)
+
+    def test_collection_is_abstract(self):
+        with self.assertRaises(TypeError):
+            AsyncCollection("x", timeout=1)
+
+    def test_store_works_across_event_loops(self):
+        async def write(text):
+            collection = await self.store.collection("docs")
+            await collection.upsert([text], [[0.0]], [text], [{}])
+            return collection
+
+        # Jak CLI, które wywołują asyncio.run kilka razy
+        first = asyncio.run(write("a"))
+        second = asyncio.run(write("b"))
+
+        self.assertIsInstance(second, ThreadedAsyncCollection)
+        self.assertIsNot(first, second)
+        self.assertEqual(self.client.collections["docs"].rows, {"a": "a", "b": "b"})
+
+    def test_handle_is_cached_within_a_loop_until_forgotten(self):
+        async def main():
+            first = await self.store.collection("docs")
+            cached = await self.store.collection("docs")
+            self.store.forget("docs")
+            return first, cached, await self.store.collection("docs")
+
+        first, cached, fresh = asyncio.run(main())
+        self.assertIs(first, cached)
+        self.assertIsNot(first, fresh)
+
+    def test_reads_do_not_create_collections(self):
+        async def main():
+            return await self.store.collection("torched-rag-u-7", create=False)
+
+        self.assertIsNone(asyncio.run(main()))
+        self.assertNotIn("torched-rag-u-7", self.client.collections)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from rag.src.dedup import SimHashIndex, find_near_duplicates, hamming_distance, simhash
+
+
+SLIDE = (
+    "Wykład 3: Algorytmy sortowania. Sortowanie przez scalanie dzieli tablicę na połowy, "
+    "sortuje je rekurencyjnie i scala wyniki w czasie liniowym. Złożoność wynosi O(n log n)."
+)
+
+
+class TestChunkDedup(unittest.TestCase):
+
+    def test_page_numbers_and_whitespace_do_not_change_hash(self):
+        self.assertEqual(simhash(f"Strona 12\n{SLIDE}"), simhash(f"Strona 13   {SLIDE}  "))
+
+    def test_different_text_is_far_apart(self):
+        other = "Drzewa czerwono-czarne utrzymują zrównoważoną wysokość dzięki kolorowaniu węzłów i rotacjom."
+        self.assertGreater(hamming_distance(simhash(SLIDE), simhash(other)), 3)
+
+    def test_keeps_first_of_each_group(self):
+        chunks = [SLIDE, "Zupełnie inny fragment o grafach skierowanych i ich reprezentacji.", f"- 4 -\n{SLIDE}"]
+        result = find_near_duplicates(chunks, max_distance=3)
+        self.assertEqual(result.kept, [0, 1])
+        self.assertEqual(result.duplicate_of, {2: 0})
+        self.assertEqual(result.collapsed, 1)
+
+    def test_chunks_differing_only_in_numbers_are_kept(self):
+        table = "Cennik usług: konsultacja {a} zł, pakiet miesięczny {b} zł, abonament roczny {c} zł. " * 3
+        chunks = [table.format(a=120, b=450, c=4800), table.format(a=150, b=450, c=4800)]
+        result = find_near_duplicates(chunks, max_distance=3)
+        self.assertEqual(result.kept, [0, 1])
+        self.assertEqual(result.duplicate_of, {})
+
+    def test_page_markers_are_ignored_but_other_numbers_are_not(self):
+        self.assertEqual(simhash(f"{SLIDE}\n- 4 -"), simhash(f"{SLIDE}\nSlajd 5/30"))
+        self.assertNotEqual(simhash(SLIDE), simhash(SLIDE.replace("Wykład 3", "Wykład 4")))
+
+    def test_known_hashes_mark_previously_stored_chunks(self):
+        result = find_near_duplicates([SLIDE], known_hashes=[simhash(SLIDE)])
+        self.assertEqual(result.kept, [])
+        self.assertEqual(result.duplicate_of, {0: -1})
+
+    def test_index_finds_hash_within_distance(self):
+        index = SimHashIndex(max_distance=3)
+        index.add(0b1011 << 40, key=7)
+        self.assertEqual(index.find((0b1011 << 40) ^ 0b101), 7)
+        self.assertIsNone(index.find(~(0b1011 << 40) & (2 ** 64 - 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
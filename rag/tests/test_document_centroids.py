@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from rag.src.document_centroids import CentroidDeltas, apply_delta, centroid_collection
+
+
+class TestDocumentCentroids(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vectors = rng.standard_normal((12, 16))
+        self.metadatas = [{"user_id": "7", "document_id": "d1"} for _ in range(12)]
+
+    def test_incremental_updates_match_full_rebuild(self):
+        stored_vector, stored_meta = None, None
+        for batch in (slice(0, 5), slice(5, 12)):
+            deltas = CentroidDeltas()
+            deltas.add(self.vectors[batch], self.metadatas[batch])
+            stored_vector, stored_meta = apply_delta("d1", stored_vector, stored_meta, deltas.documents["d1"])
+
+        deltas = CentroidDeltas()
+        deltas.remove(self.vectors[:3], self.metadatas[:3])
+        stored_vector, stored_meta = apply_delta("d1", stored_vector, stored_meta, deltas.documents["d1"])
+
+        mean = self.vectors[3:].mean(axis=0)
+        self.assertEqual(stored_meta["chunk_count"], 9)
+        self.assertAlmostEqual(stored_meta["norm"], float(np.linalg.norm(mean)), places=5)
+        np.testing.assert_allclose(stored_vector, mean / np.linalg.norm(mean), atol=1e-5)
+
+    def test_removing_all_chunks_drops_centroid(self):
+        deltas = CentroidDeltas()
+        deltas.add(self.vectors[:2], self.metadatas[:2])
+        vector, meta = apply_delta("d1", None, None, deltas.documents["d1"])
+
+        deltas = CentroidDeltas()
+        deltas.remove(self.vectors[:2], self.metadatas[:2])
+        self.assertIsNone(apply_delta("d1", vector, meta, deltas.documents["d1"]))
+
+    def test_vectors_without_document_are_skipped(self):
+        deltas = CentroidDeltas()
+        deltas.add(self.vectors[:2], [{"user_id": "7", "file_name": "a.pdf"}, {}])
+        self.assertEqual(deltas.documents, {})
+
+    def test_centroid_collection_keeps_generation_and_partition(self):
+        self.assertEqual(centroid_collection("torched-rag-g3-u-5", "torched-rag"), "torched-rag-centroids-g3-u-5")
+        self.assertEqual(centroid_collection("torched-rag", "torched-rag"), "torched-rag-centroids")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from rag.src import document_registry
+
+DOCUMENT = {"file_name": "wyklad.pdf", "title": "Wykład", "file_description": "", "category": "Studia"}
+
+
+class TestHydrateMetadatas(unittest.TestCase):
+
+    def test_compact_metadata_gets_document_attributes(self):
+        metadatas = [{"user_id": "7", "document_id": "d1", "chunk_index": 0},
+                     {"user_id": "7", "document_id": "d1", "chunk_index": 1}]
+        with mock.patch.object(document_registry, "load_documents", return_value={"d1": DOCUMENT}) as load:
+            document_registry.hydrate_metadatas(metadatas)
+
+        load.assert_called_once_with({"d1"})
+        self.assertEqual(metadatas[1], {"user_id": "7", "document_id": "d1", "chunk_index": 1, **DOCUMENT})
+
+    def test_legacy_metadata_is_left_as_is(self):
+        legacy = {"user_id": "7", "document_id": "d1", "file_name": "stary.pdf", "category": "General"}
+        metadatas = [dict(legacy), {"user_id": "7", "file_name": "bez-id.pdf"}]
+        with mock.patch.object(document_registry, "load_documents") as load:
+            document_registry.hydrate_metadatas(metadatas)
+
+        load.assert_not_called()
+        self.assertEqual(metadatas[0], legacy)
+
+    def test_unknown_document_and_registry_errors_leave_metadata_compact(self):
+        metadatas = [{"user_id": "7", "document_id": "d2"}]
+        with mock.patch.object(document_registry, "load_documents", return_value={}):
+            document_registry.hydrate_metadatas(metadatas)
+        with mock.patch.object(document_registry, "load_documents", side_effect=RuntimeError("db down")):
+            document_registry.hydrate_metadatas(metadatas)
+        self.assertEqual(metadatas, [{"user_id": "7", "document_id": "d2"}])
+
+    def test_async_version_skips_the_thread_when_nothing_is_missing(self):
+        metadatas = [{"user_id": "7", "document_id": "d1", "file_name": "stary.pdf"}]
+        with mock.patch.object(document_registry, "hydrate_metadatas") as hydrate:
+            asyncio.run(document_registry.ahydrate_metadatas(metadatas))
+        hydrate.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
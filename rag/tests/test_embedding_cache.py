@@ -0,0 +1,98 @@
+import contextvars
+import os
+import tempfile
+import unittest
+
+from rag.src.embedding_cache import (
+    CachedEmbeddings,
+    EmbeddingCache,
+    QueryEmbeddingCache,
+    SQLiteEmbeddingBackend,
+    embedding_cache_key,
+    start_query_embedding_scope,
+)
+
+
+class CountingEmbeddings:
+    """Minimal embedder that records which texts reached the 'API'."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0, 0.5] for t in texts]
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return [float(len(text)), 1.0, 0.5]
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_key_ignores_whitespace_but_not_model(self):
+        self.assertEqual(
+            embedding_cache_key("m", "Ala  ma\nkota "),
+            embedding_cache_key("m", "Ala ma kota")
+        )
+        self.assertNotEqual(
+            embedding_cache_key("m1", "Ala ma kota"),
+            embedding_cache_key("m2", "Ala ma kota")
+        )
+
+    def test_only_misses_are_embedded(self):
+        cache = EmbeddingCache(SQLiteEmbeddingBackend(self.path, max_entries=100))
+        inner = CountingEmbeddings()
+        embeddings = CachedEmbeddings(inner, model_name="test", cache=cache)
+
+        first = embeddings.embed_documents(["a", "bb", "a"])
+        second = embeddings.embed_documents(["bb", "ccc"])
+
+        self.assertEqual(inner.calls, [["a", "bb"], ["ccc"]])
+        self.assertEqual(first[0], first[2])
+        self.assertEqual(second[0], first[1])
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_lru_eviction(self):
+        backend = SQLiteEmbeddingBackend(self.path, max_entries=2)
+        backend.set_many([("k1", [1.0]), ("k2", [2.0])])
+        backend.get_many(["k1"])
+        backend.set_many([("k3", [3.0])])
+
+        self.assertEqual(set(backend.get_many(["k1", "k2", "k3"])), {"k1", "k3"})
+
+    def test_query_embeddings_are_shared_within_request_scope(self):
+        inner = CountingEmbeddings()
+        # TTL cache disabled - only the request scope can deduplicate
+        embeddings = CachedEmbeddings(inner, model_name="test", cache=None,
+                                      query_cache=QueryEmbeddingCache(max_entries=10, ttl_seconds=0))
+
+        def one_request():
+            start_query_embedding_scope()
+            embeddings.embed_query("pytanie")
+            embeddings.embed_query("pytanie")
+
+        contextvars.copy_context().run(one_request)
+        contextvars.copy_context().run(one_request)
+
+        self.assertEqual(inner.calls, [["pytanie"], ["pytanie"]])
+
+    def test_query_ttl_cache_is_bounded(self):
+        cache = QueryEmbeddingCache(max_entries=2, ttl_seconds=60)
+        cache.set("a", [1.0])
+        cache.set("b", [2.0])
+        cache.set("c", [3.0])
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), [3.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from rag.src.embeddings import DynamicBatcher, is_local_model
+
+
+class TestDynamicBatcher(unittest.TestCase):
+
+    def test_concurrent_requests_share_batches_and_keep_order(self):
+        calls = []
+        lock = threading.Lock()
+
+        def encode(texts):
+            with lock:
+                calls.append(len(texts))
+            return [[float(len(t))] for t in texts]
+
+        batcher = DynamicBatcher(encode, max_batch_size=64, max_wait_ms=50)
+        requests = [["a" * i, "b" * (i + 1)] for i in range(1, 9)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda texts: batcher.submit(texts).result(timeout=5), requests))
+
+        for texts, vectors in zip(requests, results):
+            self.assertEqual(vectors, [[float(len(t))] for t in texts])
+        self.assertLess(len(calls), len(requests))
+        self.assertEqual(sum(calls), 16)
+
+    def test_errors_reach_every_caller_of_the_batch(self):
+        def encode(texts):
+            raise ValueError("model failed")
+
+        batcher = DynamicBatcher(encode, max_wait_ms=1)
+        with self.assertRaises(ValueError):
+            batcher.submit(["x"]).result(timeout=5)
+
+    def test_provider_follows_model_name(self):
+        self.assertFalse(is_local_model("text-embedding-3-large"))
+        self.assertTrue(is_local_model("sentence-transformers/all-MiniLM-L6-v2"))
+        self.assertTrue(is_local_model("local:/models/e5-small"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from unittest import mock
+
+from rag.src import graph_store
+from rag.src.graph_store import co_occurrence_rows, graph_rows
+
+
+class TestGraphRows(unittest.TestCase):
+
+    def test_rows_of_a_registered_document(self):
+        rows = graph_rows(
+            ["Kopernik w Toruniu", "", "Kopernik i Galileusz"],
+            [{"names": ["Kopernik"], "locations": "Toruń"}, {"names": ["Pominięty"]},
+             {"names": ["Kopernik", "Galileusz"], "key_terms": []}],
+            "7", "doc-1", "astronomia.pdf",
+        )
+
+        self.assertEqual([c["key"] for c in rows["chunks"]], ["7:doc-1:0", "7:doc-1:2"])
+        self.assertEqual({c["document_id"] for c in rows["chunks"]}, {"doc-1"})
+        self.assertEqual(rows["mentions"], [
+            {"chunk_key": "7:doc-1:0", "name": "Kopernik", "type": "names"},
+            {"chunk_key": "7:doc-1:0", "name": "Toruń", "type": "locations"},
+            {"chunk_key": "7:doc-1:2", "name": "Kopernik", "type": "names"},
+            {"chunk_key": "7:doc-1:2", "name": "Galileusz", "type": "names"},
+        ])
+        # Pary tylko z zapisanych chunków - pusty chunk nie dodaje encji
+        self.assertEqual(rows["co_occurrences"], [{"a": "Galileusz", "b": "Kopernik"},
+                                                  {"a": "Kopernik", "b": "Toruń"}])
+
+    def test_without_document_id_file_name_is_only_the_key(self):
+        rows = graph_rows(["tekst"], [{}], "7", None, "notatki.txt")
+
+        self.assertEqual(rows["chunks"][0]["key"], "7:notatki.txt:0")
+        self.assertIsNone(rows["chunks"][0]["document_id"])
+        self.assertEqual(rows["chunks"][0]["file_name"], "notatki.txt")
+
+
+class TestCoOccurrenceRows(unittest.TestCase):
+
+    def test_pairs_are_unique_and_sorted(self):
+        rows = co_occurrence_rows([
+            {"names": "B, A", "dates": ["1543"]},
+            {"names": ["A", "B"]},
+            None,
+        ])
+        self.assertEqual(rows, [{"a": "1543", "b": "A"}, {"a": "1543", "b": "B"}, {"a": "A", "b": "B"}])
+
+
+class TestGraphSchemaBackoff(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = mock.Mock()
+        self.driver.session.side_effect = ConnectionError("Neo4j unavailable")
+        patches = [
+            mock.patch.object(graph_store, "driver", self.driver),
+            mock.patch.object(graph_store, "_graph_schema_ready", False),
+            mock.patch.object(graph_store, "_graph_schema_failed_at", None),
+            mock.patch.object(graph_store, "GRAPH_SCHEMA_RETRY_INTERVAL", 60.0),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_failure_is_not_retried_until_the_interval_passes(self):
+        with mock.patch.object(graph_store.time, "monotonic", return_value=1000.0):
+            self.assertFalse(graph_store.ensure_graph_schema())
+            self.assertFalse(graph_store.ensure_graph_schema())
+        self.assertEqual(self.driver.session.call_count, 1)
+
+        with mock.patch.object(graph_store.time, "monotonic", return_value=1061.0):
+            self.assertFalse(graph_store.ensure_graph_schema())
+        self.assertEqual(self.driver.session.call_count, 2)
+
+    def test_force_retries_immediately(self):
+        self.assertFalse(graph_store.ensure_graph_schema())
+        self.assertFalse(graph_store.ensure_graph_schema(force=True))
+        self.assertEqual(self.driver.session.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
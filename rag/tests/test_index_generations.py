@@ -0,0 +1,39 @@
+import unittest
+from unittest import mock
+
+from rag.src import index_generations
+from rag.src.index_generations import IndexSettings, settings_from_row
+from rag.src.models import VectorIndexGeneration
+
+
+class TestMemorySettings(unittest.TestCase):
+
+    def test_generation_keeps_its_memory_model_when_config_changes(self):
+        row = VectorIndexGeneration(id=3, embedding_model="text-embedding-3-large", embedding_dimensions=1024,
+                                    memory_embedding_model="text-embedding-3-small",
+                                    memory_embedding_dimensions=512)
+        with mock.patch.object(index_generations, "MEMORY_EMBEDDING_MODEL", "local:e5-small"), \
+                mock.patch.object(index_generations, "MEMORY_EMBEDDING_DIMENSIONS", None):
+            memories = settings_from_row(row).for_memories()
+
+        self.assertEqual((memories.embedding_model, memories.embedding_dimensions), ("text-embedding-3-small", 512))
+        self.assertEqual(memories.collection("user-memories"), "user-memories-g3")
+
+    def test_memory_model_defaults_to_document_model(self):
+        settings = IndexSettings(3, "text-embedding-3-large", 1024)
+        self.assertEqual(settings.for_memories(), settings)
+
+    def test_rows_without_recorded_model_fall_back_to_config(self):
+        row = VectorIndexGeneration(id=3, embedding_model="text-embedding-3-large", embedding_dimensions=None)
+        with mock.patch.object(index_generations, "MEMORY_EMBEDDING_MODEL", "local:e5-small"):
+            self.assertEqual(settings_from_row(row).for_memories().embedding_model, "local:e5-small")
+
+    def test_config_mismatch_is_logged(self):
+        settings = IndexSettings(3, "text-embedding-3-large", None, "text-embedding-3-small", None)
+        with mock.patch.object(index_generations, "MEMORY_EMBEDDING_MODEL", "local:e5-small"), \
+                self.assertLogs(index_generations.logger, "WARNING"):
+            index_generations._warn_on_memory_model_change(settings)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import asyncio
+import unittest
+
+from rag.benchmarks.fakes import FakeEmbedder
+from rag.src.ingest_pipeline import TokenBudget, embed_and_upsert, estimate_tokens, make_batches
+
+
+class FlakyEmbedder(FakeEmbedder):
+    """Fails the first `failures` calls for texts containing `marker`."""
+
+    def __init__(self, marker: str, failures: int):
+        super().__init__(dimensions=8)
+        self.marker = marker
+        self.failures = failures
+
+    async def aembed_documents(self, texts):
+        if any(self.marker in t for t in texts) and self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("rate limited")
+        return await super().aembed_documents(texts)
+
+
+class TestMakeBatches(unittest.TestCase):
+
+    def test_batches_are_bounded_by_count(self):
+        self.assertEqual(make_batches(["a"] * 5, batch_size=2, max_batch_tokens=1000), [[0, 1], [2, 3], [4]])
+
+    def test_batches_are_bounded_by_estimated_tokens(self):
+        texts = ["x" * 40, "x" * 40, "x" * 40]  # ~11 tokenów każdy
+        self.assertEqual(make_batches(texts, batch_size=10, max_batch_tokens=25), [[0, 1], [2]])
+
+    def test_oversized_text_gets_its_own_batch(self):
+        texts = ["a", "x" * 400, "b"]
+        self.assertGreater(estimate_tokens(texts[1]), 50)
+        self.assertEqual(make_batches(texts, batch_size=10, max_batch_tokens=50), [[0], [1], [2]])
+
+
+class TestTokenBudget(unittest.TestCase):
+
+    def test_in_flight_tokens_never_exceed_budget(self):
+        budget = TokenBudget(max_tokens=10)
+        peak = {"now": 0, "max": 0}
+
+        async def work(tokens):
+            await budget.acquire(tokens)
+            # Partia większa niż budżet przechodzi sama, liczona jako cały budżet
+            counted = min(tokens, budget.max_tokens)
+            peak["now"] += counted
+            peak["max"] = max(peak["max"], peak["now"])
+            await asyncio.sleep(0.01)
+            peak["now"] -= counted
+            await budget.release(tokens)
+
+        async def main():
+            await asyncio.gather(*(work(6) for _ in range(4)), work(50))
+
+        asyncio.run(main())
+        self.assertEqual(peak["max"], 10)
+        self.assertEqual(peak["now"], 0)
+
+
+class TestEmbedAndUpsert(unittest.TestCase):
+
+    def run_pipeline(self, texts, embedder, max_retries=3):
+        stored = {}
+
+        async def upsert(ids, vectors, batch_texts, metadatas):
+            stored.update(zip(ids, batch_texts))
+
+        report = asyncio.run(embed_and_upsert(
+            texts, [{} for _ in texts], [f"id-{i}" for i in range(len(texts))], embedder, upsert,
+            batch_size=2, max_batch_tokens=1000, max_concurrency=2, max_tokens_in_flight=1000,
+            max_retries=max_retries, retry_backoff=0.0,
+        ))
+        return report, stored
+
+    def test_failing_batch_is_retried(self):
+        report, stored = self.run_pipeline(["a", "b", "boom", "c"], FlakyEmbedder("boom", failures=1))
+
+        self.assertEqual(report.failed_batches, [])
+        self.assertEqual(len(stored), 4)
+        self.assertEqual([b.attempts for b in report.batches], [1, 2])
+
+    def test_batch_failing_every_attempt_is_reported(self):
+        report, stored = self.run_pipeline(["a", "b", "boom", "c"], FlakyEmbedder("boom", failures=99),
+                                           max_retries=2)
+
+        self.assertEqual(report.failed_batches, [1])
+        self.assertEqual(report.batches[1].attempts, 2)
+        self.assertIn("rate limited", report.batches[1].error)
+        self.assertEqual(sorted(stored), ["id-0", "id-1"])
+        self.assertEqual(report.embedded_chunks, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from datetime import datetime, timedelta
+
+from rag.src.memory_compaction import plan_compaction
+
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+
+
+def _meta(importance, days_ago=0, mentions=1):
+    accessed = (NOW - timedelta(days=days_ago)).isoformat()
+    return {"user_id": "1", "importance": importance, "created_at": accessed, "last_accessed": accessed,
+            "mentions": mentions}
+
+
+class TestMemoryCompaction(unittest.TestCase):
+
+    def test_near_identical_memories_are_merged_into_the_most_important(self):
+        plan = plan_compaction(
+            ids=["a", "b", "c"],
+            vectors=[[1.0, 0.0], [0.99, 0.05], [0.0, 1.0]],
+            metadatas=[_meta(0.5, days_ago=1), _meta(0.8, days_ago=10), _meta(0.6)],
+            now=NOW,
+            merge_similarity=0.95,
+        )
+        self.assertEqual(plan.delete_ids, ["a"])
+        self.assertEqual(plan.merged, 1)
+        merged = plan.updates["b"]
+        self.assertGreater(merged["importance"], 0.8)
+        self.assertEqual(merged["last_accessed"], (NOW - timedelta(days=1)).isoformat())
+        self.assertEqual(merged["mentions"], 2)
+
+    def test_stale_unimportant_memories_are_evicted(self):
+        plan = plan_compaction(
+            ids=["old", "fresh"],
+            vectors=[[1.0, 0.0], [0.0, 1.0]],
+            metadatas=[_meta(0.2, days_ago=200), _meta(0.2)],
+            now=NOW,
+            stale_days=90,
+            stale_max_importance=0.3,
+        )
+        self.assertEqual(plan.delete_ids, ["old"])
+        self.assertEqual(plan.evicted, 1)
+
+    def test_cap_keeps_most_important_recent_memories(self):
+        plan = plan_compaction(
+            ids=["low", "high", "mid"],
+            vectors=[[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]],
+            metadatas=[_meta(0.4), _meta(0.9), _meta(0.6)],
+            now=NOW,
+            max_per_user=2,
+        )
+        self.assertEqual(plan.delete_ids, ["low"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from rag.src import memory_index
+from rag.src.models import UserMemoryEntry, UserMemoryStats
+
+
+def _got(*memories):
+    """Chroma `get` result for (memory_id, created_at, importance) tuples."""
+    return {
+        "ids": [m[0] for m in memories],
+        "metadatas": [{"created_at": m[1], "importance": m[2]} for m in memories],
+    }
+
+
+class TestCursor(unittest.TestCase):
+
+    def test_cursor_roundtrip(self):
+        created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+        cursor = memory_index.encode_cursor(created_at, "mem|with|pipes")
+        self.assertEqual(memory_index.decode_cursor(cursor), (created_at, "mem|with|pipes"))
+
+    def test_malformed_cursor_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            memory_index.decode_cursor("bm90LWEtY3Vyc29y")
+
+
+class TestMemoryIndex(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        for model in (UserMemoryEntry, UserMemoryStats):
+            model.__table__.create(engine)
+        self.Session = sessionmaker(bind=engine)
+        patcher = mock.patch.object(memory_index, "SessionLocal", self.Session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pages_are_newest_first_and_ties_break_on_id(self):
+        memory_index.backfill("1", _got(
+            ("a", "2024-01-01T10:00:00", 0.5),
+            ("b", "2024-01-03T10:00:00", 0.5),
+            ("c", "2024-01-02T10:00:00", 0.5),
+            ("d", "2024-01-02T10:00:00", 0.5),
+        ))
+
+        first, cursor = memory_index.list_page("1", limit=3)
+        self.assertEqual(first, ["b", "d", "c"])
+        rest, end = memory_index.list_page("1", limit=3, cursor=cursor)
+        self.assertEqual(rest, ["a"])
+        self.assertIsNone(end)
+
+    def test_counters_follow_adds_updates_and_deletes(self):
+        memory_index.backfill("1", _got(("a", "2024-01-01T10:00:00", 0.9)))
+        memory_index.record_added("1", "b", {"created_at": "2024-02-01T10:00:00", "importance": 0.1})
+        memory_index.record_updated("1", ["a"], [{"importance": 0.5}])
+
+        stats = memory_index.get_stats("1")
+        self.assertEqual(stats["total_memories"], 2)
+        self.assertEqual(stats["importance_distribution"], {"high": 0, "medium": 1, "low": 1})
+        self.assertEqual(stats["average_importance"], 0.3)
+        self.assertEqual(stats["newest_memory_at"], "2024-02-01T10:00:00")
+
+        memory_index.record_deleted("1", ["b"])
+        stats = memory_index.get_stats("1")
+        self.assertEqual(stats["total_memories"], 1)
+        self.assertEqual(stats["importance_distribution"], {"high": 0, "medium": 1, "low": 0})
+        self.assertEqual(stats["newest_memory_at"], "2024-01-01T10:00:00")
+
+    def test_writes_before_backfill_are_ignored(self):
+        memory_index.record_added("1", "a", {"created_at": "2024-01-01T10:00:00"})
+        self.assertFalse(memory_index.is_indexed("1"))
+
+    def test_reconcile_applies_writes_that_raced_with_backfill(self):
+        before = _got(("a", "2024-01-01T10:00:00", 0.5), ("b", "2024-01-02T10:00:00", 0.5))
+        # Zapisy między odczytem z Chroma a commitem backfillu: "c" dodane, "b" usunięte
+        after = _got(("a", "2024-01-01T10:00:00", 0.5), ("c", "2024-01-03T10:00:00", 0.8))
+        self.assertTrue(memory_index.backfill("1", before))
+        self.assertFalse(memory_index.backfill("1", before))
+
+        memory_index.reconcile_backfill("1", before, after)
+
+        ids, _ = memory_index.list_page("1", limit=10)
+        self.assertEqual(ids, ["c", "a"])
+        stats = memory_index.get_stats("1")
+        self.assertEqual(stats["total_memories"], 2)
+        self.assertEqual(stats["importance_distribution"], {"high": 1, "medium": 1, "low": 0})
+        self.assertEqual(stats["newest_memory_at"], "2024-01-03T10:00:00")
+
+
+if __name__ == "__main__":
+    unittest.main()
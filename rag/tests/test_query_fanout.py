@@ -0,0 +1,34 @@
+import unittest
+
+from rag.src.query_fanout import decompose_query, fuse_subquery_results
+
+
+def result(document_id, chunk_index):
+    return {"_id": f"v_{document_id}_{chunk_index}", "content": "...",
+            "metadata": {"document_id": document_id, "chunk_index": chunk_index}}
+
+
+class TestDecomposeQuery(unittest.TestCase):
+
+    def test_single_topic_is_not_split(self):
+        self.assertEqual(decompose_query("Czym jest całka oznaczona?"), ["Czym jest całka oznaczona?"])
+
+    def test_comparison_yields_both_sides(self):
+        self.assertEqual(decompose_query("Porównaj całkę Riemanna i całkę Lebesgue'a", 3),
+                         ["Porównaj całkę Riemanna i całkę Lebesgue'a", "całkę Riemanna", "całkę Lebesgue'a"])
+
+    def test_separate_questions_are_capped(self):
+        subqueries = decompose_query("What is TCP? What is UDP? What is QUIC?", max_subqueries=3)
+        self.assertEqual(subqueries, ["What is TCP? What is UDP? What is QUIC?", "What is TCP", "What is UDP"])
+
+
+class TestFuseSubqueryResults(unittest.TestCase):
+
+    def test_chunk_found_by_several_subqueries_appears_once_first(self):
+        fused = fuse_subquery_results([[result("a", 0), result("b", 1)], [result("b", 1), result("c", 2)]], 5)
+        self.assertEqual([r["_id"] for r in fused], ["v_b_1", "v_a_0", "v_c_2"])
+        self.assertIn("fanout_score", fused[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
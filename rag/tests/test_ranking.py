@@ -0,0 +1,83 @@
+import unittest
+
+from rag.src.ranking import fuse_hybrid, maximal_marginal_relevance, reciprocal_rank_fusion, result_key
+
+
+def row(document_id, chunk_index, score=0.0, vector_id=None):
+    return {
+        "id": vector_id or f"v_{document_id}_{chunk_index}",
+        "content": f"{document_id}:{chunk_index}",
+        "metadata": {"document_id": document_id, "chunk_index": chunk_index},
+        "score": score,
+    }
+
+
+class TestReciprocalRankFusion(unittest.TestCase):
+
+    def test_chunk_found_by_both_retrievers_ranks_first(self):
+        vector = [row("a", 0), row("a", 1), row("b", 4)]
+        lexical = [row("c", 2, vector_id="section_c_2"), row("b", 4, vector_id="other-id")]
+
+        fused = reciprocal_rank_fusion([vector, lexical])
+
+        self.assertEqual(result_key(fused[0]["row"]), "b:4")
+        self.assertEqual(fused[0]["ranks"], [3, 2])
+        self.assertEqual(len(fused), 4)
+
+    def test_lexical_only_hit_is_kept(self):
+        fused = reciprocal_rank_fusion([[row("a", 0)], [row("z", 9)]])
+        self.assertEqual({result_key(e["row"]) for e in fused}, {"a:0", "z:9"})
+        self.assertEqual([e["ranks"] for e in fused], [[1, None], [None, 1]])
+
+    def test_rows_without_document_fall_back_to_vector_id(self):
+        legacy = {"id": "old-1", "content": "x", "metadata": {"file_name": "a.pdf"}, "score": 0.1}
+        self.assertEqual(result_key(legacy), "old-1")
+
+
+class TestWeightedFusion(unittest.TestCase):
+
+    def test_normalized_scores_are_weighted(self):
+        # Dystanse Chroma (mniejszy = lepszy) i rangi pełnotekstowe (większy = lepszy)
+        vector = [row("a", 0, score=0.2), row("b", 1, score=0.6), row("c", 2, score=1.0)]
+        lexical = [row("c", 2, score=3.0), row("d", 3, score=1.0)]
+
+        fused = fuse_hybrid(vector, lexical, "weighted", (0.5, 0.5))
+
+        self.assertEqual([result_key(e["row"]) for e in fused], ["a:0", "c:2", "b:1", "d:3"])
+        self.assertAlmostEqual(fused[0]["score"], 0.5)
+        self.assertEqual(fused[1]["ranks"], [3, 1])
+
+    def test_vector_weight_only_keeps_vector_order(self):
+        vector = [row("a", 0, score=0.1), row("b", 1, score=0.3)]
+        lexical = [row("b", 1, score=5.0)]
+        fused = fuse_hybrid(vector, lexical, "weighted", (1.0, 0.0))
+        self.assertEqual([result_key(e["row"]) for e in fused], ["a:0", "b:1"])
+
+    def test_graph_results_are_a_third_list(self):
+        vector = [row("a", 0, score=0.2), row("b", 1, score=0.6)]
+        graph = [row("b", 1, score=4.0, vector_id="graph_7"), row("e", 5, score=2.0, vector_id="graph_9")]
+
+        fused = fuse_hybrid(vector, [], "weighted", (0.5, 0.3, 0.2), graph_results=graph)
+
+        self.assertEqual([result_key(e["row"]) for e in fused], ["a:0", "b:1", "e:5"])
+        self.assertEqual(fused[1]["ranks"], [2, None, 1])
+        self.assertAlmostEqual(fused[1]["score"], 0.2)
+
+
+class TestMaximalMarginalRelevance(unittest.TestCase):
+
+    def test_near_copy_is_skipped_for_distinct_chunk(self):
+        # 0 i 1 to prawie ten sam fragment (nakładające się chunki), 2 jest inny
+        embeddings = [[1.0, 0.0], [0.99, 0.14], [0.0, 1.0]]
+        self.assertEqual(maximal_marginal_relevance([1.0, 0.95, 0.6], embeddings, k=2, lambda_mult=0.5), [0, 2])
+
+    def test_lambda_one_keeps_relevance_order(self):
+        embeddings = [[1.0, 0.0], [0.99, 0.14], [0.0, 1.0]]
+        self.assertEqual(maximal_marginal_relevance([1.0, 0.95, 0.6], embeddings, k=3, lambda_mult=1.0), [0, 1, 2])
+
+    def test_missing_embeddings_count_as_distinct(self):
+        self.assertEqual(maximal_marginal_relevance([0.2, 1.0], [None, [1.0, 0.0]], k=5), [1, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
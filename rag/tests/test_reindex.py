@@ -0,0 +1,189 @@
+import asyncio
+import unittest
+import uuid
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateTable
+
+from rag.src import reindex
+from rag.src.index_generations import IndexSettings
+from rag.src.models import DocumentSection, VectorIndexGeneration, WorkspaceDocument
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_on_sqlite(element, compiler, **kw):
+    return "JSON"
+
+
+class SQLiteTestCase(unittest.TestCase):
+    """Runs `reindex` against an in-memory SQLite copy of the tables it touches."""
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        # Bez indeksów - pełnotekstowy indeks sekcji jest specyficzny dla Postgresa
+        with engine.begin() as conn:
+            for model in (VectorIndexGeneration, WorkspaceDocument, DocumentSection):
+                conn.execute(CreateTable(model.__table__))
+        self.Session = sessionmaker(bind=engine)
+        patcher = mock.patch.object(reindex, "SessionLocal", self.Session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add(self, *rows):
+        with self.Session() as db:
+            db.add_all(rows)
+            db.commit()
+            return [row.id for row in rows]
+
+
+class TestLoadDocumentBatch(SQLiteTestCase):
+
+    def test_batches_resume_after_checkpointed_document(self):
+        document_ids = sorted(uuid.uuid4() for _ in range(3))
+        self.add(*(
+            WorkspaceDocument(id=document_id, user_id=1, title=f"doc-{i}", original_filename=f"doc-{i}.pdf")
+            for i, document_id in enumerate(document_ids)
+        ))
+        self.add(DocumentSection(document_id=document_ids[1], section_index=0, content_text="text",
+                                 section_metadata={"page_number": 3}))
+        (generation_id,) = self.add(VectorIndexGeneration(status="building", embedding_model="m"))
+
+        first = reindex._load_document_batch(generation_id, batch_documents=2)
+        self.assertEqual([d["id"] for d in first], document_ids[:2])
+        self.assertEqual(first[1]["sections"], ["text"])
+        self.assertEqual(first[1]["pages"], [3])
+
+        reindex._checkpoint(generation_id, last_document_id=first[-1]["id"], documents_done=2)
+        rest = reindex._load_document_batch(generation_id, batch_documents=2)
+        self.assertEqual([d["id"] for d in rest], document_ids[2:])
+        self.assertEqual(rest[0]["file_name"], "doc-2.pdf")
+
+    def test_cancelled_generation_stops_the_job(self):
+        (generation_id,) = self.add(VectorIndexGeneration(status="cancelled", embedding_model="m"))
+        with self.assertRaises(RuntimeError):
+            reindex._load_document_batch(generation_id, batch_documents=10)
+
+
+class TestStartGeneration(SQLiteTestCase):
+
+    def test_memory_model_is_recorded_on_the_row(self):
+        generation_id = reindex.start_generation("text-embedding-3-large", 1024,
+                                                 memory_model="text-embedding-3-small", memory_dimensions=512)
+        with self.Session() as db:
+            generation = db.get(VectorIndexGeneration, generation_id)
+            self.assertEqual((generation.memory_embedding_model, generation.memory_embedding_dimensions),
+                             ("text-embedding-3-small", 512))
+
+    def test_memory_model_defaults_to_document_model(self):
+        generation_id = reindex.start_generation("text-embedding-3-large", 1024, memory_model="")
+        with self.Session() as db:
+            generation = db.get(VectorIndexGeneration, generation_id)
+            self.assertEqual((generation.memory_embedding_model, generation.memory_embedding_dimensions),
+                             ("text-embedding-3-large", 1024))
+
+
+class TestSwapGeneration(SQLiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.resolver = mock.Mock()
+        patcher = mock.patch.object(reindex, "get_generation_resolver", return_value=self.resolver)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def statuses(self):
+        with self.Session() as db:
+            return {g.id: g.status for g in db.query(VectorIndexGeneration).all()}
+
+    def test_swap_retires_active_generation(self):
+        old, new = self.add(
+            VectorIndexGeneration(status="active", embedding_model="old"),
+            VectorIndexGeneration(status="building", embedding_model="new",
+                                  documents_finished=True, memories_finished=True),
+        )
+
+        reindex.swap_generation(new)
+
+        self.assertEqual(self.statuses(), {old: "retired", new: "active"})
+        self.resolver.invalidate.assert_called_once()
+
+    def test_unfinished_generation_is_not_swapped(self):
+        old, new = self.add(
+            VectorIndexGeneration(status="active", embedding_model="old"),
+            VectorIndexGeneration(status="building", embedding_model="new", documents_finished=True),
+        )
+
+        with self.assertRaises(ValueError):
+            reindex.swap_generation(new)
+        self.assertEqual(self.statuses(), {old: "active", new: "building"})
+        self.resolver.invalidate.assert_not_called()
+
+
+class FakeMemoryCollection:
+    """Chroma collection look-alike; `on_page` runs after each page is read (e.g. a concurrent delete)."""
+
+    def __init__(self, rows, on_page=None):
+        self.rows = rows
+        self.on_page = on_page
+        self.upserted = {}
+
+    async def get(self, ids=None, include=None, **kwargs):
+        selected = [i for i in ids if i in self.rows] if ids is not None else list(self.rows)
+        page = {"ids": selected, "documents": [self.rows[i] for i in selected],
+                "metadatas": [{"user_id": "1"} for _ in selected]}
+        if ids is not None and self.on_page:
+            self.on_page(self)
+        return page
+
+    async def upsert(self, ids, embeddings, documents, metadatas):
+        self.upserted.update(zip(ids, documents))
+
+
+class TestReindexMemories(unittest.TestCase):
+
+    def run_memories(self, source, generation):
+        target = FakeMemoryCollection({})
+        checkpoints = []
+
+        async def collection(name, create=True):
+            return source if name == "user-memories" else target
+
+        embedder = mock.Mock()
+        embedder.aembed_documents = mock.AsyncMock(side_effect=lambda texts: [[0.0] for _ in texts])
+        with mock.patch.object(reindex.vector_store, "embeddings_for", return_value=embedder), \
+                mock.patch.object(reindex.vector_store, "_list_partitions", return_value=["user-memories"]), \
+                mock.patch.object(reindex.vector_store.async_store, "collection", side_effect=collection), \
+                mock.patch.object(reindex, "_checkpoint", side_effect=lambda _, **c: checkpoints.append(c)):
+            asyncio.run(reindex._reindex_memories(
+                generation, IndexSettings(None, "m", None), IndexSettings(2, "m", None),
+                reindex.Throttle(0), page_size=2,
+            ))
+        return target.upserted, checkpoints
+
+    def test_deletes_during_the_copy_do_not_skip_memories(self):
+        rows = {f"m{i}": f"memory {i}" for i in range(6)}
+        # Compaction removes an already copied memory after every page
+        source = FakeMemoryCollection(dict(rows), on_page=lambda c: c.rows.pop(min(c.rows)))
+        generation = VectorIndexGeneration(id=2, memory_collection=None, memory_last_id=None)
+
+        upserted, checkpoints = self.run_memories(source, generation)
+
+        self.assertEqual(sorted(upserted), sorted(rows))
+        self.assertEqual([c["memory_last_id"] for c in checkpoints if "memory_last_id" in c], ["m1", "m3", "m5"])
+        self.assertTrue(checkpoints[-1]["memories_finished"])
+
+    def test_resume_starts_after_checkpointed_id(self):
+        source = FakeMemoryCollection({f"m{i}": f"memory {i}" for i in range(5)})
+        generation = VectorIndexGeneration(id=2, memory_collection="user-memories", memory_last_id="m2")
+
+        upserted, _ = self.run_memories(source, generation)
+
+        self.assertEqual(sorted(upserted), ["m3", "m4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import time
+import unittest
+
+from rag.src.reranker import CrossEncoderReranker
+
+
+class FakeCrossEncoder:
+    """Ocena = liczba wystąpień słowa zapytania w treści."""
+
+    def __init__(self, delay: float = 0.0, delay_per_pair: float = 0.0):
+        self.delay = delay
+        self.delay_per_pair = delay_per_pair
+        self.batches = []
+
+    def predict(self, pairs, batch_size, convert_to_numpy, show_progress_bar):
+        self.batches.append(len(pairs))
+        time.sleep(self.delay + self.delay_per_pair * len(pairs))
+        return [content.count(query) for query, content in pairs]
+
+
+def results(*contents):
+    return [{"content": c, "final_score": 1.0 - i / 10} for i, c in enumerate(contents)]
+
+
+class TestCrossEncoderReranker(unittest.TestCase):
+
+    def test_reorders_by_cross_encoder_score_in_batches(self):
+        model = FakeCrossEncoder()
+        reranker = CrossEncoderReranker(batch_size=2, time_budget_ms=1000, model=model)
+
+        ranked = reranker.rerank("bayes", results("x", "bayes bayes", "y", "bayes"), n_results=2)
+
+        self.assertEqual([r["content"] for r in ranked], ["bayes bayes", "bayes"])
+        self.assertEqual(ranked[0]["rerank_score"], 2)
+        self.assertEqual(model.batches, [2, 2])
+
+    def test_keeps_first_stage_order_when_budget_is_exceeded(self):
+        model = FakeCrossEncoder(delay=0.05)
+        reranker = CrossEncoderReranker(batch_size=1, time_budget_ms=60, model=model)
+
+        ranked = reranker.rerank("bayes", results("x", "y", "z", "bayes"), n_results=3)
+
+        self.assertEqual([r["content"] for r in ranked], ["x", "y", "z"])
+        self.assertNotIn("rerank_score", ranked[0])
+        self.assertLess(len(model.batches), 4)
+
+    def test_cold_first_batch_is_shrunk_to_the_budget(self):
+        model = FakeCrossEncoder(delay_per_pair=0.01)
+        reranker = CrossEncoderReranker(batch_size=16, time_budget_ms=50, cold_ms_per_pair=10, model=model)
+
+        ranked = reranker.rerank("bayes", results(*["x"] * 15, "bayes"), n_results=3)
+
+        # Bez oszacowania cała partia 16 par (~160 ms) przekroczyłaby budżet
+        self.assertEqual(len(model.batches), 1)
+        self.assertLessEqual(model.batches[0], 5)
+        self.assertNotIn("rerank_score", ranked[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from rag.src.retrieval_cache import MemoryRetrievalBackend, RetrievalCache, retrieval_cache_key
+
+
+class TestRetrievalCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = RetrievalCache(MemoryRetrievalBackend(max_entries=8, ttl_seconds=60))
+
+    def test_key_ignores_case_and_whitespace(self):
+        self.assertEqual(retrieval_cache_key("1", "Całka  oznaczona ", "0.0", n_results=5),
+                         retrieval_cache_key("1", "całka oznaczona", "0.0", n_results=5))
+
+    def test_bump_changes_version_of_that_user_only(self):
+        before = self.cache.corpus_version("1"), self.cache.corpus_version("2")
+        self.cache.bump("1")
+        self.assertNotEqual(self.cache.corpus_version("1"), before[0])
+        self.assertEqual(self.cache.corpus_version("2"), before[1])
+
+    def test_global_bump_invalidates_every_user(self):
+        before = self.cache.corpus_version("2")
+        self.cache.bump("*")
+        self.assertNotEqual(self.cache.corpus_version("2"), before)
+
+    def test_entries_round_trip_and_count_hits(self):
+        key = retrieval_cache_key("1", "q", self.cache.corpus_version("1"), n_results=5)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.set(key, [{"id": "a", "score": 0.5}])
+        self.assertEqual(self.cache.get(key), [{"id": "a", "score": 0.5}])
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
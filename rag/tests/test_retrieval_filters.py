@@ -0,0 +1,48 @@
+import unittest
+
+from rag.src.retrieval_filters import DocumentScope, RetrievalFilters, _legacy_where, chroma_where
+from rag.src.services.workspace_chat import build_retrieval_filters
+
+
+class TestChromaWhere(unittest.TestCase):
+
+    def test_no_scope_filters_by_user_only(self):
+        self.assertEqual(chroma_where("7", None), {"user_id": "7"})
+
+    def test_documents_and_legacy_vectors_are_alternatives(self):
+        scope = DocumentScope(document_ids=("d1", "d2"), legacy_where={"category": {"$in": ["Math"]}})
+        self.assertEqual(chroma_where("7", scope), {"$and": [
+            {"user_id": {"$eq": "7"}},
+            {"$or": [{"document_id": {"$in": ["d1", "d2"]}}, {"category": {"$in": ["Math"]}}]},
+        ]})
+
+    def test_scope_without_matches_is_empty(self):
+        self.assertTrue(DocumentScope(document_ids=()).is_empty())
+
+
+class TestLegacyWhere(unittest.TestCase):
+
+    def test_scopes_combine_with_and(self):
+        filters = RetrievalFilters(categories=("Math",), file_names=("a.pdf",))
+        self.assertEqual(_legacy_where(filters, None), {"$and": [
+            {"category": {"$in": ["Math"]}}, {"file_name": {"$in": ["a.pdf"]}},
+        ]})
+
+    def test_document_ids_and_empty_workspace_exclude_legacy_vectors(self):
+        self.assertIsNone(_legacy_where(RetrievalFilters(document_ids=("d1",)), None))
+        self.assertIsNone(_legacy_where(RetrievalFilters(workspace_id="w"), []))
+
+
+class TestWorkspaceChatScope(unittest.TestCase):
+
+    def test_open_document_takes_precedence_over_workspace(self):
+        self.assertEqual(build_retrieval_filters(document_id="d1", workspace_id="w"),
+                         RetrievalFilters(document_ids=("d1",)))
+
+    def test_workspace_without_open_document(self):
+        self.assertEqual(build_retrieval_filters(workspace_id="w"), RetrievalFilters(workspace_id="w"))
+        self.assertIsNone(build_retrieval_filters())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import asyncio
+import functools
+import unittest
+from unittest import mock
+
+from rag.benchmarks.fakes import FakeEmbedder
+from rag.src import vector_store
+from rag.src.ingest_pipeline import embed_and_upsert
+from rag.src.index_generations import LEGACY_SETTINGS
+from rag.src.vector_store import _file_filter, chunk_vector_id
+
+
+class CountingEmbedder(FakeEmbedder):
+    """Records which texts reached the 'API'."""
+
+    def __init__(self):
+        super().__init__(dimensions=8)
+        self.embedded = []
+
+    async def aembed_documents(self, texts):
+        self.embedded.extend(texts)
+        return await super().aembed_documents(texts)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}
+        # Teksty, których zapis kończy się błędem
+        self.failing = set()
+
+    async def upsert(self, ids, embeddings, documents, metadatas):
+        if self.failing.intersection(documents):
+            raise RuntimeError("chroma unavailable")
+        self.rows.update(zip(ids, documents))
+
+
+class TestChunkVectorId(unittest.TestCase):
+
+    def test_id_is_deterministic(self):
+        self.assertEqual(chunk_vector_id("7", "doc", 0, "tekst"), chunk_vector_id("7", "doc", 0, "tekst"))
+
+    def test_id_changes_with_document_position_and_text(self):
+        base = chunk_vector_id("7", "doc", 0, "tekst")
+        self.assertNotEqual(base, chunk_vector_id("7", "other", 0, "tekst"))
+        self.assertNotEqual(base, chunk_vector_id("7", "doc", 1, "tekst"))
+        self.assertNotEqual(base, chunk_vector_id("7", "doc", 0, "tekst zmieniony"))
+        self.assertNotEqual(base, chunk_vector_id("8", "doc", 0, "tekst"))
+
+    def test_id_is_prefixed_with_user(self):
+        self.assertTrue(chunk_vector_id("7", "doc", 0, "tekst").startswith("7_"))
+
+
+class TestFileFilter(unittest.TestCase):
+
+    def test_document_id_only(self):
+        self.assertEqual(_file_filter("7", document_id="doc"),
+                         {"$and": [{"user_id": {"$eq": "7"}}, {"document_id": {"$eq": "doc"}}]})
+
+    def test_legacy_file_name_is_matched_too(self):
+        self.assertEqual(_file_filter("7", file_name="a.pdf", document_id="doc"), {
+            "$and": [
+                {"user_id": {"$eq": "7"}},
+                {"$or": [{"document_id": {"$eq": "doc"}}, {"file_name": {"$eq": "a.pdf"}}]},
+            ]
+        })
+
+
+class TestReingest(unittest.TestCase):
+    """acreate_vector_store with `replace_ids` (DocumentSection.vector_id of the previous upload)."""
+
+    def setUp(self):
+        self.collection = FakeCollection()
+        self.deleted = []
+
+        async def collection(name, create=True):
+            return self.collection
+
+        async def delete_vectors(user_id, ids, use_sync_client=False):
+            self.deleted.extend(ids)
+
+        patches = [
+            mock.patch.object(vector_store.generations, "acurrent",
+                              mock.AsyncMock(return_value=(LEGACY_SETTINGS, None))),
+            mock.patch.object(vector_store.async_store, "collection", side_effect=collection),
+            mock.patch.object(vector_store, "adedupe_chunks", mock.AsyncMock(return_value=None)),
+            mock.patch.object(vector_store, "adelete_vectors", side_effect=delete_vectors),
+            mock.patch.object(vector_store, "_aapply_centroid_deltas", mock.AsyncMock()),
+            mock.patch.object(vector_store, "abump_corpus_version", mock.AsyncMock()),
+            mock.patch.object(vector_store, "quantized_index", None),
+            mock.patch.object(vector_store, "embedding_cache", None),
+            # Po jednym chunku na partię, bez czekania między próbami
+            mock.patch.object(vector_store, "embed_and_upsert",
+                              functools.partial(embed_and_upsert, batch_size=1, retry_backoff=0)),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def ingest(self, chunks, replace_ids=None):
+        embedder = CountingEmbedder()
+        report = asyncio.run(vector_store.acreate_vector_store(
+            chunks, "7", "doc", embedder=embedder, replace_ids=replace_ids
+        ))
+        return report, embedder.embedded
+
+    def test_unchanged_document_is_not_embedded_again(self):
+        chunks = ["pierwszy fragment", "drugi fragment", "trzeci fragment"]
+        first, embedded = self.ingest(chunks)
+        self.assertEqual(embedded, chunks)
+
+        second, embedded = self.ingest(chunks, replace_ids=first.chunk_ids.values())
+
+        self.assertEqual(embedded, [])
+        self.assertEqual(second.chunk_ids, first.chunk_ids)
+        self.assertEqual(self.deleted, [])
+
+    def test_changed_chunks_replace_their_stale_ids(self):
+        first, _ = self.ingest(["pierwszy fragment", "drugi fragment", "trzeci fragment"])
+
+        second, embedded = self.ingest(["pierwszy fragment", "drugi fragment (poprawiony)"],
+                                       replace_ids=first.chunk_ids.values())
+
+        self.assertEqual(embedded, ["drugi fragment (poprawiony)"])
+        self.assertEqual(second.chunk_ids[0], first.chunk_ids[0])
+        self.assertEqual(sorted(self.deleted), sorted([first.chunk_ids[1], first.chunk_ids[2]]))
+
+    def test_chunk_from_failed_batch_is_embedded_again(self):
+        chunks = ["pierwszy fragment", "drugi fragment", "trzeci fragment"]
+        self.collection.failing = {"drugi fragment"}
+        first, _ = self.ingest(chunks)
+
+        self.assertEqual(len(first.failed_batches), 1)
+        self.assertEqual(sorted(first.chunk_ids), [0, 2])
+
+        self.collection.failing = set()
+        second, embedded = self.ingest(chunks, replace_ids=first.chunk_ids.values())
+
+        self.assertEqual(embedded, ["drugi fragment"])
+        self.assertEqual(sorted(second.chunk_ids), [0, 1, 2])
+        self.assertIn(second.chunk_ids[1], self.collection.rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+from rag.src.vector_partitioning import collection_for_user, read_collections_for_user
+
+
+class TestCollectionRouting(unittest.TestCase):
+
+    def test_single_mode_uses_base_collection(self):
+        self.assertEqual(collection_for_user("torched-rag", "42", mode="single"), "torched-rag")
+
+    def test_user_mode_sanitizes_id(self):
+        self.assertEqual(collection_for_user("torched-rag", "42", mode="user"), "torched-rag-u-42")
+        self.assertEqual(collection_for_user("torched-rag", "a@b.pl", mode="user"), "torched-rag-u-a-b-pl")
+
+    def test_long_user_id_is_hashed_within_chroma_limit(self):
+        name = collection_for_user("torched-rag", "x" * 80, mode="user")
+        self.assertLessEqual(len(name), 63)
+        self.assertEqual(name, collection_for_user("torched-rag", "x" * 80, mode="user"))
+
+    def test_bucket_is_stable_and_in_range(self):
+        names = {collection_for_user("torched-rag", str(i), mode="bucket", buckets=4) for i in range(200)}
+        self.assertEqual(names, {f"torched-rag-b00{b}" for b in range(4)})
+        self.assertEqual(collection_for_user("torched-rag", "7", mode="bucket", buckets=4),
+                         collection_for_user("torched-rag", "7", mode="bucket", buckets=4))
+
+    def test_dual_read_adds_legacy_collection(self):
+        self.assertEqual(read_collections_for_user("torched-rag", "42", mode="user", dual_read=True),
+                         ["torched-rag-u-42", "torched-rag"])
+        self.assertEqual(read_collections_for_user("torched-rag", "42", mode="user", dual_read=False),
+                         ["torched-rag-u-42"])
+
+    def test_dual_read_in_single_mode_reads_once(self):
+        self.assertEqual(read_collections_for_user("torched-rag", "42", mode="single", dual_read=True),
+                         ["torched-rag"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+from rag.src.vector_quantization import QuantizedIndex, first_pass, quantize_binary, quantize_int8
+
+
+def _unit_vectors(n, dims, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dims)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class TestVectorQuantization(unittest.TestCase):
+
+    def test_int8_roundtrip_is_close(self):
+        vectors = _unit_vectors(20, 64)
+        codes, scales = quantize_int8(vectors)
+        self.assertEqual(codes.dtype, np.int8)
+        np.testing.assert_allclose(codes * scales[:, None], vectors, atol=float(scales.max()))
+
+    def test_binary_codes_are_packed(self):
+        self.assertEqual(quantize_binary(_unit_vectors(3, 64)).shape, (3, 8))
+
+    def test_first_pass_finds_exact_match(self):
+        vectors = _unit_vectors(200, 64)
+        for mode in ("int8", "binary"):
+            if mode == "binary":
+                codes, scales = quantize_binary(vectors), None
+            else:
+                codes, scales = quantize_int8(vectors)
+            top = first_pass(vectors[42], codes, scales, mode, k=5)
+            self.assertEqual(top[0], 42, mode)
+
+    def test_index_candidates_are_per_user_and_follow_deletes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index = QuantizedIndex(os.path.join(tmp_dir, "codes.sqlite3"), "int8")
+            vectors = _unit_vectors(4, 32)
+            metadatas = [
+                {"user_id": "1", "document_id": "doc-a"},
+                {"user_id": "1", "document_id": "doc-b"},
+                {"user_id": "2", "document_id": "doc-a"},
+                {"user_id": "1", "document_id": "doc-a"},
+            ]
+            index.upsert("torched-rag", ["c0", "c1", "c2", "c3"], vectors, metadatas)
+
+            found = index.candidates(["torched-rag"], "1", vectors[1], k=10)
+            self.assertEqual(found["torched-rag"][0], "c1")
+            self.assertNotIn("c2", found["torched-rag"])
+
+            index.delete("torched-rag", user_id="1", source_key="doc-a")
+            found = index.candidates(["torched-rag"], "1", vectors[1], k=10)
+            self.assertEqual(found["torched-rag"], ["c1"])
+
+    def test_old_file_name_column_is_migrated(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "codes.sqlite3")
+            conn = sqlite3.connect(path)
+            conn.execute("CREATE TABLE vector_codes (collection TEXT NOT NULL, id TEXT NOT NULL, "
+                         "user_id TEXT NOT NULL, file_name TEXT, code BLOB NOT NULL, scale REAL NOT NULL, "
+                         "PRIMARY KEY (collection, id))")
+            conn.execute("INSERT INTO vector_codes VALUES ('torched-rag', 'c0', '1', 'doc-a', x'00', 1.0)")
+            conn.commit()
+            conn.close()
+
+            index = QuantizedIndex(path, "int8")
+            index.delete("torched-rag", user_id="1", source_key="doc-a")
+            self.assertEqual(index.count(), 0)
+
+    def test_partial_coverage_is_detected_and_rechecked_after_writes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index = QuantizedIndex(os.path.join(tmp_dir, "codes.sqlite3"), "int8", coverage_ttl=3600)
+            vectors = _unit_vectors(3, 32)
+            index.upsert("torched-rag", ["c0", "c1"], vectors[:2], [{"user_id": "1"}] * 2)
+
+            self.assertIsNone(index.coverage("torched-rag", "1"))
+            # Chroma ma 3 wektory użytkownika (np. jeden sprzed backfillu), kody tylko 2
+            self.assertFalse(index.record_coverage("torched-rag", "1", stored=3))
+            self.assertFalse(index.coverage("torched-rag", "1"))
+
+            index.upsert("torched-rag", ["c2"], vectors[2:], [{"user_id": "1"}])
+            self.assertIsNone(index.coverage("torched-rag", "1"))
+            self.assertTrue(index.record_coverage("torched-rag", "1", stored=3))
+            self.assertTrue(index.coverage("torched-rag", "1"))
+
+
+if __name__ == '__main__':
+    unittest.main()